@@ -0,0 +1,92 @@
+"""Benchmark runner.
+
+    python -m benchmarks                       # all benchmarks against the offline mocks
+    python -m benchmarks s02e04_classify_folder --repeat 5
+    python -m benchmarks --mode record s03e02_document_rag   # real services, writes cassettes
+    python -m benchmarks --mode replay         # replays benchmarks/cassettes
+    python -m benchmarks --update-baseline     # accept current numbers
+
+Each run happens in a fresh interpreter, so peak RSS is per pipeline. Results
+are compared with `benchmarks/baseline.json` and the exit code is 1 when any
+metric grew past its threshold.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks.harness import (
+    BENCHMARKS,
+    DEFAULT_THRESHOLDS,
+    MODES,
+    Environment,
+    compare,
+    format_row,
+    load_baseline,
+    run_benchmark,
+    run_child,
+    save_baseline,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-episode pipeline benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all when omitted")
+    parser.add_argument("--mode", choices=MODES, default="mock")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, metrics are medians")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM delay per call in seconds")
+    parser.add_argument("--llm-rpm", type=int, help="mock LLM requests per minute before it answers 429")
+    parser.add_argument("--centrala-latency", type=float, default=0.0, help="Centrala stub delay per call in seconds")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.workdir, args.result_file)
+        return 0
+
+    import benchmarks.pipelines  # noqa: F401 registers the benchmarks
+
+    if args.list:
+        for bench in BENCHMARKS.values():
+            print(f"{bench.name:<32} [{', '.join(bench.modes)}] {bench.description}")
+        return 0
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    baseline = load_baseline()
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    reference = baseline.setdefault("results", {}).setdefault(args.mode, {})
+
+    environment = Environment(args.llm_latency, args.centrala_latency, args.llm_rpm) if args.mode == "mock" else None
+    failed = False
+    try:
+        for name in args.names or BENCHMARKS:
+            result = run_benchmark(BENCHMARKS[name], args.mode, args.repeat, environment)
+            regressions = compare(result, reference.get(name), thresholds)
+            if regressions:
+                failed = True
+                status = "REGRESSION " + ", ".join(regressions)
+            else:
+                status = "ok" if name in reference else "new"
+            print(format_row(name, result, status))
+
+            if args.update_baseline and "skipped" not in result:
+                reference[name] = result
+    finally:
+        if environment is not None:
+            environment.close()
+
+    if args.update_baseline:
+        baseline["thresholds"] = thresholds
+        save_baseline(baseline)
+        return 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import asyncio
+import gc
+import inspect
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from benchmarks.mock_llm import MockLLM, Responder, default_responder
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+CASSETTE_ROOT = REPO_ROOT / "benchmarks" / "cassettes"
+
+MODES = ("mock", "record", "replay")
+METRICS = ("wall_time_s", "llm_calls", "prompt_tokens", "completion_tokens", "http_requests", "peak_rss_mb")
+# Reported next to METRICS but never compared with the baseline
+INFO_METRICS = ("cached_prompt_tokens",)
+
+# Allowed growth over the baseline before a metric counts as a regression:
+# relative share of the baseline plus an absolute slack for noisy metrics
+DEFAULT_THRESHOLDS = {
+    "wall_time_s": {"relative": 0.25, "absolute": 0.05},
+    "llm_calls": {"relative": 0.0, "absolute": 0},
+    "prompt_tokens": {"relative": 0.05, "absolute": 0},
+    "completion_tokens": {"relative": 0.05, "absolute": 0},
+    "http_requests": {"relative": 0.0, "absolute": 0},
+    "peak_rss_mb": {"relative": 0.2, "absolute": 10},
+}
+
+
+@dataclass
+class Benchmark:
+    """One pipeline under measurement.
+
+    Attributes:
+        name (str): Benchmark identifier used on the command line and in the baseline
+        prepare (Callable[[Path], Callable[[], Any]]): Builds the inputs inside a
+            scratch directory and returns the call that gets timed. The call may
+            return a coroutine, which is then run with `asyncio.run`
+        responder (Responder): Answers of the mock LLM for this pipeline
+        modes (Tuple[str, ...]): Modes the benchmark can run in
+        description (str): One line shown in `--list`
+    """
+
+    name: str
+    prepare: Callable[[Path], Callable[[], Any]]
+    responder: Responder = default_responder
+    modes: Tuple[str, ...] = MODES
+    description: str = ""
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, responder: Responder = default_responder, modes: Tuple[str, ...] = MODES):
+    """Register a `prepare(workdir)` function as a benchmark."""
+
+    def decorator(prepare: Callable[[Path], Callable[[], Any]]):
+        description = (inspect.getdoc(prepare) or "").splitlines()[0:1]
+        BENCHMARKS[name] = Benchmark(name, prepare, responder, modes, "".join(description))
+        return prepare
+
+    return decorator
+
+
+class Environment:
+    """Offline services shared by all runs in mock mode.
+
+    Starts the Centrala stub and the mock LLM on background threads and
+    exposes the environment variables that point the pipelines at them.
+    """
+
+    def __init__(self, llm_latency: float = 0.05, centrala_latency: float = 0.0, llm_rpm: Optional[int] = None):
+        from src.centrala_stub import StubConfig, serve_in_thread, start_in_thread
+
+        self.stub_config = StubConfig(latency=centrala_latency, seed=0)
+        self.centrala_url, stop_stub = start_in_thread(self.stub_config)
+        self.mock = MockLLM(latency=llm_latency, rpm=llm_rpm)
+        self.llm_url, stop_llm = serve_in_thread(self.mock.build_app())
+        self._stops = [stop_stub, stop_llm]
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "CENTRALA_URL": self.centrala_url,
+            "SOFTO_URL": f"{self.centrala_url}softo",
+            "OPENAI_BASE_URL": f"{self.llm_url}v1",
+            "ANTHROPIC_BASE_URL": self.llm_url.rstrip("/"),
+            "OLLAMA_BASE_URL": self.llm_url.rstrip("/"),
+            "OPENAI_API_KEY": "mock",
+            "ANTHROPIC_API_KEY": "mock",
+            "API_KEY": "mock-api-key",
+        }
+
+    def counters(self) -> Counter:
+        """Snapshot of server-side counters, diffed around each run."""
+        centrala_requests = sum(
+            count for route, count in self.stub_config.stats.items() if route not in ("errors", "_stub")
+        )
+        return Counter({
+            "http_requests": centrala_requests + self.mock.stats["requests"],
+            "llm_calls": self.mock.stats["llm_calls"],
+            "prompt_tokens": self.mock.stats["prompt_tokens"],
+            "completion_tokens": self.mock.stats["completion_tokens"],
+            "cached_prompt_tokens": self.mock.stats["cached_prompt_tokens"],
+        })
+
+    def close(self) -> None:
+        for stop in self._stops:
+            stop()
+
+
+def run_benchmark(
+    bench: Benchmark,
+    mode: str,
+    repeat: int = 1,
+    environment: Optional[Environment] = None,
+    cassette_root: Path = CASSETTE_ROOT,
+) -> Dict[str, Any]:
+    """Run a benchmark `repeat` times, each in a fresh interpreter.
+
+    Returns:
+        Dict[str, Any]: Median of every metric over the runs, or {"skipped": reason}
+    """
+    if mode not in bench.modes:
+        return {"skipped": f"not available in {mode} mode"}
+
+    runs: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        env = {**os.environ, "APIDB_CACHE": "0", "APIDB_MIRROR": "0", "CASSETTE_MODE": ""}
+        before = Counter()
+        if mode == "mock":
+            environment.mock.responder = bench.responder
+            # Every run starts cold, as a fresh process would against the real APIs
+            environment.mock.clear_prompt_cache()
+            env.update(environment.env())
+            before = environment.counters()
+        else:
+            env.update({"CASSETTE_MODE": mode, "CASSETTE_DIR": str(cassette_root / bench.name)})
+
+        with tempfile.TemporaryDirectory(prefix=f"bench-{bench.name}-") as workdir:
+            env["CACHE_DIR"] = str(Path(workdir) / ".cache")
+            result_file = Path(workdir) / "result.json"
+            process = subprocess.run(
+                [sys.executable, "-m", "benchmarks", "--child", bench.name,
+                 "--workdir", workdir, "--result-file", str(result_file)],
+                cwd=REPO_ROOT,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode != 0 or not result_file.exists():
+                logger.error(f"{bench.name} failed:\n{process.stderr[-2000:]}")
+                return {"skipped": f"failed with exit code {process.returncode}"}
+            result = json.loads(result_file.read_text())
+
+        if "skipped" in result:
+            return result
+        if mode == "mock":
+            result.update(environment.counters() - before)
+            for metric in ("llm_calls", "prompt_tokens", "completion_tokens", "http_requests", *INFO_METRICS):
+                result.setdefault(metric, 0)
+        runs.append(result)
+
+    return {metric: statistics.median(run.get(metric, 0) for run in runs) for metric in METRICS + INFO_METRICS}
+
+
+def run_child(name: str, workdir: Path, result_file: Path) -> None:
+    """Body of the per-run subprocess: prepare, time the call, write metrics."""
+    # Imported after the parent set CASSETTE_MODE, src/__init__ activates the cassette
+    from src import cassette
+
+    import benchmarks.pipelines  # noqa: F401 registers the benchmarks
+
+    usage = Counter()
+
+    def _count_usage(entry: Dict) -> None:
+        try:
+            body = json.loads(entry["body"].get("text", ""))
+        except ValueError:
+            return
+        tokens = body.get("usage") if isinstance(body, dict) else None
+        if tokens:
+            usage["llm_calls"] += 1
+            cache_read = tokens.get("cache_read_input_tokens") or 0
+            cache_write = tokens.get("cache_creation_input_tokens") or 0
+            usage["prompt_tokens"] += tokens.get("prompt_tokens", tokens.get("input_tokens", 0) + cache_read + cache_write)
+            usage["completion_tokens"] += tokens.get("completion_tokens", tokens.get("output_tokens", 0))
+            usage["cached_prompt_tokens"] += cache_read or (tokens.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+    cassette.listeners.append(_count_usage)
+    bench = BENCHMARKS[name]
+    try:
+        call = bench.prepare(workdir)
+    except ImportError as e:
+        result_file.write_text(json.dumps({"skipped": f"missing dependency: {e.name or e}"}))
+        return
+
+    gc.collect()
+    started = time.perf_counter()
+    outcome = call()
+    if inspect.iscoroutine(outcome):
+        asyncio.run(outcome)
+    wall_time = time.perf_counter() - started
+
+    result = {
+        "wall_time_s": round(wall_time, 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if cassette.active() is not None:
+        result["http_requests"] = cassette.stats["recorded"] + cassette.stats["replayed"]
+        result.update(usage)
+    result_file.write_text(json.dumps(result))
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Any]:
+    if not path.exists():
+        return {"thresholds": DEFAULT_THRESHOLDS, "results": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(baseline: Dict[str, Any], path: Path = BASELINE_PATH) -> None:
+    path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def compare(result: Dict[str, Any], reference: Optional[Dict[str, Any]], thresholds: Dict[str, Dict]) -> List[str]:
+    """Names of metrics that grew past their threshold, with before/after values."""
+    if not reference or "skipped" in result:
+        return []
+    regressions = []
+    for metric in METRICS:
+        if metric not in reference:
+            continue
+        limit = thresholds.get(metric, {"relative": 0.0, "absolute": 0})
+        allowed = reference[metric] * (1 + limit["relative"]) + limit["absolute"]
+        if result[metric] > allowed:
+            regressions.append(f"{metric} {reference[metric]} -> {result[metric]}")
+    return regressions
+
+
+def format_row(name: str, result: Dict[str, Any], status: str) -> str:
+    if "skipped" in result:
+        return f"{name:<32} skipped: {result['skipped']}"
+    return (
+        f"{name:<32} {result['wall_time_s']:>8.3f}s {result['llm_calls']:>5} calls "
+        f"{result['prompt_tokens']:>8}/{result['completion_tokens']:<6} tok "
+        f"{result.get('cached_prompt_tokens', 0):>7} cached "
+        f"{result['http_requests']:>5} http {result['peak_rss_mb']:>7.1f} MB  {status}"
+    )
@@ -0,0 +1,326 @@
+"""Local mock of the OpenAI, Anthropic and Ollama HTTP APIs.
+
+Answers come from a `responder` callable, so each benchmark can return the
+shape its pipeline expects. Usage is estimated from the request text and
+reported back the way the real APIs do, and every call is counted in `stats`.
+With `rpm` set the mock also enforces a requests-per-minute ceiling: every
+response carries `x-ratelimit-*` headers and calls over budget get a 429
+with `retry-after`, like the real APIs under load.
+Prompt caching is simulated as well: OpenAI prompts reuse any earlier prefix
+of 1024+ tokens in 128-token steps, Anthropic ones the prefix up to a
+`cache_control` breakpoint in `system`. Hits are reported in the usage
+fields of the real APIs and counted in `stats["cached_prompt_tokens"]`.
+Both SDKs honour `OPENAI_BASE_URL` / `ANTHROPIC_BASE_URL`, so pointing those
+at the mock is enough to run a pipeline unchanged.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# (endpoint, request payload, prompt text) -> answer text
+Responder = Callable[[str, Dict[str, Any], str], str]
+
+IMAGE_TOKENS = 85
+# Shortest cacheable prefix and cache granularity of OpenAI, in characters
+CACHE_MIN_CHARS = 1024 * 4
+CACHE_STEP_CHARS = 128 * 4
+EMBEDDING_DIMENSIONS = 1536
+
+
+def default_responder(endpoint: str, payload: Dict[str, Any], prompt: str) -> str:
+    return "OK"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), deterministic and cheap."""
+    return max(1, len(text) // 4)
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """Concatenate the text parts of chat messages and count image parts."""
+    texts, images = [], 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part["text"])
+            elif part.get("type") in ("image", "image_url"):
+                images += 1
+    return "\n".join(texts), images
+
+
+class MockLLM:
+    """aiohttp application serving canned LLM completions.
+
+    Args:
+        responder (Responder): Produces the answer text for each call
+        latency (float): Delay added to every call, in seconds
+        rpm (Optional[int]): Requests per minute before answering 429, None for no limit
+    """
+
+    def __init__(self, responder: Responder = default_responder, latency: float = 0.0, rpm: Optional[int] = None):
+        self.responder = responder
+        self.latency = latency
+        self.rpm = rpm
+        self.stats: Counter = Counter()
+        self._prefixes: set = set()
+        self._level = float(rpm or 0)
+        self._updated = time.monotonic()
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024, middlewares=[self.rate_limit])
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/v1/messages", self.messages)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        app.router.add_post("/v1/audio/transcriptions", self.transcriptions)
+        app.router.add_post("/api/generate", self.ollama_generate)
+        app.router.add_post("/api/chat", self.ollama_chat)
+        app.router.add_post("/api/embed", self.ollama_embed)
+        return app
+
+    @web.middleware
+    async def rate_limit(self, request: web.Request, handler) -> web.StreamResponse:
+        """Token bucket of `rpm` requests refilled continuously, as the providers do."""
+        if self.rpm is None:
+            return await handler(request)
+
+        now = time.monotonic()
+        self._level = min(self.rpm, self._level + (now - self._updated) * self.rpm / 60)
+        self._updated = now
+        if self._level < 1:
+            self.stats["requests"] += 1
+            self.stats["rate_limited"] += 1
+            retry_after = (1 - self._level) * 60 / self.rpm
+            return web.json_response(
+                {"error": {"type": "rate_limit_error", "message": "Rate limit reached"}},
+                status=429,
+                headers={**self._limit_headers(), "retry-after": f"{retry_after:.3f}"},
+            )
+
+        self._level -= 1
+        response = await handler(request)
+        response.headers.update(self._limit_headers())
+        return response
+
+    def _limit_headers(self) -> Dict[str, str]:
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(int(self._level)),
+            "x-ratelimit-reset-requests": f"{(self.rpm - self._level) * 60 / self.rpm:.3f}s",
+        }
+
+    async def _complete(self, endpoint: str, payload: Dict[str, Any], prompt: str, images: int = 0) -> Tuple[str, int, int]:
+        self.stats["requests"] += 1
+        self.stats["llm_calls"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        answer = self.responder(endpoint, payload, prompt)
+        prompt_tokens = estimate_tokens(prompt) + images * IMAGE_TOKENS
+        completion_tokens = estimate_tokens(answer)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        return answer, prompt_tokens, completion_tokens
+
+    def clear_prompt_cache(self) -> None:
+        self._prefixes.clear()
+
+    def _prefix_cache(self, text: str, lengths: List[int]) -> int:
+        """Longest of `lengths` whose prefix of `text` was sent before, every prefix is remembered."""
+        digest, start, hit = hashlib.sha256(), 0, 0
+        for length in sorted(lengths):
+            digest.update(text[start:length].encode("utf-8"))
+            start = length
+            key = digest.copy().hexdigest()
+            if key in self._prefixes:
+                hit = length
+            self._prefixes.add(key)
+        return hit
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt, images = _message_text(payload.get("messages", []))
+        answer, prompt_tokens, completion_tokens = await self._complete("chat", payload, prompt, images)
+        cached = self._prefix_cache(prompt, list(range(CACHE_MIN_CHARS, len(prompt) + 1, CACHE_STEP_CHARS)))
+        cached_tokens = estimate_tokens(prompt[:cached]) if cached else 0
+        self.stats["cached_prompt_tokens"] += cached_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": payload.get("model", "mock")}
+
+        if not payload.get("stream"):
+            return web.json_response({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        chunks = [
+            {"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}
+            for piece in _pieces(answer)
+        ]
+        chunks.append({"index": 0, "delta": {}, "finish_reason": "stop"})
+        events = [{**base, "object": "chat.completion.chunk", "choices": [chunk]} for chunk in chunks]
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        return await _sse(request, [(None, event) for event in events], done=True)
+
+    async def messages(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt, images = _message_text(payload.get("messages", []))
+        system = payload.get("system") or ""
+        breakpoints = []
+        if isinstance(system, list):
+            texts = []
+            for block in system:
+                texts.append(block.get("text", ""))
+                if block.get("cache_control"):
+                    breakpoints.append(len("\n".join(texts)))
+            system = "\n".join(texts)
+        answer, input_tokens, output_tokens = await self._complete(
+            "messages", payload, f"{system}\n{prompt}".strip(), images
+        )
+        # The whole prefix up to the last breakpoint is either read from the cache or written to it
+        cache_read = cache_write = 0
+        if breakpoints and breakpoints[-1] >= CACHE_MIN_CHARS:
+            prefix_tokens = min(input_tokens, estimate_tokens(system[:breakpoints[-1]]))
+            if self._prefix_cache(system, breakpoints[-1:]):
+                cache_read = prefix_tokens
+            else:
+                cache_write = prefix_tokens
+        self.stats["cached_prompt_tokens"] += cache_read
+        usage = {
+            "input_tokens": input_tokens - cache_read - cache_write,
+            "output_tokens": output_tokens,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_write,
+        }
+        message = {
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "mock"),
+            "content": [{"type": "text", "text": answer}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        if not payload.get("stream"):
+            return web.json_response(message)
+
+        start = {**message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 0}}
+        events = [
+            ("message_start", {"type": "message_start", "message": start}),
+            ("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+        ]
+        events += [
+            ("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+            for piece in _pieces(answer)
+        ]
+        events += [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": output_tokens}}),
+            ("message_stop", {"type": "message_stop"}),
+        ]
+        return await _sse(request, events)
+
+    async def _embed(self, payload: Dict[str, Any]) -> Tuple[List[List[float]], int]:
+        inputs = payload.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        self.stats["requests"] += 1
+        self.stats["llm_calls"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        tokens = sum(estimate_tokens(str(text)) for text in inputs)
+        self.stats["prompt_tokens"] += tokens
+        dimensions = payload.get("dimensions", EMBEDDING_DIMENSIONS)
+        vectors = []
+        for text in inputs:
+            # Same text, same vector, so retrieval stays deterministic
+            rng = random.Random(hashlib.sha256(str(text).encode()).digest())
+            vectors.append([rng.uniform(-1, 1) for _ in range(dimensions)])
+        return vectors, tokens
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        vectors, tokens = await self._embed(payload)
+        return web.json_response({
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "model": payload.get("model", "mock"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def transcriptions(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        upload = form.get("file")
+        name = getattr(upload, "filename", "audio")
+        payload = {"model": form.get("model"), "filename": name}
+        answer, _, _ = await self._complete("transcription", payload, name)
+        return web.json_response({"text": answer})
+
+    async def ollama_generate(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        prompt = f"{payload.get('system', '')}\n{payload.get('prompt', '')}".strip()
+        answer, prompt_tokens, completion_tokens = await self._complete("generate", payload, prompt)
+        return web.json_response({
+            "model": payload.get("model", "mock"),
+            "response": answer,
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": completion_tokens,
+        })
+
+
+    async def ollama_chat(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        messages = payload.get("messages", [])
+        prompt, _ = _message_text(messages)
+        images = sum(len(message.get("images", [])) for message in messages)
+        answer, prompt_tokens, completion_tokens = await self._complete("chat", payload, prompt, images)
+        return web.json_response({
+            "model": payload.get("model", "mock"),
+            "message": {"role": "assistant", "content": answer},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": completion_tokens,
+        })
+
+    async def ollama_embed(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        vectors, tokens = await self._embed(payload)
+        return web.json_response({"model": payload.get("model", "mock"), "embeddings": vectors, "prompt_eval_count": tokens})
+
+
+def _pieces(text: str, size: int = 16) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+async def _sse(request: web.Request, events: List[Tuple[Any, Dict]], done: bool = False) -> web.StreamResponse:
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for name, data in events:
+        prefix = f"event: {name}\n" if name else ""
+        await response.write(f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+    if done:
+        await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
@@ -0,0 +1,136 @@
+"""Benchmarked pipelines.
+
+Every `prepare` function builds its inputs inside the scratch directory and
+returns the call to time. Imports of the episode modules happen inside
+`prepare`, after the harness pointed the environment at the offline services.
+"""
+import hashlib
+import json
+import os
+import runpy
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmarks.harness import REPO_ROOT, benchmark
+
+TEXT_REPORT = (
+    "Raport z patrolu nocnego, sektor {index}. Czujniki ruchu nie wykryły aktywności. "
+    "Jednostka wróciła do bazy po zakończeniu rutynowej kontroli obwodu.\n"
+)
+
+
+def _png(seed: int, size: int = 32) -> bytes:
+    """Tiny valid PNG filled with a seed-dependent colour."""
+    colour = hashlib.sha256(str(seed).encode()).digest()[:3]
+    raw = b"".join(b"\x00" + colour * size for _ in range(size))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def _classification_responder(endpoint: str, payload: Dict[str, Any], prompt: str) -> str:
+    if endpoint == "transcription":
+        return "Schwytaliśmy intruza przy bramie, przekazano go do przesłuchania."
+    return ("people", "hardware", "other")[int(hashlib.md5(prompt.encode()).hexdigest(), 16) % 3]
+
+
+@benchmark("s02e04_classify_folder", responder=_classification_responder)
+def classify_folder(workdir: Path):
+    """ContentClassifier.classify_folder over 24 txt, 6 mp3 and 6 png files."""
+    folder = workdir / "pliki_z_fabryki"
+    folder.mkdir()
+    for index in range(24):
+        (folder / f"report-{index:02d}.txt").write_text(TEXT_REPORT.format(index=index) * 4, encoding="utf-8")
+    for index in range(6):
+        (folder / f"audio-{index:02d}.mp3").write_bytes(os.urandom(2048))
+        (folder / f"image-{index:02d}.png").write_bytes(_png(index))
+
+    from src.s_02.e_04 import ContentClassifier
+
+    classifier = ContentClassifier(
+        claude_api_key=os.environ["ANTHROPIC_API_KEY"],
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+    )
+    return lambda: classifier.classify_folder(str(folder))
+
+
+@benchmark("s02e02_city_images", responder=lambda endpoint, payload, prompt: "Grudziądz")
+def city_images(workdir: Path):
+    """CityImageAnalyzer.analyze_with_both_models over 4 map fragments."""
+    for index in range(4):
+        (workdir / f"map-{index}.png").write_bytes(_png(index, size=256))
+
+    from src.s_02.e_02 import CityImageAnalyzer
+
+    analyzer = CityImageAnalyzer(str(workdir))
+    return analyzer.analyze_with_both_models
+
+
+def _notes_responder(endpoint: str, payload: Dict[str, Any], prompt: str) -> str:
+    if payload.get("response_format", {}).get("type") in ("json_object", "json_schema"):
+        return json.dumps({f"{index:02d}": f"odpowiedź {index}" for index in range(1, 6)}, ensure_ascii=False)
+    return "Notatka Rafała: przeniosłem się do roku 2019, schronienie znalazłem w jaskini niedaleko Lubawy."
+
+
+@benchmark("s04e05_notes", responder=_notes_responder)
+def notes_pipeline(workdir: Path):
+    """scripts_s4/s04e05.py end to end: 5 page transcriptions, answers and report."""
+    # The script resolves ../data/s04e05 against its working directory
+    data_dir = workdir / "data" / "s04e05"
+    images_dir = data_dir / "notes_images"
+    images_dir.mkdir(parents=True)
+    (data_dir / "notes.pdf").write_bytes(b"%PDF-1.4\n% benchmark placeholder\n")
+    for index in range(1, 6):
+        (images_dir / f"page_{index}.jpg").write_bytes(_png(index, size=128))
+    scripts_dir = workdir / "scripts"
+    scripts_dir.mkdir()
+    os.chdir(scripts_dir)
+
+    import pdf2image  # noqa: F401 fail early with a clear reason when missing
+
+    return lambda: runpy.run_path(str(REPO_ROOT / "scripts_s4" / "s04e05.py"), run_name="__main__")
+
+
+def _questions_responder(endpoint: str, payload: Dict[str, Any], prompt: str) -> str:
+    return json.dumps({"response": ["Odpowiedź zgodna z treścią artykułu."]}, ensure_ascii=False)
+
+
+@benchmark("s05e03_questions_agent", responder=_questions_responder)
+def questions_agent(workdir: Path):
+    """QuestionsAgent.process_all_sources for both question sources in parallel."""
+    data_dir = workdir / "data" / "s05e03"
+    data_dir.mkdir(parents=True)
+    (data_dir / "content.md").write_bytes((REPO_ROOT / "data" / "s05e03" / "content.md").read_bytes())
+    scripts_dir = workdir / "scripts"
+    scripts_dir.mkdir()
+    os.chdir(scripts_dir)
+
+    from src.s_05.e_03 import QuestionsAgent
+
+    agent = QuestionsAgent()
+    sources = [
+        {"task": "Odpowiedz na pytania", "data": ["Data bitwy pod Grunwaldem?", "Stolica Polski?"]},
+        {
+            "task": "Odpowiedz na pytania na podstawie arxiv-draft.html",
+            "data": ["Jakiego modelu użyto w eksperymencie?", "Ile trwało trenowanie?"],
+        },
+    ]
+    return lambda: agent.process_all_sources(sources)
+
+
+@benchmark("s03e02_document_rag", modes=("record", "replay"))
+def document_rag(workdir: Path):
+    """DocumentRAG.query against Pinecone, replayed from a recorded cassette."""
+    from src.s_03.e_02 import DocumentRAG
+
+    rag = DocumentRAG(
+        documents_path=os.getenv("BENCH_RAG_DOCUMENTS", str(workdir)),
+        index_name=os.getenv("BENCH_RAG_INDEX", "ai-devs-s02e03"),
+        refresh=False,
+    )
+    return lambda: rag.query("W raporcie, z którego dnia znajduje się wzmianka o kradzieży prototypu broni?")
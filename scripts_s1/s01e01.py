@@ -2,7 +2,7 @@ import os
 import asyncio
 import httpx
 from bs4 import BeautifulSoup
-from src.s_01.e_01 import extract_question, answer_question
+from src.s_01.e_01 import answer_page
 
 
 async def main():
@@ -17,13 +17,12 @@ async def main():
             response = await client.get(base_url)
             response.raise_for_status()
 
-            question = await extract_question(response.text)
-            if not question:
+            # Question read from the DOM, the model is only asked for the answer
+            answer = await answer_page(response.text)
+            if not answer:
                 print("No question found.")
                 return
 
-            answer = await answer_question(question)
-
             login_response = await client.post(
                 base_url,
                 data={
@@ -1,16 +1,28 @@
+import argparse
 import asyncio
+import json
 import os
 from dotenv import load_dotenv
 
-from src.s_01.e_02 import RobotVerification
+from src.s_01.e_02 import RobotVerification, run_verifications
 
 
 async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=0, help='Load test: run this many dialogues concurrently')
+    parser.add_argument('--concurrency', type=int, default=None, help='Load test: dialogues in flight at once')
+    args = parser.parse_args()
+
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     endpoint = os.getenv("S01E02_ENDPOINT")
 
     verifier = RobotVerification(api_key, endpoint)
+    if args.sessions:
+        report = await run_verifications(verifier, args.sessions, args.concurrency)
+        verifier.logger.info(f"Main: Load test report:\n{json.dumps(report, indent=2)}")
+        return
+
     success = await verifier.verify()
 
     if success:
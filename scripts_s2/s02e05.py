@@ -3,6 +3,7 @@ import requests
 from dotenv import load_dotenv
 from loguru import logger
 
+from src.llm.budget import chunk_text, context_budget, fit_context
 from src.prompt.s02e05 import SYSTEM_TEMPLATE_VISION, SYSTEM_TEMPLATE_CHAT
 from src.s_02.e_05 import (
     aidevs_send_answer,
@@ -63,10 +64,15 @@ def run():
             key, value = line.split("=", 1)  # Split only at the first '='
             questions_dict[key.strip()] = value.strip()
 
+    # The page is the same for every question, keep it the leading (cached) prefix.
+    # Sections least related to a question are dropped only if it outgrows the budget
+    sections = chunk_text(webpage_complete_data, 512)
     answers = {}
     for question_id, question_content in questions_dict.items():
+        budget = context_budget("gpt-4o-mini", None, system_template_chat, question_content)
+        context = "\n\n".join(fit_context(sections, budget, query=question_content))
         response = openai_create(
-            f"{webpage_complete_data}\n{system_template_chat}", question_content
+            f"{context}\n{system_template_chat}", question_content, cache_prefix=True
         )
         answer = response.content
         logger.debug(f"QUESTION: {question_content}\nANSWER: {answer}")
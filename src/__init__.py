@@ -0,0 +1,7 @@
+import os
+
+# CASSETTE_MODE=record|replay|auto routes every episode's HTTP traffic through src.cassette
+if os.getenv("CASSETTE_MODE"):
+    from src.cassette import install_from_env
+
+    install_from_env()
@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from src.cache import DEFAULT_CACHE_DIR
+from src.send_task import QueryResponse, normalize_sql, send_query
+
+MIRROR_PATH = Path(os.getenv("APIDB_MIRROR_PATH", DEFAULT_CACHE_DIR / "apidb_mirror.sqlite"))
+# Layout of the mirrored tables, mirrors of an older layout are pulled again
+MIRROR_VERSION = 2
+
+_TABLE_LIST_PATTERN = re.compile(
+    r"\bfrom\s+(.+?)(?=\s+(?:where|join|inner|left|right|cross|group|order|limit|having|union)\b|\)|$)"
+)
+_JOIN_PATTERN = re.compile(r"\bjoin\s+[`\"]?(\w+)")
+# Columns are mirrored as text without their MySQL types, so ordering and numeric
+# aggregates would compare "10" < "9". Such statements go to the remote database
+_TYPED_PATTERN = re.compile(r"[<>]|\bbetween\b|\border\s+by\b|\b(?:sum|avg|min|max)\s*\(")
+_LITERAL_PATTERN = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")""")
+
+_mirrors: Dict[str, "ApidbMirror"] = {}
+_mirrors_lock = threading.Lock()
+
+
+class ApidbMirror:
+    """Local SQLite snapshot of the remote apidb.
+
+    Each table is pulled once with `select * from <table>` and stored in a
+    SQLite file. Statements that only touch mirrored tables run locally and
+    come back in the same `QueryResponse` shape as the remote endpoint; the
+    rest fall back to `send_query`.
+
+    Values are kept as the strings apidb returns, in `TEXT COLLATE NOCASE`
+    columns so equality and LIKE match case-insensitively like MySQL's default
+    `_ci` collation. Statements whose result depends on column types (ordering,
+    `<`/`>`, numeric aggregates) and statements that find no rows locally are
+    answered by the remote database.
+
+    Args:
+        url (str): apidb endpoint URL
+        apikey (str): AI_DEVS_3API key
+        path (str | Path): Location of the SQLite mirror file
+    """
+
+    def __init__(self, url: str, apikey: str, path: str | Path = MIRROR_PATH):
+        self.url = url
+        self.apikey = apikey
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._snapshotting = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS _mirror_meta (
+                url TEXT NOT NULL,
+                name TEXT NOT NULL,
+                reply TEXT NOT NULL,
+                PRIMARY KEY (url, name)
+            )
+            """
+        )
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < MIRROR_VERSION:
+            self._conn.execute("DELETE FROM _mirror_meta")
+            self._conn.execute(f"PRAGMA user_version = {MIRROR_VERSION}")
+        self._conn.commit()
+
+    @property
+    def tables(self) -> List[str]:
+        """Names of the tables mirrored for this endpoint."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM _mirror_meta WHERE url = ? AND name NOT LIKE '!%'",
+                (self.url,),
+            ).fetchall()
+        return [row["name"] for row in rows]
+
+    def snapshot(self, tables: Optional[List[str]] = None, refresh: bool = False) -> List[str]:
+        """Pull tables from the remote database into the local file.
+
+        Args:
+            tables (Optional[List[str]]): Tables to mirror, all tables from `show tables` when None
+            refresh (bool): Re-download tables that are already mirrored
+
+        Returns:
+            List[str]: Names of the tables pulled in this call
+        """
+        self._snapshotting = True
+        try:
+            return self._snapshot(tables, refresh)
+        finally:
+            self._snapshotting = False
+
+    def _snapshot(self, tables: Optional[List[str]], refresh: bool) -> List[str]:
+        if tables is None:
+            show_tables = send_query(self.url, "show tables", self.apikey, use_cache=not refresh)
+            if show_tables.error != "OK" or show_tables.reply is None:
+                logger.warning(f"Could not list apidb tables: {show_tables.error}")
+                return []
+            self._store_meta("!show tables", show_tables.reply)
+            tables = [next(iter(row.values())) for row in show_tables.reply]
+
+        mirrored = set(self.tables)
+        pulled = []
+        for table in tables:
+            if table in mirrored and not refresh:
+                continue
+
+            rows = send_query(self.url, f"select * from {table}", self.apikey, use_cache=not refresh)
+            create = send_query(self.url, f"show create table {table}", self.apikey, use_cache=not refresh)
+            if rows.error != "OK":
+                logger.warning(f"Could not mirror table {table}: {rows.error}")
+                continue
+
+            self._store_table(table, rows.reply)
+            self._store_meta(f"!show create table {table}", create.reply)
+            pulled.append(table)
+            logger.info(f"Mirrored apidb table {table} ({len(rows.reply)} rows)")
+
+        return pulled
+
+    def query_local(self, query: str) -> Optional[QueryResponse]:
+        """Run `query` against the mirror.
+
+        Returns:
+            Optional[QueryResponse]: Local result, or None when the statement
+            touches tables that are not mirrored or SQLite cannot run it
+        """
+        # While pulling tables every statement must reach the remote
+        if self._snapshotting:
+            return None
+
+        normalized = normalize_sql(query)
+        if normalized.startswith("show"):
+            reply = self._load_meta(f"!{normalized}")
+            return QueryResponse(reply=reply, error="OK") if reply is not None else None
+
+        if not normalized.startswith("select"):
+            return None
+
+        mirrored = set(self.tables)
+        referenced = referenced_tables(normalized)
+        if not mirrored or not referenced <= mirrored:
+            return None
+        if _TYPED_PATTERN.search(_LITERAL_PATTERN.sub("''", normalized)):
+            return None
+
+        try:
+            with self._lock:
+                rows = self._conn.execute(query.strip().rstrip(";")).fetchall()
+        except sqlite3.Error as e:
+            logger.debug(f"Mirror cannot run statement locally ({e}): {query}")
+            return None
+
+        # A collation or type difference must not turn into a confident empty answer
+        if not rows:
+            return None
+
+        # apidb returns every column as a string, keep that shape
+        reply = [
+            {key: None if row[key] is None else str(row[key]) for key in row.keys()}
+            for row in rows
+        ]
+        return QueryResponse(reply=reply, error="OK")
+
+    def query(self, query: str) -> QueryResponse:
+        """Run `query` locally when possible, otherwise on the remote apidb."""
+        local = self.query_local(query)
+        if local is not None:
+            return local
+        return send_query(self.url, query, self.apikey)
+
+    def _store_table(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        columns = list(rows[0].keys()) if rows else []
+        with self._lock:
+            self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            if columns:
+                # TEXT keeps "00123" as sent and `is_active = 1` still matches "1", since the
+                # literal takes the column's affinity. NOCASE matches MySQL's _ci collation
+                column_defs = ", ".join(f'"{column}" TEXT COLLATE NOCASE' for column in columns)
+                self._conn.execute(f'CREATE TABLE "{table}" ({column_defs})')
+                placeholders = ", ".join("?" for _ in columns)
+                self._conn.executemany(
+                    f'INSERT INTO "{table}" VALUES ({placeholders})',
+                    [tuple(row.get(column) for column in columns) for row in rows],
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO _mirror_meta VALUES (?, ?, ?)",
+                (self.url, table, json.dumps(columns)),
+            )
+            self._conn.commit()
+
+    def _store_meta(self, name: str, reply: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO _mirror_meta VALUES (?, ?, ?)",
+                (self.url, name, json.dumps(reply, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def _load_meta(self, name: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reply FROM _mirror_meta WHERE url = ? AND name = ?",
+                (self.url, name),
+            ).fetchone()
+        return json.loads(row["reply"]) if row else None
+
+
+def referenced_tables(query: str) -> set:
+    """Table names referenced in FROM and JOIN clauses of a normalised statement."""
+    tables = set(_JOIN_PATTERN.findall(query))
+    for table_list in _TABLE_LIST_PATTERN.findall(query):
+        for item in table_list.split(","):
+            name = item.strip().split(" ")[0].strip('`"')
+            if name and not name.startswith("("):
+                tables.add(name)
+    return tables
+
+
+def mirror_enabled() -> bool:
+    """Snapshot mode is switched on with APIDB_MIRROR=1."""
+    return os.getenv("APIDB_MIRROR", "").lower() in ("1", "true", "yes")
+
+
+def get_mirror(url: str, apikey: str) -> ApidbMirror:
+    """Return the mirror for `url`, taking the initial snapshot on first use."""
+    with _mirrors_lock:
+        mirror = _mirrors.get(url)
+        if mirror is not None:
+            return mirror
+        mirror = ApidbMirror(url, apikey)
+        _mirrors[url] = mirror
+
+    if not mirror.tables:
+        mirror.snapshot()
+    return mirror
@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+DEFAULT_CACHE_DIR = Path(os.getenv("CACHE_DIR", ".cache"))
+
+
+class SQLiteCache:
+    """Persistent key/value cache stored in a single SQLite file.
+
+    Values are JSON-serialisable objects grouped by namespace. Every entry may
+    carry its own TTL, and the file is kept under `max_bytes` by evicting the
+    least recently used entries first.
+
+    Args:
+        path (str | Path): Location of the SQLite file
+        max_bytes (int): Upper bound for the total size of stored values
+        default_ttl (Optional[float]): TTL in seconds used when `set` gets none,
+            `None` means entries never expire
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: Optional[float] = None,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached value or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, then evict least recently used entries if over budget."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        expires_at = now + ttl if ttl is not None else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), expires_at, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> int:
+        """Drop one entry, or the whole namespace when `key` is None.
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            if key is None:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ?", (namespace,)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Remove every entry from the cache file."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return entry count and total stored bytes."""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT namespace, key, size FROM cache ORDER BY accessed_at ASC"
+        ).fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            total -= size
+            evicted += 1
+        logger.debug(f"Cache {self.path.name}: evicted {evicted} entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
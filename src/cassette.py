@@ -0,0 +1,443 @@
+"""Record/replay layer for outgoing HTTP traffic.
+
+Patches the transports used across the episodes: `httpx` (which also carries
+the OpenAI and Anthropic SDKs), `urllib3` (under `requests` for Ollama and
+Centrala downloads, and under the Pinecone client) and `aiohttp`. Every request/response pair is written to a cassette directory and
+can be served back later without touching the network, so any episode can be
+re-run offline at full speed:
+
+    CASSETTE_MODE=record python -m scripts_s2.s02e04
+    CASSETTE_MODE=replay python -m scripts_s2.s02e04
+
+or from code:
+
+    with use_cassette("s02e04", mode="replay"):
+        ...
+
+Modes: `record` always hits the network and overwrites recordings,
+`replay` only serves recordings and raises `CassetteMiss` on unknown requests,
+`auto` replays what exists and records the rest.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from src.cache import DEFAULT_CACHE_DIR
+
+CASSETTE_DIR = Path(os.getenv("CASSETTE_DIR", DEFAULT_CACHE_DIR / "cassettes"))
+MODES = ("record", "replay", "auto")
+
+# Hop-by-hop and encoding headers no longer match the stored (decoded) body
+_DROPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+_BOUNDARY_PATTERN = re.compile(rb"boundary=([^\s;]+)")
+
+# Request/response counters of the active cassette, read by the benchmarks
+stats: Counter = Counter()
+# Callbacks receiving every recorded or replayed entry, e.g. to sum up token usage
+listeners: List[Callable[[Dict], None]] = []
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class Cassette:
+    """Directory of recorded interactions keyed by a request fingerprint.
+
+    Identical requests made several times (e.g. sampling the same prompt)
+    are stored as a list and replayed in order; the last one repeats once
+    the list is exhausted.
+
+    Args:
+        path (str | Path): Directory holding the recordings
+        mode (str): One of `record`, `replay`, `auto`
+    """
+
+    def __init__(self, path: str | Path, mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        self.path = Path(path)
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._played: Dict[str, int] = defaultdict(int)
+        self._recorded: Dict[str, List[Dict]] = {}
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str]) -> Optional[Dict]:
+        """Return the recorded response for a request, None when it has to go to the network."""
+        key = fingerprint(method, url, body, headers)
+        if self.mode == "record":
+            return None
+
+        with self._lock:
+            entries = self._load(method, url, key)
+            if not entries:
+                if self.mode == "replay":
+                    raise CassetteMiss(f"No recording for {method} {url} in {self.path}")
+                return None
+            index = min(self._played[key], len(entries) - 1)
+            self._played[key] += 1
+        stats["replayed"] += 1
+        for listener in listeners:
+            listener(entries[index])
+        return entries[index]
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        status: int,
+        response_headers: Dict[str, str],
+        content: bytes,
+    ) -> None:
+        """Store one interaction, replacing recordings from earlier sessions."""
+        key = fingerprint(method, url, body, headers)
+        entry = {
+            "method": method,
+            "url": _redact(url),
+            "status": status,
+            "headers": {
+                k: v for k, v in response_headers.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS
+            },
+            "body": _encode_body(content),
+        }
+        with self._lock:
+            # Request headers are never stored, they carry the API keys
+            entries = self._recorded.setdefault(key, [])
+            entries.append(entry)
+            self._file(method, url, key).write_text(
+                json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        stats["recorded"] += 1
+        for listener in listeners:
+            listener(entry)
+
+    def _file(self, method: str, url: str, key: str) -> Path:
+        host = urlsplit(url).hostname or "local"
+        return self.path / f"{method.lower()}_{host}_{key[:20]}.json"
+
+    def _load(self, method: str, url: str, key: str) -> List[Dict]:
+        if key in self._recorded:
+            return self._recorded[key]
+        file = self._file(method, url, key)
+        if not file.exists():
+            return []
+        entries = json.loads(file.read_text(encoding="utf-8"))
+        self._recorded[key] = entries
+        return entries
+
+
+def fingerprint(method: str, url: str, body: Optional[bytes], headers: Dict[str, str]) -> str:
+    """Stable hash of a request.
+
+    JSON bodies are canonicalised (sorted keys) and multipart boundaries are
+    replaced, so the same logical request always maps to the same recording.
+    """
+    body = body or b""
+    content_type = next((v for k, v in headers.items() if k.lower() == "content-type"), "")
+    boundary = _BOUNDARY_PATTERN.search(content_type.encode())
+    if boundary:
+        body = body.replace(boundary.group(1).strip(b'"'), b"BOUNDARY")
+    else:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode()
+        except ValueError:
+            pass
+
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode())
+    digest.update(b"\0")
+    digest.update(url.encode())
+    digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _redact(url: str) -> str:
+    # Centrala puts the API key in the path (data/{key}/...), keep it off the disk
+    apikey = os.getenv("API_KEY")
+    return url.replace(apikey, "<API_KEY>") if apikey else url
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(body: Dict[str, str]) -> bytes:
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    return base64.b64decode(body["base64"])
+
+
+_active: Optional[Cassette] = None
+_installed = False
+_install_lock = threading.Lock()
+
+
+def active() -> Optional[Cassette]:
+    """Cassette currently intercepting traffic, if any."""
+    return _active
+
+
+@contextmanager
+def use_cassette(name: Optional[str] = None, mode: str = "replay", path: str | Path = CASSETTE_DIR) -> Iterator[Cassette]:
+    """Record or replay all HTTP traffic inside the block.
+
+    Args:
+        name (Optional[str]): Sub-directory of `path`, usually the episode name
+        mode (str): One of `record`, `replay`, `auto`
+        path (str | Path): Root directory of the cassettes
+    """
+    global _active
+    install()
+    previous = _active
+    _active = Cassette(Path(path) / name if name else path, mode)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def install_from_env() -> Optional[Cassette]:
+    """Activate a cassette from CASSETTE_MODE / CASSETTE_DIR / CASSETTE_NAME."""
+    global _active
+    mode = os.getenv("CASSETTE_MODE", "").lower()
+    if not mode:
+        return None
+    install()
+    name = os.getenv("CASSETTE_NAME")
+    _active = Cassette(CASSETTE_DIR / name if name else CASSETTE_DIR, mode)
+    logger.info(f"Cassette {mode} mode, recordings in {_active.path}")
+    return _active
+
+
+def install() -> None:
+    """Patch httpx, urllib3 and aiohttp. Idempotent, inert while no cassette is active."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _patch_httpx()
+        _patch_urllib3()
+        _patch_aiohttp()
+        _installed = True
+
+
+def _patch_httpx() -> None:
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    original_send = httpx.Client.send
+    original_async_send = httpx.AsyncClient.send
+
+    def _replayed(request: "httpx.Request", entry: Dict) -> "httpx.Response":
+        return httpx.Response(
+            entry["status"],
+            headers=entry["headers"],
+            content=_decode_body(entry["body"]),
+            request=request,
+        )
+
+    def send(self, request, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return original_send(self, request, **kwargs)
+        body = request.read()
+        entry = cassette.lookup(request.method, str(request.url), body, dict(request.headers))
+        if entry is not None:
+            return _replayed(request, entry)
+        response = original_send(self, request, **kwargs)
+        content = response.read()
+        cassette.record(
+            request.method, str(request.url), body, dict(request.headers),
+            response.status_code, dict(response.headers), content,
+        )
+        return response
+
+    async def async_send(self, request, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return await original_async_send(self, request, **kwargs)
+        body = await request.aread()
+        entry = cassette.lookup(request.method, str(request.url), body, dict(request.headers))
+        if entry is not None:
+            return _replayed(request, entry)
+        response = await original_async_send(self, request, **kwargs)
+        content = await response.aread()
+        cassette.record(
+            request.method, str(request.url), body, dict(request.headers),
+            response.status_code, dict(response.headers), content,
+        )
+        return response
+
+    httpx.Client.send = send
+    httpx.AsyncClient.send = async_send
+
+
+def _patch_urllib3() -> None:
+    # Patched below requests, so Ollama/Centrala calls and SDKs built directly
+    # on urllib3 (Pinecone) share the same hook
+    try:
+        import io
+
+        from urllib3.connectionpool import HTTPConnectionPool
+        from urllib3.response import HTTPResponse
+    except ImportError:
+        return
+
+    original_urlopen = HTTPConnectionPool.urlopen
+
+    def _response(method: str, url: str, status: int, headers: Dict[str, str], content: bytes, preload_content: bool):
+        return HTTPResponse(
+            body=io.BytesIO(content),
+            headers=headers,
+            status=status,
+            preload_content=preload_content,
+            decode_content=False,
+            request_method=method,
+            request_url=url,
+        )
+
+    def urlopen(self, method, url, body=None, headers=None, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return original_urlopen(self, method, url, body=body, headers=headers, **kwargs)
+
+        if hasattr(body, "read"):
+            body = body.read()
+        elif body is not None and not isinstance(body, (bytes, str)):
+            body = b"".join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        port = "" if self.port in (None, 80, 443) else f":{self.port}"
+        full_url = url if url.startswith("http") else f"{self.scheme}://{self.host}{port}{url}"
+        request_headers = dict(headers or {})
+        preload_content = kwargs.get("preload_content", True)
+
+        entry = cassette.lookup(method, full_url, body, request_headers)
+        if entry is not None:
+            return _response(
+                method, full_url, entry["status"], entry["headers"],
+                _decode_body(entry["body"]), preload_content,
+            )
+
+        response = original_urlopen(self, method, url, body=body, headers=headers, **kwargs)
+        content = response.read(decode_content=True) if not preload_content else response.data
+        response.release_conn()
+        response_headers = {
+            k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS
+        }
+        cassette.record(
+            method, full_url, body, request_headers, response.status, response_headers, content,
+        )
+        return _response(method, full_url, response.status, response_headers, content, preload_content)
+
+    HTTPConnectionPool.urlopen = urlopen
+
+
+class _ReplayedAiohttpResponse:
+    """Minimal stand-in for `aiohttp.ClientResponse` built from a recording."""
+
+    def __init__(self, method: str, url: str, entry: Dict):
+        from multidict import CIMultiDict
+        from yarl import URL
+
+        self.method = method
+        self.url = URL(url)
+        self.status = entry["status"]
+        self.reason = ""
+        self.headers = CIMultiDict(entry["headers"])
+        self._body = _decode_body(entry["body"])
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "application/octet-stream").split(";")[0]
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self._body.decode(encoding or "utf-8", errors)
+
+    async def json(self, *, loads=json.loads, **kwargs) -> Any:
+        return loads(self._body.decode("utf-8"))
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            from aiohttp import ClientResponseError
+
+            raise ClientResponseError(None, (), status=self.status, message=self.reason)
+
+    def release(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def wait_for_close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+def _patch_aiohttp() -> None:
+    try:
+        import aiohttp
+        from yarl import URL
+    except ImportError:
+        return
+
+    original_request = aiohttp.ClientSession._request
+
+    async def _request(self, method, str_or_url, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return await original_request(self, method, str_or_url, **kwargs)
+
+        url = str(str_or_url)
+        if kwargs.get("params"):
+            url = str(URL(url).update_query(kwargs["params"]))
+        if kwargs.get("json") is not None:
+            body = json.dumps(kwargs["json"]).encode()
+        elif isinstance(kwargs.get("data"), (bytes, str)):
+            body = kwargs["data"].encode() if isinstance(kwargs["data"], str) else kwargs["data"]
+        elif isinstance(kwargs.get("data"), dict):
+            body = json.dumps(kwargs["data"], sort_keys=True).encode()
+        else:
+            body = None
+
+        entry = cassette.lookup(method, url, body, {})
+        if entry is not None:
+            return _ReplayedAiohttpResponse(method, url, entry)
+        response = await original_request(self, method, str_or_url, **kwargs)
+        content = await response.read()
+        cassette.record(method, url, body, {}, response.status, dict(response.headers), content)
+        return response
+
+    aiohttp.ClientSession._request = _request
@@ -0,0 +1,304 @@
+"""Offline stand-in for the Centrala service.
+
+Serves the routes our scripts talk to (`report`, `apidb`, `people`, `places`,
+`gps`, `data/{key}/...`, `dane/...`, the softo website and the robot's `verify`
+dialogue) from fixture files,
+with configurable artificial latency and error rate. Point `CENTRALA_URL` at it
+to exercise the pipelines and benchmark our own throughput in isolation:
+
+    python -m src.centrala_stub --fixtures data/centrala_stub --port 8000 --latency 0.05
+    CENTRALA_URL=http://127.0.0.1:8000/ python -m scripts_s3.s03e03
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from loguru import logger
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent.parent / "data" / "centrala_stub"
+
+
+@dataclass
+class StubConfig:
+    """Runtime knobs of the stub server.
+
+    Attributes:
+        fixtures (Path): Directory with the fixture files
+        latency (float): Base delay added to every response, in seconds
+        jitter (float): Random extra delay, uniformly drawn from [0, jitter]
+        error_rate (float): Probability of answering with HTTP 503
+        seed (Optional[int]): Seed for latency and error sampling
+    """
+
+    fixtures: Path = DEFAULT_FIXTURES
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+    stats: Counter = field(default_factory=Counter)
+
+
+class CentralaStub:
+    """aiohttp application implementing the Centrala routes from fixtures."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.fixtures = Path(config.fixtures)
+        self.random = random.Random(config.seed)
+        self.reports: list = []
+
+        self.db = self._load_database()
+        self.people = self._load_json("people.json", {})
+        self.places = self._load_json("places.json", {})
+        self.gps = self._load_json("gps.json", {})
+        self.report_answers = self._load_json("report.json", {})
+        self.verify_questions = self._load_json("verify.json", [])
+        # msgID -> expected answer of the open verification dialogues
+        self.dialogues: Dict[str, str] = {}
+
+    def _load_json(self, name: str, default: Any) -> Any:
+        path = self.fixtures / name
+        if not path.exists():
+            return default
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _load_database(self) -> sqlite3.Connection:
+        """Load `apidb.json` ({table: [rows]}) into an in-memory SQLite database."""
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for table, rows in self._load_json("apidb.json", {}).items():
+            columns = list(rows[0].keys()) if rows else ["id"]
+            conn.execute(
+                f'CREATE TABLE "{table}" ({", ".join(f"{c} NUMERIC" for c in columns)})'
+            )
+            conn.executemany(
+                f'INSERT INTO "{table}" VALUES ({", ".join("?" for _ in columns)})',
+                [tuple(row.get(c) for c in columns) for row in rows],
+            )
+        conn.commit()
+        return conn
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        # A single catch-all route, scripts join CENTRALA_URL and endpoints
+        # inconsistently ("//apidb"), so paths are normalised before dispatch
+        app.router.add_route("*", "/{path:.*}", self.dispatch)
+        return app
+
+    async def dispatch(self, request: web.Request) -> web.StreamResponse:
+        segments = [part for part in request.match_info["path"].split("/") if part]
+        route = segments[0] if segments else ""
+        handlers = {
+            ("POST", "report"): self.report,
+            ("POST", "apidb"): self.apidb,
+            ("POST", "people"): self.people_lookup,
+            ("POST", "places"): self.places_lookup,
+            ("POST", "gps"): self.gps_lookup,
+            ("GET", "data"): self.data_file,
+            ("GET", "dane"): self.dane_file,
+            ("GET", "softo"): self.softo_page,
+            ("POST", "verify"): self.verify,
+            ("GET", "_stub"): self.stats,
+        }
+        handler = handlers.get((request.method, route))
+        if handler is None:
+            raise web.HTTPNotFound()
+
+        self.config.stats[route] += 1
+        delay = self.config.latency + self.random.uniform(0, self.config.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if route != "_stub" and self.random.random() < self.config.error_rate:
+            self.config.stats["errors"] += 1
+            return web.json_response({"code": -1, "message": "Injected failure"}, status=503)
+        return await handler(request, segments[1:])
+
+    @staticmethod
+    async def _json_body(request: web.Request) -> Dict:
+        # Some clients post JSON without a content type, parse the raw body
+        raw = await request.read()
+        return json.loads(raw or b"{}")
+
+    async def report(self, request: web.Request, path: List[str]) -> web.Response:
+        body = await self._json_body(request)
+        self.reports.append(body)
+        response = self.report_answers.get(body.get("task"), {"code": 0, "message": "OK"})
+        return web.json_response(response)
+
+    async def apidb(self, request: web.Request, path: List[str]) -> web.Response:
+        query = str((await self._json_body(request)).get("query", "")).strip().rstrip(";")
+        lowered = " ".join(query.lower().split())
+        try:
+            if lowered == "show tables":
+                rows = self.db.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                ).fetchall()
+                reply = [{"Tables_in_banan": row["name"]} for row in rows]
+            elif lowered.startswith("show create table"):
+                table = query.split()[-1].strip("`")
+                row = self.db.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = ?", (table,)
+                ).fetchone()
+                reply = [{"Table": table, "Create Table": row["sql"] if row else ""}]
+            else:
+                rows = self.db.execute(query).fetchall()
+                reply = [
+                    {k: None if row[k] is None else str(row[k]) for k in row.keys()}
+                    for row in rows
+                ]
+        except sqlite3.Error as e:
+            return web.json_response({"reply": None, "error": str(e)})
+        return web.json_response({"reply": reply, "error": "OK"})
+
+    async def _lookup(self, request: web.Request, table: Dict[str, str]) -> web.Response:
+        query = str((await self._json_body(request)).get("query", "")).strip().upper()
+        if query not in table:
+            return web.json_response({"code": -1, "message": "[**RESTRICTED DATA**]"})
+        return web.json_response({"code": 0, "message": table[query]})
+
+    async def people_lookup(self, request: web.Request, path: List[str]) -> web.Response:
+        return await self._lookup(request, self.people)
+
+    async def places_lookup(self, request: web.Request, path: List[str]) -> web.Response:
+        return await self._lookup(request, self.places)
+
+    async def gps_lookup(self, request: web.Request, path: List[str]) -> web.Response:
+        user_id = str((await self._json_body(request)).get("userID", ""))
+        if user_id not in self.gps:
+            return web.json_response({"code": -1, "message": "Unknown user"})
+        return web.json_response({"code": 0, "message": self.gps[user_id]})
+
+    async def verify(self, request: web.Request, path: List[str]) -> web.Response:
+        # READY opens a dialogue with a random question, the next message answers it
+        body = await self._json_body(request)
+        if body.get("text") == "READY":
+            entry = self.random.choice(self.verify_questions) if self.verify_questions else {"question": "", "answer": ""}
+            msg_id = str(self.random.randrange(10**7, 10**8))
+            self.dialogues[msg_id] = entry["answer"]
+            return web.json_response({"text": entry["question"], "msgID": msg_id})
+
+        expected = self.dialogues.pop(str(body.get("msgID")), None)
+        if expected is None or str(expected).lower() not in str(body.get("text", "")).lower():
+            return web.json_response({"code": -1, "text": "NOTOK", "msgID": body.get("msgID")})
+        return web.json_response({"code": 0, "text": "{{FLG:STUBROBOT}}", "msgID": body.get("msgID")})
+
+    def _file_response(self, *parts: str) -> web.StreamResponse:
+        if not parts:
+            raise web.HTTPNotFound()
+        path = self.fixtures.joinpath(*parts).resolve()
+        if not path.is_file() or self.fixtures.resolve() not in path.parents:
+            raise web.HTTPNotFound()
+        return web.FileResponse(path)
+
+    async def data_file(self, request: web.Request, path: List[str]) -> web.StreamResponse:
+        # data/{key}/{name}: the API key segment is ignored, every key sees the same fixtures
+        return self._file_response("data", *path[1:])
+
+    async def dane_file(self, request: web.Request, path: List[str]) -> web.StreamResponse:
+        return self._file_response("dane", *path)
+
+    async def softo_page(self, request: web.Request, path: List[str]) -> web.StreamResponse:
+        name = "/".join(path) or "index"
+        return self._file_response("softo", f"{name}.html")
+
+    async def stats(self, request: web.Request, path: List[str]) -> web.Response:
+        return web.json_response(
+            {"requests": dict(self.config.stats), "reports": self.reports}
+        )
+
+
+def start_in_thread(
+    config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0
+) -> Tuple[str, Callable[[], None]]:
+    """Run the stub on a background thread, used by benchmarks.
+
+    Returns:
+        Tuple[str, Callable[[], None]]: Base URL ending with "/" (ready to use
+        as CENTRALA_URL) and a function that stops the server
+    """
+    return serve_in_thread(CentralaStub(config or StubConfig()).build_app(), host, port)
+
+
+def serve_in_thread(
+    app: web.Application, host: str = "127.0.0.1", port: int = 0
+) -> Tuple[str, Callable[[], None]]:
+    """Serve any aiohttp application on a background thread.
+
+    Returns:
+        Tuple[str, Callable[[], None]]: Base URL ending with "/" and a function
+        that stops the server
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app, access_log=None)
+    started = threading.Event()
+    address: Dict[str, int] = {}
+    errors: List[BaseException] = []
+
+    async def _start():
+        try:
+            await runner.setup()
+            site = web.TCPSite(runner, host, port)
+            await site.start()
+            address["port"] = site._server.sockets[0].getsockname()[1]
+        except BaseException as e:
+            # Port in use, bad host, ...: reported to the caller instead of ending the thread silently
+            errors.append(e)
+            await runner.cleanup()
+        finally:
+            started.set()
+
+    def _run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_start())
+        if errors:
+            loop.close()
+            return
+        loop.run_forever()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    started.wait()
+    if errors:
+        thread.join()
+        raise errors[0]
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://{host}:{address['port']}/", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Centrala stand-in")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="base delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max random extra delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of HTTP 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        fixtures=args.fixtures,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    logger.info(f"Centrala stub on http://{args.host}:{args.port}/ with fixtures from {args.fixtures}")
+    web.run_app(CentralaStub(config).build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Single entry point for LLM calls.
+
+All episodes go through the same process-wide clients, so connections are
+pooled and limits hold across the whole run: per-model request/token budgets
+learned from rate-limit headers, and a per-provider concurrency that starts at
+LLM_MAX_CONCURRENCY and adapts to 429s. Deterministic calls (temperature 0, or
+`cache=True`) are served from a persistent response cache keyed by the full
+request. Prompts that cannot fit the model's context window fail before
+being sent, `src.llm.budget` counts and trims context to a token budget.
+Large stable context belongs in the system prompt with `cache_prefix=True`,
+so repeated calls hit the providers' prompt caches (reported in
+`usage["cached_prompt_tokens"]`). Latency-critical calls can be hedged across
+models with `ahedge`, bulk jobs go through `batch_chat`. Labelled agent replies
+("ACTION: ...") are streamed with `read_fields`, which stops generating once
+the fields the caller acts on are complete. JSON replies are constrained to
+and validated against a pydantic model with `structured`:
+
+    from src.llm import chat, vision
+
+    answer = chat([{"role": "user", "content": "..."}], model="claude-3-5-haiku-latest").text
+"""
+from src.llm.batch import BatchItemError, batch_chat
+from src.llm.budget import ContextWindowExceeded, count_tokens, fit_context, pick_model
+from src.llm.cache import set_namespace_ttl
+from src.llm.clients import (
+    aclose_clients,
+    close_clients,
+    get_anthropic,
+    get_async_anthropic,
+    get_async_openai,
+    get_openai,
+)
+from src.llm.fields import aread_fields, parse_fields, read_fields
+from src.llm.gateway import (
+    achat,
+    aembed,
+    astream_chat,
+    atranscribe,
+    avision,
+    chat,
+    embed,
+    stream_chat,
+    transcribe,
+    usage,
+    vision,
+)
+from src.llm.hedge import ahedge
+from src.llm.schema import StructuredOutputError, astructured, parse_model, parse_response, structured
+from src.llm.types import LLMResponse, Provider, provider_for
+
+__all__ = [
+    "BatchItemError",
+    "ContextWindowExceeded",
+    "LLMResponse",
+    "Provider",
+    "StructuredOutputError",
+    "aclose_clients",
+    "achat",
+    "aembed",
+    "ahedge",
+    "aread_fields",
+    "astream_chat",
+    "astructured",
+    "atranscribe",
+    "avision",
+    "batch_chat",
+    "chat",
+    "close_clients",
+    "count_tokens",
+    "embed",
+    "fit_context",
+    "get_anthropic",
+    "get_async_anthropic",
+    "get_async_openai",
+    "get_openai",
+    "parse_model",
+    "parse_response",
+    "parse_fields",
+    "pick_model",
+    "provider_for",
+    "read_fields",
+    "set_namespace_ttl",
+    "stream_chat",
+    "structured",
+    "transcribe",
+    "usage",
+    "vision",
+]
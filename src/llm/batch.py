@@ -0,0 +1,333 @@
+"""Batch execution of bulk chat jobs.
+
+Non-interactive workloads (one call per line, file or page) hand all their
+requests over at once and get the responses back by id:
+
+    results = batch_chat({"01": messages_1, "02": messages_2}, model="gpt-4o-mini")
+    results["01"].text
+
+The mode comes from the `mode` argument or LLM_BATCH_MODE:
+
+    direct    every request through the gateway, concurrently (default)
+    provider  the provider's batch interface (OpenAI Batch API, Anthropic
+              Message Batches): half the price, finished within 24 hours
+    local     offline stand-in speaking the same file protocol, executed
+              through the gateway, for tests and mock servers
+
+Provider and local batches are written to LLM_BATCH_DIR as JSONL files named
+after their content. The id of a submitted provider batch is kept next to the
+file until its results are collected, so rerunning an interrupted job resumes
+polling instead of paying for the batch again.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from src.cache import DEFAULT_CACHE_DIR
+from src.llm import cache as llm_cache
+from src.llm.budget import check_request
+from src.llm.clients import get_anthropic, get_openai
+from src.llm.gateway import DEFAULT_CHAT_MODEL, build_request, chat, parse_raw_response, record_usage, send_request
+from src.llm.ratelimit import LLM_CONCURRENCY_CEILING
+from src.llm.types import LLMResponse, Provider, provider_for
+
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "direct")
+LLM_BATCH_DIR = Path(os.getenv("LLM_BATCH_DIR", DEFAULT_CACHE_DIR / "batches"))
+LLM_BATCH_POLL = float(os.getenv("LLM_BATCH_POLL", "30"))
+LLM_BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT", str(24 * 3600)))
+
+MODES = ("direct", "provider", "local")
+ENDPOINTS = {
+    Provider.OPENAI: "/v1/chat/completions",
+    Provider.ANTHROPIC: "/v1/messages",
+    Provider.OLLAMA: "/api/chat",
+}
+
+# (custom_id, raw response body or None, error message or None)
+BatchEntry = Tuple[str, Optional[Any], Optional[str]]
+
+
+class BatchItemError(Exception):
+    """One request of a batch failed, the other results are still valid."""
+
+    def __init__(self, custom_id: str, message: str):
+        super().__init__(f"Batch request {custom_id} failed: {message}")
+        self.custom_id = custom_id
+
+
+class BatchBackend(ABC):
+    """Submits a JSONL batch file, reports completion and yields the results."""
+
+    poll_interval = LLM_BATCH_POLL
+    # Whether a batch id stays valid across processes
+    resumable = True
+
+    @abstractmethod
+    def submit(self, path: Path) -> str:
+        """Start processing the batch file at `path`, return the batch id."""
+
+    @abstractmethod
+    def done(self, batch_id: str) -> bool:
+        """Whether the batch finished, successfully or not."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[BatchEntry]:
+        """Result of every request of a finished batch."""
+
+
+class OpenAIBatch(BatchBackend):
+    """OpenAI Batch API: the file is uploaded and processed within 24 hours."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.client = get_openai(api_key)
+
+    def submit(self, path: Path) -> str:
+        with open(path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=ENDPOINTS[Provider.OPENAI],
+            completion_window="24h",
+        )
+        return batch.id
+
+    def done(self, batch_id: str) -> bool:
+        batch = self.client.batches.retrieve(batch_id)
+        logger.debug(f"Batch {batch_id}: {batch.status} {batch.request_counts}")
+        return batch.status in ("completed", "failed", "expired", "cancelled")
+
+    def results(self, batch_id: str) -> Iterator[BatchEntry]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                yield from _parse_output(self.client.files.content(file_id).text)
+
+
+class AnthropicBatch(BatchBackend):
+    """Anthropic Message Batches, the file's bodies are sent as request params."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.client = get_anthropic(api_key)
+
+    def submit(self, path: Path) -> str:
+        requests = [{"custom_id": entry["custom_id"], "params": entry["body"]} for entry in _read_jsonl(path)]
+        return self.client.beta.messages.batches.create(requests=requests).id
+
+    def done(self, batch_id: str) -> bool:
+        batch = self.client.beta.messages.batches.retrieve(batch_id)
+        logger.debug(f"Batch {batch_id}: {batch.processing_status} {batch.request_counts}")
+        return batch.processing_status == "ended"
+
+    def results(self, batch_id: str) -> Iterator[BatchEntry]:
+        for entry in self.client.beta.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, entry.result.message.model_dump(mode="json"), None
+            else:
+                error = getattr(entry.result, "error", None)
+                yield entry.custom_id, None, f"{entry.result.type}: {error}" if error else entry.result.type
+
+
+class LocalBatch(BatchBackend):
+    """Offline stand-in for the provider batch APIs.
+
+    Runs the batch file through the gateway in a background thread and
+    writes an output file in the OpenAI batch format next to it.
+    """
+
+    poll_interval = 0.05
+    resumable = False
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._jobs: Dict[str, Tuple[threading.Thread, Path]] = {}
+
+    def submit(self, path: Path) -> str:
+        batch_id = f"local-{path.stem}"
+        output = path.with_suffix(".output.jsonl")
+        output.unlink(missing_ok=True)
+        thread = threading.Thread(target=self._run, args=(path, output), name=batch_id, daemon=True)
+        self._jobs[batch_id] = (thread, output)
+        thread.start()
+        return batch_id
+
+    def _run(self, path: Path, output: Path) -> None:
+        providers = {endpoint: provider for provider, endpoint in ENDPOINTS.items()}
+
+        def run(entry: Dict[str, Any]) -> Dict[str, Any]:
+            body = entry["body"]
+            try:
+                response = send_request(providers[entry["url"]], body["model"], body, self.api_key)
+            except Exception as e:
+                return {"custom_id": entry["custom_id"], "response": None, "error": {"message": str(e)}}
+            raw = llm_cache.dump_raw(response.raw)
+            return {"custom_id": entry["custom_id"], "response": {"status_code": 200, "body": raw}, "error": None}
+
+        with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY_CEILING) as pool:
+            lines = [json.dumps(line, ensure_ascii=False) for line in pool.map(run, _read_jsonl(path))]
+        partial = output.with_suffix(".tmp")
+        partial.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        partial.replace(output)
+
+    def done(self, batch_id: str) -> bool:
+        thread, output = self._jobs[batch_id]
+        if not thread.is_alive() and not output.exists():
+            raise RuntimeError(f"Local batch {batch_id} stopped without output")
+        return output.exists()
+
+    def results(self, batch_id: str) -> Iterator[BatchEntry]:
+        _, output = self._jobs.pop(batch_id)
+        yield from _parse_output(output.read_text(encoding="utf-8"))
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _parse_output(text: str) -> Iterator[BatchEntry]:
+    """Entries of an output or error file in the OpenAI batch format."""
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            yield entry["custom_id"], None, json.dumps(entry.get("error") or response.get("body"), ensure_ascii=False)
+        else:
+            yield entry["custom_id"], response["body"], None
+
+
+def get_backend(mode: str, provider: Provider, api_key: Optional[str] = None) -> BatchBackend:
+    """Backend for `mode`, Ollama has no batch interface and always runs locally."""
+    if mode == "local" or provider == Provider.OLLAMA:
+        return LocalBatch(api_key)
+    if provider == Provider.ANTHROPIC:
+        return AnthropicBatch(api_key)
+    return OpenAIBatch(api_key)
+
+
+def _execute(backend: BatchBackend, provider: Provider, requests: Dict[str, Dict[str, Any]], name: str) -> Iterator[BatchEntry]:
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINTS[provider], "body": request}, ensure_ascii=False)
+        for custom_id, request in requests.items()
+    ]
+    content = "\n".join(lines) + "\n"
+    LLM_BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = LLM_BATCH_DIR / f"{name}-{hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]}.jsonl"
+    path.write_text(content, encoding="utf-8")
+
+    id_path = path.with_suffix(".id")
+    if backend.resumable and id_path.exists():
+        batch_id = id_path.read_text().strip()
+        logger.info(f"Resuming batch {batch_id} ({len(requests)} requests)")
+    else:
+        batch_id = backend.submit(path)
+        logger.info(f"Submitted batch {batch_id} with {len(requests)} requests from {path}")
+        if backend.resumable:
+            id_path.write_text(batch_id)
+
+    deadline = time.monotonic() + LLM_BATCH_TIMEOUT
+    while not backend.done(batch_id):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} not finished after {LLM_BATCH_TIMEOUT}s, rerun to resume")
+        time.sleep(backend.poll_interval)
+    yield from backend.results(batch_id)
+    id_path.unlink(missing_ok=True)
+
+
+def batch_chat(
+    requests: Mapping[str, List[Dict[str, Any]]],
+    model: str = DEFAULT_CHAT_MODEL,
+    mode: Optional[str] = None,
+    system: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    cache_namespace: str = llm_cache.DEFAULT_NAMESPACE,
+    name: str = "batch",
+    **kwargs,
+) -> Dict[str, LLMResponse | Exception]:
+    """Run many chat completions with the same model and parameters.
+
+    Args:
+        requests (Mapping[str, List[Dict[str, Any]]]): Messages of every request by custom id
+        model (str): Model name, also selects the provider
+        mode (Optional[str]): "direct", "provider" or "local", LLM_BATCH_MODE when None
+        system (Optional[str]): System prompt shared by all requests
+        max_tokens (Optional[int]): Output limit
+        temperature (Optional[float]): Sampling temperature
+        provider (Optional[Provider | str]): Force a provider instead of inferring it
+        api_key (Optional[str]): Key overriding the environment
+        cache (Optional[bool]): Response cache policy, as for `chat`; cached
+            responses are never resubmitted
+        cache_namespace (str): Cache namespace, selects the TTL of the entries
+        name (str): Prefix of the batch file name
+        **kwargs: Passed through to the provider
+
+    Returns:
+        Dict[str, LLMResponse | Exception]: Response or error of every request, in input order
+    """
+    mode = mode or LLM_BATCH_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown batch mode {mode!r}, expected one of {', '.join(MODES)}")
+    options = dict(
+        model=model, system=system, max_tokens=max_tokens, temperature=temperature, provider=provider,
+        api_key=api_key, cache=cache, cache_namespace=cache_namespace, **kwargs,
+    )
+    if mode == "direct":
+        return _run_direct(requests, options)
+
+    provider = provider_for(model, provider)
+    results: Dict[str, LLMResponse | Exception] = {}
+    pending: Dict[str, Dict[str, Any]] = {}
+    keys: Dict[str, str] = {}
+    for custom_id, messages in requests.items():
+        request = build_request(provider, model, messages, system, max_tokens, temperature, dict(kwargs))
+        check_request(request, model)
+        if llm_cache.should_cache(request, cache):
+            keys[custom_id] = llm_cache.cache_key(provider, request)
+            cached = llm_cache.load(provider, keys[custom_id], cache_namespace)
+            if cached is not None:
+                results[custom_id] = cached
+                continue
+        pending[custom_id] = request
+
+    if pending:
+        backend = get_backend(mode, provider, api_key)
+        for custom_id, raw, error in _execute(backend, provider, pending, name):
+            if error is not None:
+                results[custom_id] = BatchItemError(custom_id, error)
+                continue
+            response = parse_raw_response(provider, model, llm_cache.restore_raw(provider, raw))
+            if not isinstance(backend, LocalBatch):
+                # The stand-in went through the gateway, which counted it already
+                record_usage(response)
+            if custom_id in keys:
+                llm_cache.store(keys[custom_id], cache_namespace, response)
+            results[custom_id] = response
+
+    return {
+        custom_id: results.get(custom_id, BatchItemError(custom_id, "no result returned"))
+        for custom_id in requests
+    }
+
+
+def _run_direct(requests: Mapping[str, List[Dict[str, Any]]], options: Dict[str, Any]) -> Dict[str, LLMResponse | Exception]:
+    def run(messages: List[Dict[str, Any]]) -> LLMResponse | Exception:
+        try:
+            return chat(messages, **options)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY_CEILING) as pool:
+        return dict(zip(requests, pool.map(run, requests.values())))
@@ -0,0 +1,324 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from src.llm.ratelimit import estimate_tokens
+from src.llm.types import Provider, base_model, provider_for
+
+# Per-message framing tokens of the chat formats (role markers, separators)
+MESSAGE_OVERHEAD = 4
+IMAGE_TOKENS = 1000
+# Non-OpenAI models are counted with an OpenAI encoding, pad the estimate
+APPROXIMATION_MARGIN = 1.1
+# Without tiktoken data assume dense text, overestimating is the safe side
+FALLBACK_CHARS_PER_TOKEN = 3
+# Optional cap on prompt size per call, below the model's window
+LLM_PROMPT_BUDGET = int(os.getenv("LLM_PROMPT_BUDGET")) if os.getenv("LLM_PROMPT_BUDGET") else None
+
+
+class ContextWindowExceeded(ValueError):
+    """The prompt plus the requested output does not fit the model's window."""
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Size limits and list price (USD per 1M tokens) of a model family."""
+
+    context_window: int
+    max_output: int
+    input_price: float
+    output_price: float
+
+
+# Matched by longest prefix, so dated snapshots share their family's entry
+MODEL_SPECS: Dict[str, ModelSpec] = {
+    "gpt-4o-mini": ModelSpec(128_000, 16_384, 0.15, 0.60),
+    "gpt-4o": ModelSpec(128_000, 16_384, 2.50, 10.00),
+    "gpt-4-turbo": ModelSpec(128_000, 4_096, 10.00, 30.00),
+    "gpt-3.5-turbo": ModelSpec(16_385, 4_096, 0.50, 1.50),
+    "o1-mini": ModelSpec(128_000, 65_536, 3.00, 12.00),
+    "o1": ModelSpec(200_000, 100_000, 15.00, 60.00),
+    "claude-3-5-haiku": ModelSpec(200_000, 8_192, 0.80, 4.00),
+    "claude-3-5-sonnet": ModelSpec(200_000, 8_192, 3.00, 15.00),
+    "claude-3-haiku": ModelSpec(200_000, 4_096, 0.25, 1.25),
+    "claude-3-opus": ModelSpec(200_000, 4_096, 15.00, 75.00),
+}
+
+
+def model_spec(model: str) -> Optional[ModelSpec]:
+    """Limits of `model`, None for models not in MODEL_SPECS (e.g. local Ollama ones).
+
+    Fine-tuned models share the limits of their base model.
+    """
+    model = base_model(model)
+    matches = [prefix for prefix in MODEL_SPECS if model.startswith(prefix)]
+    return MODEL_SPECS[max(matches, key=len)] if matches else None
+
+
+def _encoding_name(model: str) -> str:
+    if provider_for(model) == Provider.OPENAI:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_name_for_model(base_model(model))
+        except KeyError:
+            return "o200k_base"
+    return "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(name: str):
+    import tiktoken
+
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # Encodings are downloaded on first use, offline runs fall back to a heuristic
+        logger.warning(f"tiktoken encoding {name} unavailable, estimating tokens: {e}")
+        return None
+
+
+def _encoding(model: str):
+    return _load_encoding(_encoding_name(model))
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Number of tokens `text` takes for `model`.
+
+    Exact for OpenAI models, an upper estimate for Claude and local models.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // FALLBACK_CHARS_PER_TOKEN + 1
+    tokens = len(encoding.encode(text, disallowed_special=()))
+    if provider_for(model) != Provider.OPENAI:
+        tokens = int(tokens * APPROXIMATION_MARGIN)
+    return tokens
+
+
+def _max_tokens(text: str) -> int:
+    """Upper bound without tokenizing: every token spans at least one UTF-8 byte."""
+    return len(text.encode("utf-8"))
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: str = "gpt-4o-mini", system: Optional[str] = None) -> int:
+    """Prompt size of chat `messages` (text parts counted, images at a flat rate)."""
+    total = count_tokens(system or "", model)
+    for message in messages:
+        total += MESSAGE_OVERHEAD
+        total += IMAGE_TOKENS * len(message.get("images", []))
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content, model)
+            continue
+        for part in content or []:
+            if part.get("type") in ("image", "image_url"):
+                total += IMAGE_TOKENS
+            else:
+                total += count_tokens(part.get("text", ""), model)
+    return total
+
+
+def prompt_budget(model: str, max_tokens: Optional[int] = None, limit: Optional[int] = LLM_PROMPT_BUDGET) -> Optional[int]:
+    """Tokens left for the prompt once the output is reserved.
+
+    Args:
+        model (str): Target model
+        max_tokens (Optional[int]): Reserved output, the model's maximum when None
+        limit (Optional[int]): Own cap for the prompt, LLM_PROMPT_BUDGET by default
+
+    Returns:
+        Optional[int]: Prompt budget, None when the model is unknown and no limit is given
+    """
+    spec = model_spec(model)
+    if spec is None:
+        return limit
+    budget = spec.context_window - (max_tokens or spec.max_output)
+    return min(budget, limit) if limit is not None else budget
+
+
+def context_budget(model: str, max_tokens: Optional[int], *prompt_parts: str) -> Optional[int]:
+    """Tokens left for retrieved context once the fixed `prompt_parts` are counted.
+
+    Args:
+        model (str): Target model
+        max_tokens (Optional[int]): Reserved output
+        *prompt_parts (str): System prompt, instructions, question, ...
+
+    Returns:
+        Optional[int]: Context budget, None when the model is unknown and no cap is set
+    """
+    budget = prompt_budget(model, max_tokens)
+    if budget is None:
+        return None
+    # Small fixed parts are charged at their byte size, sparing the tokenizer
+    fixed = sum(_max_tokens(part) + MESSAGE_OVERHEAD for part in prompt_parts)
+    if fixed > budget // 10:
+        fixed = sum(count_tokens(part, model) + MESSAGE_OVERHEAD for part in prompt_parts)
+    return max(0, budget - fixed)
+
+
+def check_window(messages: List[Dict[str, Any]], model: str, max_tokens: Optional[int] = None, system: Optional[str] = None) -> int:
+    """Count the prompt and fail fast when it cannot fit `model`.
+
+    Returns:
+        int: Prompt tokens
+
+    Raises:
+        ContextWindowExceeded: If prompt and reserved output exceed the window
+    """
+    tokens = count_message_tokens(messages, model, system)
+    budget = prompt_budget(model, max_tokens, limit=None)
+    if budget is not None and tokens > budget:
+        raise ContextWindowExceeded(
+            f"Prompt of {tokens} tokens does not fit {model}: {budget} left after reserving output"
+        )
+    return tokens
+
+
+def check_request(request: Dict[str, Any], model: str) -> None:
+    """Gateway preflight: reject a provider request that cannot fit `model`.
+
+    Only requests whose rough size gets near the window are tokenized, the
+    rest pass on the cheap estimate.
+    """
+    spec = model_spec(model)
+    if spec is None or estimate_tokens(request) < spec.context_window // 4:
+        return
+    max_tokens = request.get("max_tokens") or request.get("options", {}).get("num_predict") or 1
+    system = request.get("system")
+    if isinstance(system, list):
+        system = "\n\n".join(block.get("text", "") for block in system)
+    check_window(request.get("messages", []), model, max_tokens, system)
+
+
+def estimated_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    spec = model_spec(model)
+    if spec is None:
+        return None
+    return (prompt_tokens * spec.input_price + completion_tokens * spec.output_price) / 1_000_000
+
+
+def pick_model(
+    messages: List[Dict[str, Any]],
+    candidates: Sequence[str],
+    max_tokens: Optional[int] = None,
+    system: Optional[str] = None,
+) -> str:
+    """Cheapest of `candidates` whose window fits the prompt and the output.
+
+    Raises:
+        ContextWindowExceeded: If no candidate fits
+    """
+    fitting = []
+    for model in candidates:
+        spec = model_spec(model)
+        if spec is None or (max_tokens or 0) > spec.max_output:
+            continue
+        tokens = count_message_tokens(messages, model, system)
+        if tokens <= prompt_budget(model, max_tokens, limit=None):
+            fitting.append((estimated_cost(model, tokens, max_tokens or spec.max_output), model))
+    if not fitting:
+        raise ContextWindowExceeded(f"Prompt does not fit any of {', '.join(candidates)}")
+    return min(fitting)[1]
+
+
+def chunk_text(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> List[str]:
+    """Split `text` into pieces of at most `max_tokens`, on paragraph boundaries when possible."""
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        tokens = count_tokens(paragraph, model)
+        if tokens > max_tokens:
+            # A single paragraph over budget is cut by lines, then by characters
+            chunks.extend(_flush(current))
+            current, current_tokens = [], 0
+            if "\n" in paragraph:
+                chunks.extend(chunk_text("\n\n".join(paragraph.splitlines()), max_tokens, model))
+            else:
+                chunks.extend(_split_chars(paragraph, max_tokens, model))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.extend(_flush(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    chunks.extend(_flush(current))
+    return chunks
+
+
+def _flush(paragraphs: List[str]) -> List[str]:
+    return ["\n\n".join(paragraphs)] if paragraphs else []
+
+
+def _split_chars(text: str, max_tokens: int, model: str) -> List[str]:
+    size = max(1, len(text) * max_tokens // max(1, count_tokens(text, model)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _terms(text: str) -> set:
+    return {term for term in re.findall(r"\w+", text.lower()) if len(term) > 2}
+
+
+def relevance(chunk: str, query: str) -> float:
+    """Share of the query's terms found in `chunk`, a cheap lexical score."""
+    query_terms = _terms(query)
+    if not query_terms:
+        return 0.0
+    return len(query_terms & _terms(chunk)) / len(query_terms)
+
+
+def fit_context(
+    chunks: Sequence[str],
+    budget: Optional[int],
+    model: str = "gpt-4o-mini",
+    query: Optional[str] = None,
+    separator: str = "\n\n",
+) -> List[str]:
+    """Keep the most valuable chunks that fit `budget` tokens, in their original order.
+
+    Chunks larger than the budget are split first. Value is the lexical
+    relevance to `query`; without a query, later chunks are dropped first.
+
+    Args:
+        chunks (Sequence[str]): Context pieces, e.g. documents or page sections
+        budget (Optional[int]): Tokens available for the joined chunks, None keeps everything
+        model (str): Model whose tokenizer is used
+        query (Optional[str]): Question the context should answer
+        separator (str): Joiner used by the caller, counted against the budget
+
+    Returns:
+        List[str]: Selected chunks
+    """
+    if budget is None:
+        return list(chunks)
+    if sum(map(_max_tokens, chunks)) + _max_tokens(separator) * len(chunks) <= budget:
+        return list(chunks)
+    sizes = [count_tokens(chunk, model) for chunk in chunks]
+    separator_tokens = count_tokens(separator, model)
+    if sum(sizes) + separator_tokens * max(0, len(sizes) - 1) <= budget:
+        return list(chunks)
+
+    pieces: List[str] = []
+    for chunk, size in zip(chunks, sizes):
+        pieces.extend(chunk_text(chunk, budget, model) if size > budget else [chunk])
+    sizes = [count_tokens(piece, model) for piece in pieces]
+
+    order = range(len(pieces))
+    if query:
+        order = sorted(order, key=lambda i: relevance(pieces[i], query), reverse=True)
+    selected, used = set(), 0
+    for i in order:
+        cost = sizes[i] + (separator_tokens if selected else 0)
+        if used + cost <= budget:
+            selected.add(i)
+            used += cost
+
+    dropped = len(pieces) - len(selected)
+    logger.info(f"Context trimmed to {used}/{budget} tokens, dropped {dropped} of {len(pieces)} chunks")
+    return [pieces[i] for i in sorted(selected)]
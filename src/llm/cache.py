@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from src import metrics
+from src.cache import DEFAULT_CACHE_DIR, SQLiteCache
+from src.llm.types import LLMResponse, Provider
+
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_DIR / "llm.sqlite"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL")) if os.getenv("LLM_CACHE_TTL") else None
+DEFAULT_NAMESPACE = "default"
+
+# Per-namespace TTL in seconds, namespaces missing here use LLM_CACHE_TTL
+NAMESPACE_TTLS: Dict[str, Optional[float]] = {}
+
+# Hit/miss counters, read by benchmarks and metrics
+stats: Counter = Counter()
+
+_cache: Optional[SQLiteCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteCache:
+    """Process-wide LLM response cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteCache(LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, default_ttl=LLM_CACHE_TTL)
+    return _cache
+
+
+def set_namespace_ttl(namespace: str, ttl: Optional[float]) -> None:
+    """Expire entries of `namespace` after `ttl` seconds, None keeps them forever."""
+    NAMESPACE_TTLS[namespace] = ttl
+
+
+def cache_enabled() -> bool:
+    return os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def should_cache(request: Dict[str, Any], cache: Optional[bool]) -> bool:
+    """Caching policy for one call.
+
+    Args:
+        request (Dict[str, Any]): Provider request about to be sent
+        cache (Optional[bool]): True opts in regardless of sampling, False opts
+            out, None caches only deterministic calls (temperature 0)
+
+    Returns:
+        bool: Whether the response may be served from / stored in the cache
+    """
+    if cache is False or not cache_enabled():
+        return False
+    if cache:
+        return True
+    temperature = request.get("temperature", request.get("options", {}).get("temperature"))
+    return temperature == 0
+
+
+def cache_key(provider: Provider, request: Dict[str, Any]) -> str:
+    """Content address of a request: model, messages, tools and sampling params."""
+    canonical = json.dumps(
+        {"provider": provider.value, "request": request},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load(provider: Provider, key: str, namespace: str) -> Optional[LLMResponse]:
+    entry = get_llm_cache().get(f"llm:{namespace}", key)
+    if entry is None:
+        stats["misses"] += 1
+        metrics.inc("llm_cache_requests_total", namespace=namespace, result="miss")
+        return None
+    stats["hits"] += 1
+    metrics.inc("llm_cache_requests_total", namespace=namespace, result="hit")
+    logger.debug(f"LLM cache hit in {namespace} for {entry['model']}")
+    return LLMResponse(
+        text=entry["text"],
+        model=entry["model"],
+        provider=provider,
+        prompt_tokens=entry["prompt_tokens"],
+        completion_tokens=entry["completion_tokens"],
+        raw=restore_raw(provider, entry.get("raw")),
+        cached=True,
+    )
+
+
+def store(key: str, namespace: str, response: LLMResponse) -> None:
+    entry = {
+        "text": response.text,
+        "model": response.model,
+        "prompt_tokens": response.prompt_tokens,
+        "completion_tokens": response.completion_tokens,
+        "raw": dump_raw(response.raw),
+    }
+    ttl = NAMESPACE_TTLS.get(namespace, LLM_CACHE_TTL)
+    get_llm_cache().set(f"llm:{namespace}", key, entry, ttl=ttl)
+
+
+def dump_raw(raw: Any) -> Any:
+    # SDK responses are pydantic models, keep them so `.raw` survives a cache hit
+    if hasattr(raw, "model_dump"):
+        return raw.model_dump(mode="json")
+    return raw
+
+
+def restore_raw(provider: Provider, raw: Any) -> Any:
+    if raw is None:
+        return None
+    if provider == Provider.OPENAI:
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate(raw)
+    if provider == Provider.ANTHROPIC:
+        from anthropic.types import Message
+
+        return Message.model_validate(raw)
+    return raw
@@ -0,0 +1,126 @@
+import asyncio
+import atexit
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from anthropic import Anthropic, AsyncAnthropic
+from openai import AsyncOpenAI, OpenAI
+
+from src import metrics
+from src.llm.types import Provider
+
+LLM_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+    keepalive_expiry=60.0,
+)
+# LLM calls are slow by nature, only the connect phase gets a short timeout
+LLM_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# Retries of clients handed out for direct SDK use, same as the SDK default
+SDK_MAX_RETRIES = 2
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[Provider, Optional[str]], object] = {}
+_async_clients: Dict[Tuple[Provider, Optional[str]], object] = {}
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client(provider: Provider, api_key: Optional[str] = None):
+    """Process-wide sync client for `provider`, one per API key.
+
+    Args:
+        provider (Provider): Backend to talk to
+        api_key (Optional[str]): Overrides the key from the environment
+
+    Returns:
+        OpenAI | Anthropic | httpx.Client: SDK client, or a plain httpx client for Ollama
+
+    SDK retries are off here, the gateway retries in step with the rate
+    limiter. `get_openai` & co. give direct SDK users their retries back.
+    """
+    key = (provider, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.Client(limits=LLM_LIMITS, timeout=LLM_TIMEOUT, event_hooks=metrics.http_event_hooks())
+            if provider == Provider.OPENAI:
+                client = OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            elif provider == Provider.ANTHROPIC:
+                client = Anthropic(api_key=api_key, http_client=http_client, max_retries=0)
+            else:
+                http_client.base_url = OLLAMA_BASE_URL
+                client = http_client
+            _clients[key] = client
+    return client
+
+
+def get_async_client(provider: Provider, api_key: Optional[str] = None):
+    """Async counterpart of `get_client`, bound to the running event loop.
+
+    Async clients cannot be shared across loops, so every `asyncio.run`
+    gets a fresh set while calls inside one loop reuse the connections.
+    """
+    key = (provider, api_key)
+    with _lock:
+        _bind_loop()
+        client = _async_clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(limits=LLM_LIMITS, timeout=LLM_TIMEOUT, event_hooks=metrics.async_http_event_hooks())
+            if provider == Provider.OPENAI:
+                client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            elif provider == Provider.ANTHROPIC:
+                client = AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+            else:
+                http_client.base_url = OLLAMA_BASE_URL
+                client = http_client
+            _async_clients[key] = client
+    return client
+
+
+def _bind_loop() -> None:
+    # Called with `_lock` held: drop per-loop state when a new loop is running
+    global _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_loop is not loop:
+        _async_clients.clear()
+        _async_loop = loop
+
+
+def get_openai(api_key: Optional[str] = None) -> OpenAI:
+    return get_client(Provider.OPENAI, api_key).with_options(max_retries=SDK_MAX_RETRIES)
+
+
+def get_async_openai(api_key: Optional[str] = None) -> AsyncOpenAI:
+    return get_async_client(Provider.OPENAI, api_key).with_options(max_retries=SDK_MAX_RETRIES)
+
+
+def get_anthropic(api_key: Optional[str] = None) -> Anthropic:
+    return get_client(Provider.ANTHROPIC, api_key).with_options(max_retries=SDK_MAX_RETRIES)
+
+
+def get_async_anthropic(api_key: Optional[str] = None) -> AsyncAnthropic:
+    return get_async_client(Provider.ANTHROPIC, api_key).with_options(max_retries=SDK_MAX_RETRIES)
+
+
+def close_clients() -> None:
+    """Close pooled sync clients, registered to run at interpreter exit."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients() -> None:
+    """Close async clients of the running loop, call before the loop ends."""
+    with _lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        await (client.aclose() if isinstance(client, httpx.AsyncClient) else client.close())
+
+
+atexit.register(close_clients)
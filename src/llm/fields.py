@@ -0,0 +1,235 @@
+"""Incremental parsing of labelled agent replies.
+
+Agents answer in sections such as
+
+    ACTION: REPAIR
+    REASON: Visible noise in the shadows.
+
+`FieldParser` reads such a reply while it is streamed and reports each field
+once it is complete: single-line fields at the end of their line, multi-line
+ones when the next label starts or the reply ends. `read_fields` stops the
+generation as soon as the fields the caller needs are in, so a controller can
+act on the ACTION line without paying for (or waiting on) the reasoning:
+
+    fields = read_fields(messages, ("ACTION", "REASON"), required=("ACTION",), model="claude-3-5-haiku-latest")
+    fields["ACTION"]
+"""
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.llm import cache as llm_cache
+from src.llm.gateway import DEFAULT_CHAT_MODEL, astream_chat, build_request, stream_chat
+from src.llm.types import LLMResponse, Provider, provider_for
+
+Field = Tuple[str, str]
+
+
+class FieldParser:
+    """Line-based parser of "NAME: value" sections fed in arbitrary pieces.
+
+    Labels are recognised at the start of a line, after any list or markdown
+    decoration ("- ", "**", "1. "). Text outside a known field is ignored,
+    a field given twice keeps its first value.
+
+    Args:
+        fields (Sequence[str]): Labels to look for
+        multiline (Sequence[str]): Labels whose value runs until the next label,
+            the others end with their line (or the next non-empty one when the
+            label line holds no value)
+    """
+
+    def __init__(self, fields: Sequence[str], multiline: Sequence[str] = ()):
+        names = "|".join(re.escape(name) for name in sorted(fields, key=len, reverse=True))
+        self._label = re.compile(rf"^[\W\d_]*?\b(?P<name>{names})\b[*_\s]*:[*_\s]*(?P<value>.*)$")
+        self._multiline = set(multiline)
+        self._buffer = ""
+        self._current: Optional[str] = None
+        self._lines: List[str] = []
+        self.values: Dict[str, str] = {}
+
+    def feed(self, text: str) -> List[Field]:
+        """Add streamed text, return the fields it completed."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        completed: List[Field] = []
+        for line in lines:
+            completed.extend(self._line(line.rstrip("\r")))
+        return completed
+
+    def close(self) -> List[Field]:
+        """End of the reply: complete the last line and the open field."""
+        completed = self._line(self._buffer) if self._buffer else []
+        self._buffer = ""
+        return completed + self._finish()
+
+    def complete(self, names: Sequence[str]) -> bool:
+        return all(name in self.values for name in names)
+
+    def _line(self, line: str) -> List[Field]:
+        match = self._label.match(line)
+        if match:
+            completed = self._finish()
+            self._current, value = match.group("name"), match.group("value").strip()
+            self._lines = [value] if value else []
+            if value and self._current not in self._multiline:
+                completed += self._finish()
+            return completed
+        if self._current is None:
+            return []
+        if self._current in self._multiline:
+            self._lines.append(line)
+            return []
+        if line.strip():
+            self._lines = [line.strip()]
+            return self._finish()
+        return []
+
+    def _finish(self) -> List[Field]:
+        name, self._current = self._current, None
+        if name is None or name in self.values:
+            return []
+        self.values[name] = "\n".join(self._lines).strip()
+        return [(name, self.values[name])]
+
+
+def parse_fields(text: str, fields: Sequence[str], multiline: Sequence[str] = ()) -> Dict[str, str]:
+    """Fields of a complete reply, missing ones are left out."""
+    parser = FieldParser(fields, multiline)
+    parser.feed(text)
+    parser.close()
+    return parser.values
+
+
+def stream_fields(messages: List[Dict[str, Any]], fields: Sequence[str], multiline: Sequence[str] = (), **kwargs) -> Iterator[Field]:
+    """Stream a completion and yield (name, value) of each field once complete.
+
+    Closing the generator stops the generation, see `stream_chat` for `kwargs`.
+    """
+    parser = FieldParser(fields, multiline)
+    stream = stream_chat(messages, **kwargs)
+    try:
+        for text in stream:
+            yield from parser.feed(text)
+        yield from parser.close()
+    finally:
+        stream.close()
+
+
+async def astream_fields(
+    messages: List[Dict[str, Any]], fields: Sequence[str], multiline: Sequence[str] = (), **kwargs
+) -> AsyncIterator[Field]:
+    """Async version of `stream_fields`."""
+    parser = FieldParser(fields, multiline)
+    stream = astream_chat(messages, **kwargs)
+    try:
+        async for text in stream:
+            for field in parser.feed(text):
+                yield field
+        for field in parser.close():
+            yield field
+    finally:
+        await stream.aclose()
+
+
+def _cache_key(
+    provider: Provider,
+    model: str,
+    messages: List[Dict[str, Any]],
+    fields: Sequence[str],
+    required: Optional[Sequence[str]],
+    options: Dict[str, Any],
+    cache: Optional[bool],
+) -> Optional[str]:
+    kwargs = dict(options)
+    system, max_tokens, temperature = kwargs.pop("system", None), kwargs.pop("max_tokens", None), kwargs.pop("temperature", None)
+    cache_prefix = kwargs.pop("cache_prefix", False)
+    kwargs.pop("api_key", None)
+    request = build_request(provider, model, messages, system, max_tokens, temperature, kwargs, cache_prefix)
+    if not llm_cache.should_cache(request, cache):
+        return None
+    # A reply cut off after `required` answers only that question, key it apart from full ones
+    return llm_cache.cache_key(provider, {**request, "fields": list(fields), "required": list(required or ())})
+
+
+def read_fields(
+    messages: List[Dict[str, Any]],
+    fields: Sequence[str],
+    required: Optional[Sequence[str]] = None,
+    multiline: Sequence[str] = (),
+    model: str = DEFAULT_CHAT_MODEL,
+    provider: Optional[Provider | str] = None,
+    cache: Optional[bool] = None,
+    cache_namespace: str = llm_cache.DEFAULT_NAMESPACE,
+    **kwargs,
+) -> Dict[str, str]:
+    """Fields of a streamed reply, generation stops once `required` are complete.
+
+    Args:
+        messages (List[Dict[str, Any]]): OpenAI-style messages, as for `chat`
+        fields (Sequence[str]): Labels to parse
+        required (Optional[Sequence[str]]): Labels the caller acts on, None reads the whole reply
+        multiline (Sequence[str]): Labels whose value may span lines
+        model (str): Model name, also selects the provider
+        provider (Optional[Provider | str]): Force a provider instead of inferring it
+        cache (Optional[bool]): Response cache policy, as for `chat`
+        cache_namespace (str): Cache namespace, selects the TTL of the entry
+        **kwargs: Passed to `stream_chat` (system, max_tokens, temperature, ...)
+
+    Returns:
+        Dict[str, str]: Parsed fields, labels missing from the reply are left out
+    """
+    provider = provider_for(model, provider)
+    key = _cache_key(provider, model, messages, fields, required, kwargs, cache)
+    if key is not None:
+        cached = llm_cache.load(provider, key, cache_namespace)
+        if cached is not None:
+            return json.loads(cached.text)
+
+    values: Dict[str, str] = {}
+    stream = stream_fields(messages, fields, multiline, model=model, provider=provider, **kwargs)
+    try:
+        for name, value in stream:
+            values[name] = value
+            if required and all(name in values for name in required):
+                break
+    finally:
+        stream.close()
+
+    if key is not None:
+        llm_cache.store(key, cache_namespace, LLMResponse(json.dumps(values, ensure_ascii=False), model, provider))
+    return values
+
+
+async def aread_fields(
+    messages: List[Dict[str, Any]],
+    fields: Sequence[str],
+    required: Optional[Sequence[str]] = None,
+    multiline: Sequence[str] = (),
+    model: str = DEFAULT_CHAT_MODEL,
+    provider: Optional[Provider | str] = None,
+    cache: Optional[bool] = None,
+    cache_namespace: str = llm_cache.DEFAULT_NAMESPACE,
+    **kwargs,
+) -> Dict[str, str]:
+    """Async version of `read_fields`."""
+    provider = provider_for(model, provider)
+    key = _cache_key(provider, model, messages, fields, required, kwargs, cache)
+    if key is not None:
+        cached = llm_cache.load(provider, key, cache_namespace)
+        if cached is not None:
+            return json.loads(cached.text)
+
+    values: Dict[str, str] = {}
+    stream = astream_fields(messages, fields, multiline, model=model, provider=provider, **kwargs)
+    try:
+        async for name, value in stream:
+            values[name] = value
+            if required and all(name in values for name in required):
+                break
+    finally:
+        await stream.aclose()
+
+    if key is not None:
+        llm_cache.store(key, cache_namespace, LLMResponse(json.dumps(values, ensure_ascii=False), model, provider))
+    return values
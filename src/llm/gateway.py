@@ -0,0 +1,771 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from src import metrics
+from src.llm import cache as llm_cache
+from src.llm.budget import check_request, count_tokens
+from src.llm.clients import get_async_client, get_client
+from src.llm.latency import get_latency
+from src.llm.ratelimit import backoff, error_status, estimate_tokens, get_governor, get_limiter
+from src.llm.types import LLMResponse, Provider, provider_for
+from src.singleflight import SingleFlight
+
+ImageInput = bytes | str | Path
+
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+DEFAULT_VISION_MODEL = "gpt-4o"
+DEFAULT_TRANSCRIBE_MODEL = "whisper-1"
+DEFAULT_EMBED_MODEL = "text-embedding-3-small"
+
+_flight = SingleFlight("llm")
+
+# Token usage of every call sent upstream: prompt_tokens, cached_prompt_tokens, completion_tokens
+usage: Counter = Counter()
+metrics.collect("llm_tokens_total", usage, "Tokens of all LLM calls sent upstream")
+
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+)
+
+
+def build_request(
+    provider: Provider,
+    model: str,
+    messages: List[Dict[str, Any]],
+    system: Optional[str],
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    extra: Dict[str, Any],
+    cache_prefix: bool = False,
+) -> Dict[str, Any]:
+    """Translate OpenAI-style chat arguments into the provider's request.
+
+    With `cache_prefix` the system prompt is marked as a cache breakpoint for
+    Anthropic. OpenAI and Ollama reuse a repeated prefix on their own, there
+    it only matters that the stable content comes first.
+    """
+    system_parts = [m["content"] for m in messages if m["role"] == "system"]
+    if system:
+        system_parts.insert(0, system)
+    chat_messages = [m for m in messages if m["role"] != "system"]
+
+    if provider == Provider.ANTHROPIC:
+        request = {"model": model, "max_tokens": max_tokens or 1024, "messages": chat_messages, **extra}
+        if system_parts:
+            request["system"] = "\n\n".join(system_parts)
+            if cache_prefix:
+                request["system"] = [{"type": "text", "text": request["system"], "cache_control": {"type": "ephemeral"}}]
+    elif provider == Provider.OPENAI:
+        system_messages = [{"role": "system", "content": "\n\n".join(system_parts)}] if system_parts else []
+        request = {"model": model, "messages": system_messages + chat_messages, **extra}
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+    else:
+        system_messages = [{"role": "system", "content": "\n\n".join(system_parts)}] if system_parts else []
+        options = dict(extra.pop("options", {}))
+        if max_tokens is not None:
+            options["num_predict"] = max_tokens
+        request = {"model": model, "messages": system_messages + chat_messages, "stream": False, "options": options, **extra}
+        if temperature is not None:
+            options["temperature"] = temperature
+        return request
+
+    if temperature is not None:
+        request["temperature"] = temperature
+    return request
+
+
+def parse_raw_response(provider: Provider, model: str, raw: Any) -> LLMResponse:
+    """Text and token usage of a provider's completion, as returned by its SDK or Ollama."""
+    if provider == Provider.ANTHROPIC:
+        text = "".join(block.text for block in raw.content if block.type == "text")
+        # input_tokens excludes what was read from or written to the prompt cache
+        cache_read = getattr(raw.usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(raw.usage, "cache_creation_input_tokens", None) or 0
+        prompt_tokens = raw.usage.input_tokens + cache_read + cache_write
+        return LLMResponse(text, raw.model, provider, prompt_tokens, raw.usage.output_tokens, raw, cached_prompt_tokens=cache_read)
+    if provider == Provider.OPENAI:
+        usage = raw.usage
+        details = usage.prompt_tokens_details if usage else None
+        return LLMResponse(
+            raw.choices[0].message.content or "",
+            raw.model,
+            provider,
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0,
+            raw,
+            cached_prompt_tokens=(details.cached_tokens or 0) if details else 0,
+        )
+    return LLMResponse(
+        raw["message"]["content"],
+        raw.get("model", model),
+        provider,
+        raw.get("prompt_eval_count", 0),
+        raw.get("eval_count", 0),
+        raw,
+    )
+
+
+def record_usage(response: LLMResponse) -> None:
+    """Add the tokens of `response` to `usage` and the token metrics."""
+    usage["prompt_tokens"] += response.prompt_tokens
+    usage["cached_prompt_tokens"] += response.cached_prompt_tokens
+    usage["completion_tokens"] += response.completion_tokens
+    labels = {"provider": response.provider, "model": response.model}
+    metrics.observe("llm_prompt_tokens", response.prompt_tokens, **labels)
+    metrics.observe("llm_completion_tokens", response.completion_tokens, **labels)
+    if response.cached_prompt_tokens:
+        logger.debug(f"{response.model}: {response.cached_prompt_tokens}/{response.prompt_tokens} prompt tokens from prefix cache")
+
+
+def _record_call(provider: Provider, model: str, request: Dict[str, Any], response: LLMResponse, started: float) -> None:
+    seconds = time.monotonic() - started
+    get_latency(provider, model).record(seconds)
+    metrics.observe("llm_latency_seconds", seconds, provider=provider, model=model)
+    metrics.sample_generation(
+        model, request.get("messages"), response.text, response.prompt_tokens, response.completion_tokens, seconds,
+        metadata={"provider": provider.value},
+    )
+
+
+def chat(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_CHAT_MODEL,
+    system: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    cache_namespace: str = llm_cache.DEFAULT_NAMESPACE,
+    cache_prefix: bool = False,
+    **kwargs,
+) -> LLMResponse:
+    """Run a chat completion on the provider serving `model`.
+
+    Args:
+        messages (List[Dict[str, Any]]): OpenAI-style messages, system messages
+            are moved to the `system` parameter for Anthropic
+        model (str): Model name, also selects the provider
+        system (Optional[str]): System prompt placed before any system messages
+        max_tokens (Optional[int]): Output limit, Anthropic defaults to 1024
+        temperature (Optional[float]): Sampling temperature
+        provider (Optional[Provider | str]): Force a provider instead of inferring it
+        api_key (Optional[str]): Key overriding the environment
+        cache (Optional[bool]): Response cache policy, None caches only
+            temperature 0 calls, True opts in for sampled calls, False skips it.
+            Cached calls are coalesced with identical ones already in flight
+        cache_namespace (str): Cache namespace, selects the TTL of the entry
+        cache_prefix (bool): Mark the system prompt as a reusable prefix for the
+            provider's prompt cache; put large stable context there and the
+            per-call part in the messages
+        **kwargs: Passed through to the provider (tools, response_format, ...)
+
+    Returns:
+        LLMResponse: Text and token usage of the completion, including
+            `cached_prompt_tokens` read from the prompt cache
+
+    Raises:
+        ContextWindowExceeded: If the prompt cannot fit the model, before anything is sent
+    """
+    provider = provider_for(model, provider)
+    request = build_request(provider, model, messages, system, max_tokens, temperature, kwargs, cache_prefix)
+    check_request(request, model)
+    if not llm_cache.should_cache(request, cache):
+        return send_request(provider, model, request, api_key)
+
+    # Cacheable calls are also coalesced: identical requests in flight share one call
+    key = llm_cache.cache_key(provider, request)
+
+    def cached_send() -> LLMResponse:
+        response = llm_cache.load(provider, key, cache_namespace)
+        if response is None:
+            response = send_request(provider, model, request, api_key)
+            llm_cache.store(key, cache_namespace, response)
+        return response
+
+    return _flight.call(key, cached_send)
+
+
+def send_request(provider: Provider, model: str, request: Dict[str, Any], api_key: Optional[str]) -> LLMResponse:
+    """Send a request made by `build_request`, bypassing the response cache.
+
+    The call goes through the rate limiter and concurrency governor and is
+    retried on 429 / 5xx; usage and latency are recorded.
+    """
+    client = get_client(provider, api_key)
+
+    def post() -> Tuple[Any, Any]:
+        if provider == Provider.OLLAMA:
+            http_response = client.post("/api/chat", json=request)
+            http_response.raise_for_status()
+            return http_response.json(), http_response.headers
+        endpoint = client.messages if provider == Provider.ANTHROPIC else client.chat.completions
+        raw_response = endpoint.with_raw_response.create(**request)
+        return raw_response.parse(), raw_response.headers
+
+    tokens = estimate_tokens(request)
+    started = time.monotonic()
+    response = parse_raw_response(provider, model, _call(provider, model, tokens, post))
+    _record_call(provider, model, request, response, started)
+    record_usage(response)
+    get_limiter(provider, model).settle(tokens, response.prompt_tokens + response.completion_tokens)
+    return response
+
+
+def _call(provider: Provider, model: str, tokens: int, send: Callable[[], Tuple[Any, Any]], hold: bool = False) -> Any:
+    """Run `send` inside the rate limiter and concurrency governor, retrying on 429 / 5xx.
+
+    With `hold` the governor slot stays taken once `send` succeeds, for streams whose
+    body is read afterwards; the caller gives it back with `get_governor(provider).release()`.
+    """
+    limiter, governor = get_limiter(provider, model), get_governor(provider)
+    attempt = 0
+    while True:
+        try:
+            governor.acquire()
+            try:
+                limiter.acquire(tokens)
+                raw, headers = send()
+            except BaseException:
+                governor.release()
+                raise
+            if not hold:
+                governor.release()
+        except Exception as e:
+            delay = backoff(e, attempt, limiter, governor)
+            if delay is None:
+                _count_error(provider, model, e)
+                raise
+            metrics.inc("llm_retries_total", provider=provider, model=model)
+            attempt += 1
+            time.sleep(delay)
+            continue
+        limiter.learn(headers)
+        governor.on_success()
+        metrics.inc("llm_calls_total", provider=provider, model=model)
+        return raw
+
+
+def _count_error(provider: Provider, model: str, error: BaseException) -> None:
+    status, _ = error_status(error)
+    metrics.inc("llm_errors_total", provider=provider, model=model, error=status or type(error).__name__)
+
+
+async def achat(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_CHAT_MODEL,
+    system: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[bool] = None,
+    cache_namespace: str = llm_cache.DEFAULT_NAMESPACE,
+    cache_prefix: bool = False,
+    **kwargs,
+) -> LLMResponse:
+    """Async version of `chat`."""
+    provider = provider_for(model, provider)
+    request = build_request(provider, model, messages, system, max_tokens, temperature, kwargs, cache_prefix)
+    check_request(request, model)
+    if not llm_cache.should_cache(request, cache):
+        return await asend_request(provider, model, request, api_key)
+
+    key = llm_cache.cache_key(provider, request)
+
+    async def cached_send() -> LLMResponse:
+        response = llm_cache.load(provider, key, cache_namespace)
+        if response is None:
+            response = await asend_request(provider, model, request, api_key)
+            llm_cache.store(key, cache_namespace, response)
+        return response
+
+    return await _flight.do(key, cached_send)
+
+
+async def asend_request(provider: Provider, model: str, request: Dict[str, Any], api_key: Optional[str]) -> LLMResponse:
+    """Async version of `send_request`."""
+    client = get_async_client(provider, api_key)
+
+    async def post() -> Tuple[Any, Any]:
+        if provider == Provider.OLLAMA:
+            http_response = await client.post("/api/chat", json=request)
+            http_response.raise_for_status()
+            return http_response.json(), http_response.headers
+        endpoint = client.messages if provider == Provider.ANTHROPIC else client.chat.completions
+        raw_response = await endpoint.with_raw_response.create(**request)
+        return raw_response.parse(), raw_response.headers
+
+    tokens = estimate_tokens(request)
+    started = time.monotonic()
+    response = parse_raw_response(provider, model, await _acall(provider, model, tokens, post))
+    _record_call(provider, model, request, response, started)
+    record_usage(response)
+    get_limiter(provider, model).settle(tokens, response.prompt_tokens + response.completion_tokens)
+    return response
+
+
+async def _acall(
+    provider: Provider, model: str, tokens: int, send: Callable[[], Awaitable[Tuple[Any, Any]]], hold: bool = False
+) -> Any:
+    """Async version of `_call`."""
+    limiter, governor = get_limiter(provider, model), get_governor(provider)
+    attempt = 0
+    while True:
+        try:
+            await governor.aacquire()
+            try:
+                await limiter.aacquire(tokens)
+                raw, headers = await send()
+            except BaseException:
+                governor.release()
+                raise
+            if not hold:
+                governor.release()
+        except Exception as e:
+            delay = backoff(e, attempt, limiter, governor)
+            if delay is None:
+                _count_error(provider, model, e)
+                raise
+            metrics.inc("llm_retries_total", provider=provider, model=model)
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        limiter.learn(headers)
+        governor.on_success()
+        metrics.inc("llm_calls_total", provider=provider, model=model)
+        return raw
+
+
+class _StreamState:
+    """Text and usage collected from the events of one streamed completion."""
+
+    def __init__(self, provider: Provider, model: str):
+        self.provider = provider
+        self.model = model
+        self.parts: List[str] = []
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.finished = False
+
+    def update(self, event: Any) -> str:
+        """Take in one stream event, return the text it adds."""
+        text = ""
+        if self.provider == Provider.ANTHROPIC:
+            if event.type == "message_start":
+                usage = event.message.usage
+                self.cached_prompt_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+                cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+                self.prompt_tokens = usage.input_tokens + self.cached_prompt_tokens + cache_write
+                self.model = event.message.model
+            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                text = event.delta.text
+            elif event.type == "message_delta":
+                self.completion_tokens = event.usage.output_tokens
+            elif event.type == "message_stop":
+                self.finished = True
+        elif self.provider == Provider.OPENAI:
+            self.model = event.model or self.model
+            if event.choices:
+                text = event.choices[0].delta.content or ""
+            if event.usage:
+                details = event.usage.prompt_tokens_details
+                self.prompt_tokens = event.usage.prompt_tokens
+                self.completion_tokens = event.usage.completion_tokens
+                self.cached_prompt_tokens = (details.cached_tokens or 0) if details else 0
+                self.finished = True
+        else:
+            if not event.strip():
+                return ""
+            chunk = json.loads(event)
+            text = chunk.get("message", {}).get("content", "")
+            if chunk.get("done"):
+                self.prompt_tokens = chunk.get("prompt_eval_count", 0)
+                self.completion_tokens = chunk.get("eval_count", 0)
+                self.finished = True
+        self.parts.append(text)
+        return text
+
+    def response(self, request: Dict[str, Any]) -> LLMResponse:
+        # A stream closed early never reports usage, count what was sent and received
+        text = "".join(self.parts)
+        if not self.prompt_tokens:
+            self.prompt_tokens = estimate_tokens({**request, "max_tokens": 0, "options": {}})
+        if not self.completion_tokens:
+            self.completion_tokens = count_tokens(text, self.model)
+        return LLMResponse(
+            text, self.model, self.provider, self.prompt_tokens, self.completion_tokens,
+            cached_prompt_tokens=self.cached_prompt_tokens,
+        )
+
+
+def _stream_request(provider: Provider, request: Dict[str, Any]) -> Dict[str, Any]:
+    if provider == Provider.OPENAI:
+        return {**request, "stream": True, "stream_options": {"include_usage": True}}
+    return {**request, "stream": True}
+
+
+def _finish_stream(state: _StreamState, request: Dict[str, Any], tokens: int, started: float) -> None:
+    response = state.response(request)
+    if state.finished:
+        # Streams stopped by the caller would skew the latency window used for hedging
+        _record_call(state.provider, state.model, request, response, started)
+    else:
+        logger.debug(f"{state.model}: stream stopped after {response.completion_tokens} completion tokens")
+    record_usage(response)
+    get_limiter(state.provider, state.model).settle(tokens, response.prompt_tokens + response.completion_tokens)
+
+
+def stream_chat(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_CHAT_MODEL,
+    system: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+    cache_prefix: bool = False,
+    **kwargs,
+) -> Iterator[str]:
+    """Stream a chat completion, yielding the text as it is generated.
+
+    Closing the generator early (e.g. breaking out of the loop) aborts the
+    request, so the provider stops generating. Streamed calls bypass the
+    response cache, `src.llm.fields.read_fields` caches what it parsed.
+
+    Args:
+        Same as `chat`, without the response cache options
+
+    Yields:
+        str: Pieces of the completion text
+    """
+    provider = provider_for(model, provider)
+    request = _stream_request(provider, build_request(provider, model, messages, system, max_tokens, temperature, kwargs, cache_prefix))
+    check_request(request, model)
+    client = get_client(provider, api_key)
+
+    def post() -> Tuple[Any, Any]:
+        if provider == Provider.OLLAMA:
+            http_response = client.send(client.build_request("POST", "/api/chat", json=request), stream=True)
+            try:
+                http_response.raise_for_status()
+            except Exception:
+                http_response.close()
+                raise
+            return http_response, http_response.headers
+        endpoint = client.messages if provider == Provider.ANTHROPIC else client.chat.completions
+        raw_response = endpoint.with_raw_response.create(**request)
+        return raw_response.parse(), raw_response.headers
+
+    tokens = estimate_tokens(request)
+    started = time.monotonic()
+    # The body is read after `post` returns, the stream keeps its governor slot until closed
+    stream = _call(provider, model, tokens, post, hold=True)
+    state = _StreamState(provider, model)
+    try:
+        for event in stream.iter_lines() if provider == Provider.OLLAMA else stream:
+            text = state.update(event)
+            if text:
+                yield text
+    finally:
+        try:
+            stream.close()
+        finally:
+            get_governor(provider).release()
+        _finish_stream(state, request, tokens, started)
+
+
+async def astream_chat(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_CHAT_MODEL,
+    system: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+    cache_prefix: bool = False,
+    **kwargs,
+) -> AsyncIterator[str]:
+    """Async version of `stream_chat`, close it with `aclose()` to stop early."""
+    provider = provider_for(model, provider)
+    request = _stream_request(provider, build_request(provider, model, messages, system, max_tokens, temperature, kwargs, cache_prefix))
+    check_request(request, model)
+    client = get_async_client(provider, api_key)
+
+    async def post() -> Tuple[Any, Any]:
+        if provider == Provider.OLLAMA:
+            http_response = await client.send(client.build_request("POST", "/api/chat", json=request), stream=True)
+            try:
+                http_response.raise_for_status()
+            except Exception:
+                await http_response.aclose()
+                raise
+            return http_response, http_response.headers
+        endpoint = client.messages if provider == Provider.ANTHROPIC else client.chat.completions
+        raw_response = await endpoint.with_raw_response.create(**request)
+        return raw_response.parse(), raw_response.headers
+
+    tokens = estimate_tokens(request)
+    started = time.monotonic()
+    stream = await _acall(provider, model, tokens, post, hold=True)
+    state = _StreamState(provider, model)
+    try:
+        async for event in stream.aiter_lines() if provider == Provider.OLLAMA else stream:
+            text = state.update(event)
+            if text:
+                yield text
+    finally:
+        try:
+            await (stream.aclose() if provider == Provider.OLLAMA else stream.close())
+        finally:
+            get_governor(provider).release()
+        _finish_stream(state, request, tokens, started)
+
+
+def _encode_image(data: bytes) -> Tuple[str, str]:
+    media_type = next((kind for signature, kind in _IMAGE_SIGNATURES if data.startswith(signature)), "image/jpeg")
+    return media_type, base64.b64encode(data).decode("utf-8")
+
+
+def _is_url(image: ImageInput) -> bool:
+    return not isinstance(image, bytes) and str(image).startswith(("http://", "https://"))
+
+
+def _passes_url(provider: Provider, image: ImageInput) -> bool:
+    # OpenAI fetches URLs itself, no need to download and re-upload
+    return provider == Provider.OPENAI and _is_url(image)
+
+
+def _load_image(image: ImageInput) -> Tuple[str, str]:
+    """Return (media type, base64 data) for raw bytes, a local path or a URL."""
+    if isinstance(image, bytes):
+        data = image
+    elif _is_url(image):
+        from src.send_task import get_client as get_http_client
+
+        response = get_http_client().get(str(image))
+        response.raise_for_status()
+        data = response.content
+    else:
+        data = Path(image).read_bytes()
+    return _encode_image(data)
+
+
+async def _aload_image(image: ImageInput) -> Tuple[str, str]:
+    """Async version of `_load_image`, URLs are downloaded on the pooled async client."""
+    if isinstance(image, bytes):
+        data = image
+    elif _is_url(image):
+        from src.send_task import aget
+
+        response = await aget(str(image))
+        response.raise_for_status()
+        data = response.content
+    else:
+        data = await asyncio.to_thread(Path(image).read_bytes)
+    return _encode_image(data)
+
+
+def _vision_message(
+    provider: Provider, prompt: str, images: Sequence[ImageInput], loaded: Sequence[Optional[Tuple[str, str]]]
+) -> Dict[str, Any]:
+    """User message with `images`, `loaded` holds their (media type, base64 data), None for passed URLs."""
+    if provider == Provider.OLLAMA:
+        return {"role": "user", "content": prompt, "images": [data for _, data in loaded]}
+
+    content: List[Dict[str, Any]] = [{"type": "text", "text": prompt}]
+    for image, image_data in zip(images, loaded):
+        if image_data is None:
+            content.append({"type": "image_url", "image_url": {"url": str(image)}})
+            continue
+        media_type, data = image_data
+        if provider == Provider.OPENAI:
+            content.append({"type": "image_url", "image_url": {"url": f"data:{media_type};base64,{data}"}})
+        else:
+            content.append({"type": "image", "source": {"type": "base64", "media_type": media_type, "data": data}})
+    return {"role": "user", "content": content}
+
+
+def vision(
+    prompt: str,
+    images: Sequence[ImageInput],
+    model: str = DEFAULT_VISION_MODEL,
+    system: Optional[str] = None,
+    provider: Optional[Provider | str] = None,
+    **kwargs,
+) -> LLMResponse:
+    """Ask about one or more images.
+
+    Args:
+        prompt (str): Question or instruction
+        images (Sequence[ImageInput]): Raw bytes, local paths or URLs
+        model (str): Vision-capable model, also selects the provider
+        system (Optional[str]): System prompt
+        provider (Optional[Provider | str]): Force a provider instead of inferring it
+        **kwargs: Same extras as `chat`
+
+    Returns:
+        LLMResponse: Text and token usage of the completion, including
+            `cached_prompt_tokens` read from the prompt cache
+    """
+    provider = provider_for(model, provider)
+    loaded = [None if _passes_url(provider, image) else _load_image(image) for image in images]
+    message = _vision_message(provider, prompt, images, loaded)
+    return chat([message], model=model, system=system, provider=provider, **kwargs)
+
+
+async def avision(
+    prompt: str,
+    images: Sequence[ImageInput],
+    model: str = DEFAULT_VISION_MODEL,
+    system: Optional[str] = None,
+    provider: Optional[Provider | str] = None,
+    **kwargs,
+) -> LLMResponse:
+    """Async version of `vision`."""
+    provider = provider_for(model, provider)
+
+    async def load(image: ImageInput) -> Optional[Tuple[str, str]]:
+        return None if _passes_url(provider, image) else await _aload_image(image)
+
+    # Downloads and file reads stay off the event loop and run together
+    loaded = await asyncio.gather(*(load(image) for image in images))
+    message = _vision_message(provider, prompt, images, loaded)
+    return await achat([message], model=model, system=system, provider=provider, **kwargs)
+
+
+def _audio_file(audio: str | Path | BinaryIO) -> Tuple[BinaryIO, bool]:
+    if isinstance(audio, (str, Path)):
+        return open(audio, "rb"), True
+    # Retries send the stream again, start from the beginning every time
+    if audio.seekable():
+        audio.seek(0)
+    return audio, False
+
+
+def _audio_key(audio: str | Path | BinaryIO, model: str, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+    # Files on disk are keyed by content, so duplicates under other names share a call
+    if not isinstance(audio, (str, Path)):
+        return None
+    digest = hashlib.sha256(Path(audio).read_bytes()).hexdigest()
+    return "transcription", model, digest, json.dumps(kwargs, sort_keys=True, default=str)
+
+
+def transcribe(audio: str | Path | BinaryIO, model: str = DEFAULT_TRANSCRIBE_MODEL, api_key: Optional[str] = None, **kwargs) -> str:
+    """Transcribe an audio file with the OpenAI speech-to-text API.
+
+    Concurrent transcriptions of the same file content are coalesced.
+
+    Args:
+        audio (str | Path | BinaryIO): Path or an open binary file
+        model (str): Transcription model
+        api_key (Optional[str]): Key overriding the environment
+        **kwargs: Passed through (language, prompt, ...)
+
+    Returns:
+        str: Transcribed text
+    """
+    client = get_client(Provider.OPENAI, api_key)
+
+    def post() -> Tuple[Any, Any]:
+        file, owned = _audio_file(audio)
+        try:
+            raw_response = client.audio.transcriptions.with_raw_response.create(model=model, file=file, **kwargs)
+        finally:
+            if owned:
+                file.close()
+        return raw_response.parse(), raw_response.headers
+
+    def send() -> str:
+        return _call(Provider.OPENAI, model, 0, post).text
+
+    key = _audio_key(audio, model, kwargs)
+    return send() if key is None else _flight.call(key, send)
+
+
+async def atranscribe(audio: str | Path | BinaryIO, model: str = DEFAULT_TRANSCRIBE_MODEL, api_key: Optional[str] = None, **kwargs) -> str:
+    """Async version of `transcribe`."""
+    client = get_async_client(Provider.OPENAI, api_key)
+
+    async def post() -> Tuple[Any, Any]:
+        file, owned = _audio_file(audio)
+        try:
+            raw_response = await client.audio.transcriptions.with_raw_response.create(model=model, file=file, **kwargs)
+        finally:
+            if owned:
+                file.close()
+        return raw_response.parse(), raw_response.headers
+
+    async def send() -> str:
+        return (await _acall(Provider.OPENAI, model, 0, post)).text
+
+    key = _audio_key(audio, model, kwargs)
+    return await (send() if key is None else _flight.do(key, send))
+
+
+def _embed_request(provider: Provider, texts: str | List[str], model: str) -> Tuple[List[str], Dict[str, Any]]:
+    if provider == Provider.ANTHROPIC:
+        raise ValueError("Anthropic has no embeddings API, use an OpenAI or Ollama model")
+    texts = [texts] if isinstance(texts, str) else list(texts)
+    return texts, {"model": model, "input": texts}
+
+
+def embed(
+    texts: str | List[str],
+    model: str = DEFAULT_EMBED_MODEL,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+) -> List[List[float]]:
+    """Embed one or many texts, always returns one vector per input text."""
+    provider = provider_for(model, provider)
+    texts, request = _embed_request(provider, texts, model)
+    client = get_client(provider, api_key)
+
+    def post() -> Tuple[Any, Any]:
+        if provider == Provider.OPENAI:
+            raw_response = client.embeddings.with_raw_response.create(**request)
+            return [item.embedding for item in raw_response.parse().data], raw_response.headers
+        response = client.post("/api/embed", json=request)
+        response.raise_for_status()
+        return response.json()["embeddings"], response.headers
+
+    return _call(provider, model, _embed_tokens(texts), post)
+
+
+async def aembed(
+    texts: str | List[str],
+    model: str = DEFAULT_EMBED_MODEL,
+    provider: Optional[Provider | str] = None,
+    api_key: Optional[str] = None,
+) -> List[List[float]]:
+    """Async version of `embed`."""
+    provider = provider_for(model, provider)
+    texts, request = _embed_request(provider, texts, model)
+    client = get_async_client(provider, api_key)
+
+    async def post() -> Tuple[Any, Any]:
+        if provider == Provider.OPENAI:
+            raw_response = await client.embeddings.with_raw_response.create(**request)
+            return [item.embedding for item in raw_response.parse().data], raw_response.headers
+        response = await client.post("/api/embed", json=request)
+        response.raise_for_status()
+        return response.json()["embeddings"], response.headers
+
+    return await _acall(provider, model, _embed_tokens(texts), post)
+
+
+def _embed_tokens(texts: List[str]) -> int:
+    return sum(len(text) for text in texts) // 4
@@ -0,0 +1,115 @@
+"""Hedged chat calls for latency-critical paths.
+
+The first model gets the request alone. If it has not answered once its
+recent p90 latency has passed (or it failed), the next model is asked as
+well, and so on down the list. The first successful answer wins and the
+calls still running are cancelled:
+
+    response = await ahedge(messages, ["gpt-4o-mini", "claude-3-5-haiku-latest"], deadline=5)
+
+Cacheable calls (temperature 0) are shared through the gateway's in-flight
+coalescing, cancelling the hedge only stops waiting for them; they finish in
+the background and still fill the response cache.
+"""
+import asyncio
+import os
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from loguru import logger
+
+from src import metrics
+from src.llm.gateway import achat
+from src.llm.latency import get_latency
+from src.llm.types import LLMResponse, Provider, provider_for
+
+# Delay before the backup request while a model has too few timed calls
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "1.0"))
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+LLM_HEDGE_DEADLINE = float(os.getenv("LLM_HEDGE_DEADLINE")) if os.getenv("LLM_HEDGE_DEADLINE") else None
+
+stats: Counter = Counter()
+metrics.collect("llm_hedge_total", stats, "Hedged calls, backups launched and won, deadlines missed", label="event")
+
+
+def hedge_delay(model: str, provider: Optional[Provider | str] = None) -> float:
+    """Time to wait for `model` before asking the next one: its p90 latency."""
+    observed = get_latency(provider_for(model, provider), model).quantile(LLM_HEDGE_QUANTILE)
+    return observed if observed is not None else LLM_HEDGE_DELAY
+
+
+async def ahedge(
+    messages: List[Dict[str, Any]],
+    models: Sequence[str],
+    deadline: Optional[float] = LLM_HEDGE_DEADLINE,
+    api_keys: Optional[Mapping[Provider, str]] = None,
+    **kwargs,
+) -> LLMResponse:
+    """Chat completion from whichever of `models` answers first.
+
+    Args:
+        messages (List[Dict[str, Any]]): OpenAI-style messages, as for `achat`
+        models (Sequence[str]): Primary model first, then the backups in order
+        deadline (Optional[float]): Seconds for the whole call, None waits for the last model
+        api_keys (Optional[Mapping[Provider, str]]): Keys per provider overriding the environment
+        **kwargs: Passed to every `achat` call, so keep them provider-neutral
+
+    Returns:
+        LLMResponse: First successful response
+
+    Raises:
+        TimeoutError: If no model answered within `deadline`
+        Exception: The first error when every model failed
+    """
+    if not models:
+        raise ValueError("ahedge needs at least one model")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    queue = list(models)
+    running: Dict[asyncio.Task, str] = {}
+    errors: List[BaseException] = []
+    next_launch = started
+    stats["calls"] += 1
+
+    def launch() -> None:
+        nonlocal next_launch
+        model = queue.pop(0)
+        api_key = (api_keys or {}).get(provider_for(model))
+        running[asyncio.ensure_future(achat(messages, model=model, api_key=api_key, **kwargs))] = model
+        next_launch = loop.time() + hedge_delay(model)
+        if len(running) > 1 or errors:
+            stats["backups"] += 1
+            logger.debug(f"Hedging with {model} after {loop.time() - started:.2f}s")
+
+    launch()
+    try:
+        while running:
+            waits = [next_launch - loop.time()] if queue else []
+            if deadline is not None:
+                waits.append(started + deadline - loop.time())
+            timeout = max(0.0, min(waits)) if waits else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            winner, failed = None, False
+            for task in done:
+                model = running.pop(task)
+                if task.exception() is not None:
+                    failed = True
+                    errors.append(task.exception())
+                    logger.warning(f"{model} failed while hedging: {task.exception()}")
+                elif winner is None:
+                    winner = task
+                    if model != models[0]:
+                        stats["backup_won"] += 1
+            if winner is not None:
+                return winner.result()
+
+            if deadline is not None and loop.time() - started >= deadline:
+                stats["deadline_exceeded"] += 1
+                raise TimeoutError(f"No answer from {', '.join(models)} within {deadline}s")
+            if queue and (failed or loop.time() >= next_launch):
+                launch()
+        raise errors[0]
+    finally:
+        for task in running:
+            task.cancel()
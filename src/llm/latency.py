@@ -0,0 +1,42 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from src.llm.types import Provider
+
+LATENCY_WINDOW = 200
+# Quantiles are only trusted once this many calls were timed
+MIN_SAMPLES = 5
+
+
+class LatencyTracker:
+    """Rolling window of call durations of one provider model, in seconds."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency below which a `q` share of recent calls finished, None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_lock = threading.Lock()
+_trackers: Dict[Tuple[Provider, str], LatencyTracker] = {}
+
+
+def get_latency(provider: Provider, model: str) -> LatencyTracker:
+    """Latency window shared by every call to `model` in this process."""
+    with _lock:
+        tracker = _trackers.get((provider, model))
+        if tracker is None:
+            tracker = _trackers[(provider, model)] = LatencyTracker()
+    return tracker
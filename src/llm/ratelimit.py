@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Mapping, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from src.llm.types import Provider
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# AIMD grows concurrency on success up to this ceiling, 429s halve it
+LLM_CONCURRENCY_CEILING = int(os.getenv("LLM_CONCURRENCY_CEILING", str(LLM_MAX_CONCURRENCY * 4)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+# Optional starting budgets per minute, learned from response headers anyway
+LLM_RPM = float(os.getenv("LLM_RPM")) if os.getenv("LLM_RPM") else None
+LLM_TPM = float(os.getenv("LLM_TPM")) if os.getenv("LLM_TPM") else None
+
+IMAGE_TOKEN_ESTIMATE = 1000
+DEFAULT_RETRY_AFTER = 1.0
+RETRYABLE_STATUS = (408, 409, 500, 502, 503, 504, 529)
+
+
+class TokenBucket:
+    """Budget of `per_minute` units refilled continuously.
+
+    `level` may go negative when a single reservation is bigger than what is
+    left, later callers then wait until the debt is paid back.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) * 60 / self.capacity
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def learn(self, limit: Optional[float], remaining: Optional[float], now: float) -> None:
+        """Align the bucket with what the provider reported.
+
+        Only ever lowers the level: responses arrive out of order and calls
+        reserved here may not have reached the provider yet.
+        """
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+class ConcurrencyGovernor:
+    """Concurrency limit adapted AIMD-style, usable from threads and event loops.
+
+    Every success adds 1/limit (one slot per window of successful calls),
+    a rate limit halves the limit, at most once per second so a burst of
+    429s from the same window counts as one signal.
+
+    Args:
+        initial (int): Starting number of concurrent calls
+        ceiling (int): Upper bound for additive increase
+    """
+
+    def __init__(self, initial: int = LLM_MAX_CONCURRENCY, ceiling: int = LLM_CONCURRENCY_CEILING):
+        self.limit = float(initial)
+        self.ceiling = max(ceiling, initial)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Callable[[], None]] = deque()
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < max(1, int(self.limit)):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake(self) -> None:
+        # Called with `_lock` held; woken callers re-check, so extra wakes are harmless
+        for _ in range(max(0, int(self.limit) - self.in_flight)):
+            if not self._waiters:
+                break
+            self._waiters.popleft()()
+
+    def acquire(self) -> None:
+        while True:
+            event = threading.Event()
+            with self._lock:
+                if self._try_acquire():
+                    return
+                self._waiters.append(event.set)
+            event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+            with self._lock:
+                if self._try_acquire():
+                    return
+                self._waiters.append(lambda: _resolve_threadsafe(loop, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Our wake-up may have been consumed, hand it on
+                with self._lock:
+                    self._wake()
+                raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.limit = min(self.ceiling, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_decrease < 1.0:
+                return
+            self._last_decrease = now
+            self.limit = max(1.0, self.limit / 2)
+        logger.warning(f"LLM rate limited, concurrency lowered to {int(self.limit)}")
+
+    def __enter__(self) -> "ConcurrencyGovernor":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    async def __aenter__(self) -> "ConcurrencyGovernor":
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+def _resolve_threadsafe(loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> None:
+    def resolve() -> None:
+        if not future.done():
+            future.set_result(None)
+
+    try:
+        loop.call_soon_threadsafe(resolve)
+    except RuntimeError:
+        # Loop already closed, nobody is waiting anymore
+        pass
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budget of one provider model.
+
+    Both buckets start unlimited (unless LLM_RPM / LLM_TPM are set) and take
+    their size from the `x-ratelimit-*` / `anthropic-ratelimit-*` headers of
+    the first responses. Reserve only while holding a concurrency slot, so
+    callers queued on the governor reserve against a fresh budget.
+    """
+
+    def __init__(self, provider: Provider, model: str):
+        self.provider = provider
+        self.model = model
+        self.requests: Optional[TokenBucket] = TokenBucket(LLM_RPM) if LLM_RPM else None
+        self.tokens: Optional[TokenBucket] = TokenBucket(LLM_TPM) if LLM_TPM else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            wait = max(
+                self.requests.wait_time(1, now) if self.requests else 0.0,
+                self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+            )
+            if wait == 0:
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        while (wait := self._reserve(tokens)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        while (wait := self._reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, used: int) -> None:
+        """Return (or charge) the difference between the estimate and real usage."""
+        if self.tokens and used:
+            with self._lock:
+                self.tokens.level += estimated - used
+
+    def learn(self, headers: Optional[Mapping[str, str]]) -> None:
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for kind in ("requests", "tokens"):
+                limit, remaining = _parse_limits(headers, kind)
+                if limit is None and remaining is None:
+                    continue
+                bucket = getattr(self, kind)
+                if bucket is None:
+                    if not limit:
+                        continue
+                    bucket = TokenBucket(limit)
+                    setattr(self, kind, bucket)
+                bucket.learn(limit, remaining, now)
+
+    def block(self, seconds: float) -> None:
+        """Hold every new call for `seconds`, used on 429 / retry-after."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_limits(headers: Mapping[str, str], kind: str) -> Tuple[Optional[float], Optional[float]]:
+    """(limit, remaining) for "requests" or "tokens", OpenAI or Anthropic style.
+
+    The reset headers are not needed: both providers refill continuously, so
+    `limit` per minute already gives the refill rate.
+    """
+    limit = _header(headers, f"x-ratelimit-limit-{kind}", f"anthropic-ratelimit-{kind}-limit")
+    remaining = _header(headers, f"x-ratelimit-remaining-{kind}", f"anthropic-ratelimit-{kind}-remaining")
+    return _number(limit), _number(remaining)
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    milliseconds = _number(_header(headers, "retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _number(_header(headers, "retry-after"))
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Rough prompt + completion size of a chat request, ~4 characters per token.
+
+    Image parts count as a flat IMAGE_TOKEN_ESTIMATE instead of their base64 size.
+    """
+    system = request.get("system", "")
+    if isinstance(system, list):
+        system = "".join(block.get("text", "") for block in system)
+    chars, images = len(system), 0
+    for message in request.get("messages", []):
+        content = message.get("content")
+        images += len(message.get("images", []))
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") in ("image", "image_url"):
+                images += 1
+            else:
+                chars += len(json.dumps(part, ensure_ascii=False))
+    completion = request.get("max_tokens") or request.get("options", {}).get("num_predict") or 0
+    return chars // 4 + images * IMAGE_TOKEN_ESTIMATE + completion
+
+
+def error_status(error: BaseException) -> Tuple[Optional[int], Optional[Mapping[str, str]]]:
+    """HTTP status and headers of an SDK or httpx error, (None, None) for others."""
+    response = getattr(error, "response", None)
+    if isinstance(response, httpx.Response):
+        return response.status_code, response.headers
+    return getattr(error, "status_code", None), None
+
+
+def is_connection_error(error: BaseException) -> bool:
+    import anthropic
+    import openai
+
+    return isinstance(error, (httpx.TransportError, openai.APIConnectionError, anthropic.APIConnectionError))
+
+
+_lock = threading.Lock()
+_limiters: Dict[Tuple[Provider, str], RateLimiter] = {}
+_governors: Dict[Provider, ConcurrencyGovernor] = {}
+
+
+def get_limiter(provider: Provider, model: str) -> RateLimiter:
+    """Rate limiter shared by every call to `model` in this process."""
+    with _lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            limiter = _limiters[(provider, model)] = RateLimiter(provider, model)
+    return limiter
+
+
+def get_governor(provider: Provider) -> ConcurrencyGovernor:
+    """Concurrency governor shared by sync and async calls to `provider`."""
+    with _lock:
+        governor = _governors.get(provider)
+        if governor is None:
+            governor = _governors[provider] = ConcurrencyGovernor()
+    return governor
+
+
+def backoff(error: BaseException, attempt: int, limiter: RateLimiter, governor: ConcurrencyGovernor) -> Optional[float]:
+    """React to a failed call, returns the delay before retrying or None to give up.
+
+    429s block the limiter until `retry-after` and halve concurrency, the
+    retry itself then waits in `acquire`. Overload, server and connection
+    errors back off exponentially.
+    """
+    if attempt >= LLM_MAX_RETRIES:
+        return None
+    status, headers = error_status(error)
+    if status == 429:
+        delay = retry_after(headers) or DEFAULT_RETRY_AFTER * 2 ** attempt
+        limiter.learn(headers)
+        limiter.block(delay)
+        governor.on_throttle()
+        logger.warning(f"{limiter.provider.value}/{limiter.model} returned 429, retrying in {delay:.1f}s")
+        return 0.0
+    if status in RETRYABLE_STATUS or (status is None and is_connection_error(error)):
+        return min(30.0, 0.5 * 2 ** attempt)
+    return None
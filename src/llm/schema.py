@@ -0,0 +1,244 @@
+"""Replies validated against a pydantic model.
+
+`structured` asks the provider to follow the model's JSON schema (OpenAI
+structured outputs, a forced Anthropic tool call, Ollama's `format`) and
+returns a validated instance instead of text to `json.loads`:
+
+    class Plan(BaseModel):
+        location: str
+        actions: List[str]
+
+    plan = structured(messages, Plan, model="gpt-4o-mini")
+    plan.location
+
+Replies that are only nearly JSON (code fences, prose around the object,
+single quotes, trailing commas, Python literals) are repaired locally, a
+formatting slip never costs another request. What cannot be repaired raises
+`StructuredOutputError`, the caller decides whether a retry is worth it.
+"""
+import ast
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from src import metrics
+from src.llm.gateway import DEFAULT_CHAT_MODEL, achat, chat
+from src.llm.types import LLMResponse, Provider, provider_for
+
+M = TypeVar("M", bound=BaseModel)
+
+# Replies valid as sent, recovered locally, or rejected
+stats: Counter = Counter()
+metrics.collect("llm_structured_total", stats, "Structured replies valid as sent, repaired locally or rejected", label="result")
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.DOTALL)
+# String literals are matched first so their content is left alone
+_JSON_LITERAL = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|\b(true|false|null)\b")
+_PYTHON_LITERALS = {"true": "True", "false": "False", "null": "None"}
+
+
+class StructuredOutputError(ValueError):
+    """The reply could not be read as an instance of the requested model."""
+
+    def __init__(self, message: str, text: str):
+        super().__init__(message)
+        self.text = text
+
+
+def repair_json(text: str) -> Any:
+    """Decode a JSON value the model wrapped in prose or bent slightly.
+
+    Raises:
+        StructuredOutputError: If no JSON value can be recovered
+    """
+    text = text.strip()
+    fence = _FENCE.search(text)
+    if fence:
+        text = fence.group(1).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise StructuredOutputError(f"No JSON value in reply: {text[:200]!r}", text)
+    start = min(starts)
+    try:
+        # Valid JSON followed by more prose
+        return json.JSONDecoder().raw_decode(text, start)[0]
+    except ValueError:
+        pass
+
+    # Python-style dict/list: single quotes, trailing commas, True/None
+    fragment = text[start:max(text.rfind("}"), text.rfind("]")) + 1]
+    python = _JSON_LITERAL.sub(lambda match: match.group(1) or _PYTHON_LITERALS[match.group(2)], fragment)
+    try:
+        return ast.literal_eval(python)
+    except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+        raise StructuredOutputError(f"Unparseable JSON in reply: {text[:200]!r}", text) from e
+
+
+def _validate(data: Any, schema: Type[M], text: str) -> M:
+    fields = list(schema.model_fields)
+    # A bare list or value for a single-field model, e.g. [...] for {"response": [...]}
+    if len(fields) == 1 and not (isinstance(data, dict) and fields[0] in data) and fields[0] != "root":
+        data = {fields[0]: data}
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        stats["rejected"] += 1
+        raise StructuredOutputError(f"Reply does not match {schema.__name__}: {e}", text) from e
+
+
+def parse_model(text: str, schema: Type[M]) -> M:
+    """Validate a text reply against `schema`, repairing near-JSON locally.
+
+    Args:
+        text (str): Model reply
+        schema (Type[M]): Pydantic model the reply should match
+
+    Returns:
+        M: Validated instance
+
+    Raises:
+        StructuredOutputError: If the reply cannot be repaired or does not match `schema`
+    """
+    try:
+        result = schema.model_validate_json(text)
+        stats["valid"] += 1
+        return result
+    except ValidationError:
+        pass
+    try:
+        data = repair_json(text)
+    except StructuredOutputError:
+        stats["rejected"] += 1
+        raise
+    result = _validate(data, schema, text)
+    stats["repaired"] += 1
+    logger.debug(f"Repaired {schema.__name__} reply locally: {text[:200]!r}")
+    return result
+
+
+def _strict_compatible(node: Any) -> bool:
+    # Strict mode needs every object spelled out, free-form dicts rule it out
+    if isinstance(node, list):
+        return all(_strict_compatible(item) for item in node)
+    if not isinstance(node, dict):
+        return True
+    if node.get("type") == "object" and "properties" not in node:
+        return False
+    return all(_strict_compatible(value) for value in node.values())
+
+
+def _strict_schema(node: Any) -> Any:
+    # Strict mode: no defaults, no extra keys, every property listed as required
+    if isinstance(node, list):
+        return [_strict_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    strict = {key: _strict_schema(value) for key, value in node.items() if key not in ("default", "properties", "$defs")}
+    for key in ("properties", "$defs"):
+        if key in node:
+            strict[key] = {name: _strict_schema(value) for name, value in node[key].items()}
+    if "properties" in node:
+        strict["additionalProperties"] = False
+        strict["required"] = list(node["properties"])
+    return strict
+
+
+def schema_kwargs(provider: Provider, schema: Type[BaseModel], strict: Optional[bool] = None) -> Dict[str, Any]:
+    """Request arguments constraining the reply of `provider` to `schema`.
+
+    Args:
+        provider (Provider): Backend serving the call
+        schema (Type[BaseModel]): Pydantic model whose JSON schema is an object
+        strict (Optional[bool]): OpenAI strict mode, None enables it when the
+            schema allows (no free-form dict fields)
+
+    Returns:
+        Dict[str, Any]: Keyword arguments for `chat` / `achat` / `batch_chat`
+    """
+    json_schema = schema.model_json_schema()
+    # Schema and tool names are limited to [a-zA-Z0-9_-], generic models are not
+    name = re.sub(r"[^a-zA-Z0-9_-]", "_", schema.__name__)[:64]
+    if provider == Provider.ANTHROPIC:
+        tool = {"name": name, "description": json_schema.get("description", name), "input_schema": json_schema}
+        return {"tools": [tool], "tool_choice": {"type": "tool", "name": name}}
+    if provider == Provider.OPENAI:
+        strict = _strict_compatible(json_schema) if strict is None else strict
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": _strict_schema(json_schema) if strict else json_schema, "strict": strict},
+            }
+        }
+    return {"format": json_schema}
+
+
+def parse_response(response: LLMResponse, schema: Type[M]) -> M:
+    """Validate a response to a request made with `schema_kwargs`, e.g. one of `batch_chat`.
+
+    Raises:
+        StructuredOutputError: If the reply cannot be repaired locally or does not match `schema`
+    """
+    if response.provider == Provider.ANTHROPIC and response.raw is not None:
+        for block in response.raw.content:
+            if block.type == "tool_use":
+                result = _validate(block.input, schema, json.dumps(block.input, ensure_ascii=False))
+                stats["valid"] += 1
+                return result
+    if response.provider == Provider.OPENAI and response.raw is not None:
+        refusal = getattr(response.raw.choices[0].message, "refusal", None)
+        if refusal:
+            stats["rejected"] += 1
+            raise StructuredOutputError(f"Model refused to answer: {refusal}", refusal)
+    return parse_model(response.text, schema)
+
+
+def structured(
+    messages: List[Dict[str, Any]],
+    schema: Type[M],
+    model: str = DEFAULT_CHAT_MODEL,
+    provider: Optional[Provider | str] = None,
+    strict: Optional[bool] = None,
+    **kwargs,
+) -> M:
+    """Chat completion constrained to and validated against `schema`.
+
+    Args:
+        messages (List[Dict[str, Any]]): OpenAI-style messages, as for `chat`
+        schema (Type[M]): Pydantic model of the reply, its JSON schema must be an object
+        model (str): Model name, also selects the provider
+        provider (Optional[Provider | str]): Force a provider instead of inferring it
+        strict (Optional[bool]): OpenAI strict mode, see `schema_kwargs`
+        **kwargs: Passed to `chat` (system, temperature, cache, ...)
+
+    Returns:
+        M: Validated reply
+
+    Raises:
+        StructuredOutputError: If the reply cannot be repaired locally or does not match `schema`
+    """
+    provider = provider_for(model, provider)
+    response = chat(messages, model=model, provider=provider, **schema_kwargs(provider, schema, strict), **kwargs)
+    return parse_response(response, schema)
+
+
+async def astructured(
+    messages: List[Dict[str, Any]],
+    schema: Type[M],
+    model: str = DEFAULT_CHAT_MODEL,
+    provider: Optional[Provider | str] = None,
+    strict: Optional[bool] = None,
+    **kwargs,
+) -> M:
+    """Async version of `structured`."""
+    provider = provider_for(model, provider)
+    response = await achat(messages, model=model, provider=provider, **schema_kwargs(provider, schema, strict), **kwargs)
+    return parse_response(response, schema)
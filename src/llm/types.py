@@ -0,0 +1,62 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Optional
+
+
+class Provider(str, Enum):
+    OPENAI = "openai"
+    ANTHROPIC = "anthropic"
+    OLLAMA = "ollama"
+
+
+_OPENAI_PREFIXES = ("gpt", "o1", "o3", "chatgpt", "text-embedding", "whisper", "dall-e", "tts")
+
+
+def base_model(model: str) -> str:
+    """Model a fine-tune was trained from, e.g. "gpt-4o-mini-2024-07-18" for
+    "ft:gpt-4o-mini-2024-07-18:personal:ai-devs3:AYL313KI". Other names are returned as is."""
+    if model.startswith("ft:"):
+        return model.split(":")[1]
+    return model
+
+
+def provider_for(model: str, provider: Optional[Provider | str] = None) -> Provider:
+    """Resolve the backend for `model`, an explicit `provider` always wins.
+
+    Claude models go to Anthropic, OpenAI model families (fine-tunes of
+    them included) to OpenAI and everything else (llama, gemma, ...) to the
+    local Ollama server.
+    """
+    if provider is not None:
+        return Provider(provider)
+    model = base_model(model)
+    if model.startswith("claude"):
+        return Provider.ANTHROPIC
+    if model.startswith(_OPENAI_PREFIXES):
+        return Provider.OPENAI
+    return Provider.OLLAMA
+
+
+@dataclass
+class LLMResponse:
+    """Provider-independent result of a `chat` or `vision` call.
+
+    Attributes:
+        text (str): Generated text
+        model (str): Model that produced it
+        provider (Provider): Backend that served the call
+        prompt_tokens (int): Input tokens reported by the provider, cached ones included
+        completion_tokens (int): Output tokens reported by the provider
+        raw (Any): Untouched SDK / HTTP response
+        cached (bool): Served from the LLM response cache
+        cached_prompt_tokens (int): Prompt tokens read from the provider's prefix cache
+    """
+
+    text: str
+    model: str
+    provider: Provider
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    raw: Any = field(default=None, repr=False)
+    cached: bool = False
+    cached_prompt_tokens: int = 0
@@ -0,0 +1,357 @@
+"""In-process metrics for LLM and HTTP calls.
+
+Counters and histograms live in one process-wide registry, every series is
+labelled with the episode (the running script, or METRICS_EPISODE):
+
+    from src import metrics
+
+    metrics.inc("llm_calls_total", provider="openai", model="gpt-4o-mini")
+    with metrics.timer("pipeline_seconds", stage="transcribe"):
+        ...
+
+The LLM gateway and the pooled HTTP clients record latency, tokens, payload
+bytes, calls, errors, retries and cache hits by themselves; module-level
+`stats` Counters (single-flight, hedging, ...) are exported through `collect`.
+At exit the registry is written to METRICS_PATH, as JSON with percentiles when
+the name ends in .json, in the Prometheus text format otherwise. With Langfuse
+keys in the environment a sample of LLM calls (METRICS_LANGFUSE_SAMPLE) is
+also sent there as generations.
+"""
+import atexit
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+METRICS_PATH = os.getenv("METRICS_PATH")
+METRICS_LANGFUSE_SAMPLE = float(os.getenv("METRICS_LANGFUSE_SAMPLE", "0.1"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Recent observations per series kept for the percentiles of the JSON dump
+SAMPLE_WINDOW = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _script_name() -> str:
+    script = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else ""
+    return script if script and script not in ("-", "-c", "__main__") else "interactive"
+
+
+_episode = os.getenv("METRICS_EPISODE") or _script_name()
+
+
+def set_episode(name: str) -> None:
+    """Label the series recorded from now on with `name` instead of the script name."""
+    global _episode
+    _episode = name
+
+
+class Histogram:
+    """Bucketed distribution of one series, plus a window of recent values."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Registry:
+    """Named counters and histograms, each split into series by labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collected: List[Tuple[str, Counter, str]] = []
+
+    def describe(self, name: str, help: str, buckets: Optional[Sequence[float]] = None) -> None:
+        self._help[name] = help
+        if buckets is not None:
+            self._buckets[name] = buckets
+
+    def collect(self, name: str, counter: Counter, help: str, label: str = "kind") -> None:
+        """Export a module's own `Counter` as the counter `name`, one series per key."""
+        self._help[name] = help
+        self._collected.append((name, counter, label))
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def value(self, name: str, **labels: Any) -> float:
+        """Current value of a counter series, for tests and reports."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self) -> Tuple[Dict[str, Dict[Labels, float]], Dict[str, Dict[Labels, Histogram]]]:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+        for name, counter, label in self._collected:
+            series = counters.setdefault(name, {})
+            for key, value in list(counter.items()):
+                series[_labels({label: key})] = value
+        return counters, histograms
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready dump: counter values and histogram count, sum, mean and percentiles."""
+        counters, histograms = self._snapshot()
+        result: Dict[str, Any] = {"counters": {}, "histograms": {}}
+        for name, series in sorted(counters.items()):
+            result["counters"][name] = [{"labels": dict(key), "value": value} for key, value in series.items()]
+        with self._lock:
+            for name, series in sorted(histograms.items()):
+                result["histograms"][name] = [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else None,
+                        **{f"p{round(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                    }
+                    for key, histogram in series.items()
+                ]
+        return result
+
+    def to_prometheus(self) -> str:
+        """Text exposition format, as served on a /metrics endpoint."""
+        counters, histograms = self._snapshot()
+        lines: List[str] = []
+        for name, series in sorted(counters.items()):
+            lines += self._header(name, "counter")
+            lines += [f"{name}{_format_labels(key)} {_number(value)}" for key, value in series.items()]
+        with self._lock:
+            for name, series in sorted(histograms.items()):
+                lines += self._header(name, "histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else _number(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, kind: str) -> List[str]:
+        help = self._help.get(name)
+        return ([f"# HELP {name} {help}"] if help else []) + [f"# TYPE {name} {kind}"]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    labels = {"episode": _episode, **labels}
+    return tuple(sorted((key, str(value.value if hasattr(value, "value") else value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = Registry()
+describe = registry.describe
+collect = registry.collect
+inc = registry.inc
+observe = registry.observe
+
+
+@contextmanager
+def timer(name: str, **labels: Any) -> Iterator[None]:
+    """Observe the duration of the block in the histogram `name`, in seconds."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started, **labels)
+
+
+def export(path: str | Path) -> None:
+    """Write the registry to `path`: JSON for a .json name, Prometheus text otherwise."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".json":
+        path.write_text(json.dumps(registry.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+    else:
+        path.write_text(registry.to_prometheus(), encoding="utf-8")
+    logger.info(f"Metrics written to {path}")
+
+
+# Path segments that carry ids or keys, kept out of the endpoint label
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,}|[A-Za-z0-9_-]{32,})$")
+
+
+def endpoint(url: Any) -> str:
+    """Low-cardinality endpoint label of a URL: host and path with ids masked."""
+    parts = urlsplit(str(url))
+    path = "/".join(":id" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/"))
+    return f"{parts.netloc}{path}"
+
+
+def _on_request(request) -> None:
+    request.extensions["metrics_started"] = time.monotonic()
+
+
+def _on_response(response) -> None:
+    request = response.request
+    labels = {"endpoint": endpoint(request.url), "method": request.method}
+    started = request.extensions.get("metrics_started")
+    if started is not None:
+        observe("http_request_seconds", time.monotonic() - started, **labels)
+    inc("http_requests_total", status=response.status_code, **labels)
+    try:
+        observe("http_request_bytes", len(request.content), **labels)
+    except Exception:
+        # Streamed uploads (multipart audio) have no body in memory
+        pass
+    length = response.headers.get("content-length")
+    if length is not None:
+        observe("http_response_bytes", int(length), **labels)
+
+
+async def _aon_request(request) -> None:
+    _on_request(request)
+
+
+async def _aon_response(response) -> None:
+    _on_response(response)
+
+
+def http_event_hooks() -> Dict[str, List[Callable]]:
+    """httpx `event_hooks` recording every request of a sync client."""
+    return {"request": [_on_request], "response": [_on_response]}
+
+
+def async_http_event_hooks() -> Dict[str, List[Callable]]:
+    """httpx `event_hooks` for an async client."""
+    return {"request": [_aon_request], "response": [_aon_response]}
+
+
+_langfuse = None
+_langfuse_lock = threading.Lock()
+
+
+def _langfuse_client():
+    global _langfuse
+    if not (os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY")):
+        return None
+    with _langfuse_lock:
+        if _langfuse is None:
+            try:
+                from langfuse import Langfuse
+
+                _langfuse = Langfuse()
+            except Exception as e:
+                logger.warning(f"Langfuse configured but unavailable, not sampling LLM calls: {e}")
+                _langfuse = False
+    return _langfuse or None
+
+
+def sample_generation(
+    model: str,
+    input: Any,
+    output: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    seconds: float,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Send a METRICS_LANGFUSE_SAMPLE share of LLM calls to Langfuse, when it is configured."""
+    if random.random() >= METRICS_LANGFUSE_SAMPLE:
+        return
+    client = _langfuse_client()
+    if client is None:
+        return
+    ended = datetime.now(timezone.utc)
+    try:
+        client.generation(
+            name=f"{_episode}:{model}",
+            model=model,
+            input=input,
+            output=output,
+            usage_details={"input": prompt_tokens, "output": completion_tokens},
+            start_time=ended - timedelta(seconds=seconds),
+            end_time=ended,
+            metadata={"episode": _episode, **(metadata or {})},
+        )
+    except Exception as e:
+        logger.debug(f"Langfuse sample dropped: {e}")
+
+
+def _at_exit() -> None:
+    if METRICS_PATH:
+        try:
+            export(METRICS_PATH)
+        except Exception as e:
+            logger.warning(f"Could not write metrics to {METRICS_PATH}: {e}")
+    if _langfuse:
+        _langfuse.flush()
+
+
+atexit.register(_at_exit)
+
+describe("llm_latency_seconds", "Duration of LLM calls, retries included", LATENCY_BUCKETS)
+describe("llm_prompt_tokens", "Prompt tokens per LLM call", TOKEN_BUCKETS)
+describe("llm_completion_tokens", "Completion tokens per LLM call", TOKEN_BUCKETS)
+describe("llm_calls_total", "LLM API calls that succeeded")
+describe("llm_errors_total", "LLM API calls that failed after retries")
+describe("llm_retries_total", "LLM API attempts retried after 429 / 5xx")
+describe("llm_cache_requests_total", "Response cache lookups by namespace and result")
+describe("http_request_seconds", "Duration of HTTP requests of the pooled clients", LATENCY_BUCKETS)
+describe("http_request_bytes", "Request body size", BYTES_BUCKETS)
+describe("http_response_bytes", "Response body size, when announced", BYTES_BUCKETS)
+describe("http_requests_total", "HTTP responses by endpoint and status")
@@ -1 +1 @@
-PROMPT_SOURCE_O = """Answers below questions.Rules:- Answer ONLY in Polish language- Provide concise answers, preferably single word or date- Return answers as a JSON array of strings- Do not include any formatting symbols like ```json```Example format:{"response": ["answer1", "answer2", "answer3"]}Questions:{questions}"""PROMPT_SOURCE_1 = """Answers below questions based on provided content.Source text:{content}Rules:- Answer ONLY in Polish language- Use only information from the provided source text- Provide extremely concise answers, preferably single word or phrase- Return answers as a JSON array of strings- Do not include any formatting symbols like ```json```Example format:{{"response": ["answer1", "answer2"]}}Questions:{questions}"""
\ No newline at end of file
+PROMPT_SOURCE_O = """Answers below questions.Rules:- Answer ONLY in Polish language- Provide concise answers, preferably single word or date- Return answers as a JSON array of strings- Do not include any formatting symbols like ```json```Example format:{"response": ["answer1", "answer2", "answer3"]}Questions:{questions}"""PROMPT_SOURCE_1 = """Answers below questions based on provided content.Source text:{content}Rules:- Answer ONLY in Polish language- Use only information from the provided source text- Provide extremely concise answers, preferably single word or phrase- Return answers as a JSON array of strings- Do not include any formatting symbols like ```json```Example format:{{"response": ["answer1", "answer2"]}}Questions are given in the user message."""
\ No newline at end of file
@@ -1,34 +1,55 @@
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from openai import OpenAI
-import os
+
+from src.llm import achat
 
 load_dotenv()
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+MODEL = "gpt-4o-mini"
+# The login form shows its anti-captcha question as <p id="human-question">Question:<br/>...</p>
+QUESTION_SELECTOR = "#human-question"
+NO_QUESTION = "NONE"
+
+
+def question_from_html(page_content: str) -> Optional[str]:
+    """Question of the login page read straight from the DOM, None if the selector misses."""
+    element = BeautifulSoup(page_content, "html.parser").select_one(QUESTION_SELECTOR)
+    if element is None:
+        return None
+    question = re.sub(r"^\s*question\s*:\s*", "", element.get_text(" ", strip=True), flags=re.IGNORECASE)
+    return question or None
 
 
 async def extract_question(page_content: str) -> str:
+    question = question_from_html(page_content)
+    if question is not None:
+        return question
+
     prompt = f"""
     Parse this website content and extract a question.
     There is only one question in the content.
     The question should be a single sentence.
     If there is no question, return an empty string
-    
+
     Content:
     {page_content}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = await achat(
+        model=MODEL,
+        temperature=0,
         messages=[
             {"role": "system", "content": prompt},
         ],
     )
 
-    return response.choices[0].message.content
+    return response.text
 
 
-async def answer_question(question: str):
+async def answer_question(question: str) -> str:
     prompt = f"""
     Answer the question. The answer is a single integer number.
     Provide the answer only, without any other text, numbers, or characters.
@@ -36,11 +57,45 @@ async def answer_question(question: str):
     Question: {question}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    # Temperature 0: the same question is answered from the response cache
+    response = await achat(
+        model=MODEL,
+        temperature=0,
+        messages=[
+            {"role": "system", "content": prompt},
+        ],
+    )
+
+    return response.text.strip()
+
+
+async def answer_page(page_content: str) -> str:
+    """Answer to the login page's question, an empty string if the page has none.
+
+    The question is read from the DOM and answered in one call. Only when the
+    selector misses does the page go to the model, which finds and answers the
+    question in that same single call.
+    """
+    question = question_from_html(page_content)
+    if question is not None:
+        return await answer_question(question)
+
+    prompt = f"""
+    Find the only question in this website content and answer it. The answer is a single integer number.
+    Provide the answer only, without any other text, numbers, or characters.
+    If you cannot answer the question, return 0. If there is no question, return {NO_QUESTION}.
+
+    Content:
+    {page_content}
+    """
+
+    response = await achat(
+        model=MODEL,
+        temperature=0,
         messages=[
             {"role": "system", "content": prompt},
         ],
     )
 
-    return response.choices[0].message.content
+    answer = response.text.strip()
+    return "" if answer == NO_QUESTION else answer
@@ -1,9 +1,13 @@
-import os
-from anthropic import Anthropic
+from src.llm import achat
+from src.s_01.e_01 import NO_QUESTION, question_from_html
+
+MODEL = "claude-3-haiku-20240307"
 
 
 async def extract_question(page_content: str) -> str:
-    anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    question = question_from_html(page_content)
+    if question is not None:
+        return question
 
     prompt = f"""
     Parse this website content and extract a question.
@@ -15,18 +19,17 @@ async def extract_question(page_content: str) -> str:
     {page_content}
     """
 
-    response = anthropic.messages.create(
-        model="claude-3-haiku-20240307",
+    response = await achat(
+        model=MODEL,
         max_tokens=100,
+        temperature=0,
         messages=[{"role": "user", "content": prompt}],
     )
 
-    return response.content[0].text
+    return response.text
 
 
 async def answer_question(question: str) -> str:
-    anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
     prompt = f"""
     Answer the question. The answer is a single integer number.
     Provide the answer only, without any other text, numbers, or characters.
@@ -34,10 +37,37 @@ async def answer_question(question: str) -> str:
     Question: {question}
     """
 
-    response = anthropic.messages.create(
-        model="claude-3-haiku-20240307",
+    response = await achat(
+        model=MODEL,
+        max_tokens=10,
+        temperature=0,
+        messages=[{"role": "user", "content": prompt}],
+    )
+
+    return response.text.strip()
+
+
+async def answer_page(page_content: str) -> str:
+    """Answer to the login page's question, see `src.s_01.e_01.answer_page`."""
+    question = question_from_html(page_content)
+    if question is not None:
+        return await answer_question(question)
+
+    prompt = f"""
+    Find the only question in this website content and answer it. The answer is a single integer number.
+    Provide the answer only, without any other text, numbers, or characters.
+    If you cannot answer the question, return 0. If there is no question, return {NO_QUESTION}.
+
+    Content:
+    {page_content}
+    """
+
+    response = await achat(
+        model=MODEL,
         max_tokens=10,
+        temperature=0,
         messages=[{"role": "user", "content": prompt}],
     )
 
-    return response.content[0].text
+    answer = response.text.strip()
+    return "" if answer == NO_QUESTION else answer
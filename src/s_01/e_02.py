@@ -1,20 +1,60 @@
-import openai
 import aiohttp
+import asyncio
 import logging
-from typing import Dict, Optional
+import re
+import time
+import unicodedata
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterator, List, Optional
+
+from src import metrics
+from src.llm import Provider, ahedge
+
+# The robot waits only briefly for each answer: a slow model is backed up by
+# the next one after its p90 latency
+ANSWER_MODELS = ("gpt-3.5-turbo", "claude-3-5-haiku-latest")
+# Similarity above which a question word counts as a phrase word, absorbs typos and inflection
+KEYWORD_SIMILARITY = 0.8
+# Shorter phrase words must match exactly, "rok" or "year" are too short to match fuzzily
+FUZZY_MIN_LENGTH = 5
+# Stages of one dialogue: READY round trip, special-case match, model answer, final post
+STAGES = ("ready", "classify", "answer", "post")
+STAGE_METRIC = "robot_verification_stage_seconds"
+metrics.describe(STAGE_METRIC, "Duration of each stage of a robot verification dialogue")
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of `text` without diacritics ("Stolicą" -> "stolica")."""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.findall(r"[a-z0-9]+", ascii_text.lower())
+
+
+def _same_word(word: str, keyword: str) -> bool:
+    if len(keyword) < FUZZY_MIN_LENGTH:
+        return word == keyword
+    return word.startswith(keyword) or SequenceMatcher(None, word, keyword).ratio() >= KEYWORD_SIMILARITY
+
+
+def _is_phrase(words: List[str], phrase: str) -> bool:
+    """Whether `words` are the whole of `phrase`, word by word."""
+    keywords = phrase.split()
+    return len(words) == len(keywords) and all(_same_word(word, keyword) for word, keyword in zip(words, keywords))
 
 
 class RobotVerification:
-    def __init__(self, api_key: str, verify_endpoint: str):
+    def __init__(self, api_key: str, verify_endpoint: str, deadline: Optional[float] = 10.0):
         """
         Initialize the verification system
 
         Args:
             api_key: OpenAI API key
             verify_endpoint: Full URL to the verification endpoint
+            deadline: Seconds allowed for each model call, None to wait indefinitely
         """
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+        self.api_key = api_key
         self.verify_endpoint = verify_endpoint
+        self.deadline = deadline
 
         # Set up logging
         logging.basicConfig(
@@ -28,7 +68,12 @@ class RobotVerification:
         self.logger = logging.getLogger(__name__)
         self.logger.info("Initializing RobotVerification system")
 
-        # Special cases remain the same
+        # Durations per stage of every dialogue run by this instance
+        self.stage_latency = {stage: metrics.Histogram(metrics.LATENCY_BUCKETS) for stage in STAGES}
+
+        # Special cases remain the same. A question matches locally only when it is
+        # one of the "phrases" as a whole, anything else is left to the model, which
+        # gets the "patterns" describing each case
         self.special_cases = {
             "poland_capital": {
                 "answer": "Kraków",
@@ -36,10 +81,20 @@ class RobotVerification:
                     "asking about capital of Poland",
                     "wants to know Poland's capital city",
                 ],
+                "phrases": [
+                    "what is the capital of poland",
+                    "what is the capital city of poland",
+                    "jaka jest stolica polski",
+                    "co jest stolica polski",
+                ],
             },
             "hitchhiker_number": {
                 "answer": "69",
                 "patterns": ["reference to Hitchhiker's Guide number"],
+                "phrases": [
+                    "what is the answer to the ultimate question of life the universe and everything",
+                    "what is the answer to life the universe and everything",
+                ],
             },
             "current_year": {
                 "answer": "1999",
@@ -47,81 +102,88 @@ class RobotVerification:
                     "asking about current year",
                     "wants to know what year it is",
                 ],
+                "phrases": [
+                    "what year is it",
+                    "what year is it now",
+                    "what is the current year",
+                    "jaki jest teraz rok",
+                    "jaki mamy rok",
+                    "jaki mamy teraz rok",
+                    "ktory jest teraz rok",
+                    "ktory mamy rok",
+                ],
             },
         }
 
-    async def _should_use_special_answer(self, question: str) -> Optional[str]:
-        """
-        Check if the question requires a special predefined answer using AI analysis
-        """
-        self.logger.info(f"Analyzing if question requires special answer: '{question}'")
-
-        system_prompt = """You are a question analyzer for a robot verification system. 
-        Your task is to determine if a question matches any special cases.
-        You must respond with ONLY ONE of these exact categories if there's a match, or "none" if there's no match:
-        - poland_capital (if asking about capital of Poland)
-        - hitchhiker_number (if asking about the number from Hitchhiker's Guide)
-        - current_year (if asking about the current year)
-        Respond with just the category name, nothing else."""
-
+    @contextmanager
+    def _stage(self, stage: str) -> Iterator[None]:
+        started = time.monotonic()
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this question: {question}"},
-                ],
-                max_tokens=20,
-                temperature=0,
-            )
-
-            category = response.choices[0].message.content.strip().lower()
-            self.logger.info(f"AI categorized question as: {category}")
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.stage_latency[stage].observe(elapsed)
+            metrics.observe(STAGE_METRIC, elapsed, stage=stage)
 
-            if category in self.special_cases:
-                answer = self.special_cases[category]["answer"]
-                self.logger.info(f"Special case match found: '{answer}'")
-                return answer
-
-            self.logger.debug("No special case match found")
-            return None
-
-        except Exception as e:
-            self.logger.error(f"Error in AI question analysis: {str(e)}")
-            return None
+    def _match_special_case(self, question: str) -> Optional[str]:
+        """
+        Resolve a special case locally when the question is one of its phrases, no model call
+        """
+        words = _words(question)
+        for category, case in self.special_cases.items():
+            for phrase in case["phrases"]:
+                if _is_phrase(words, phrase):
+                    self.logger.info(f"Special case {category} matched locally: '{case['answer']}'")
+                    return case["answer"]
+        return None
 
     async def _analyze_question(self, question: str) -> str:
         """
         Analyze the question and determine the appropriate response
+
+        Special cases asked in a known phrasing are matched locally. Anything else
+        takes one model call that either names a special case or answers.
         """
         self.logger.info(f"Analyzing question: '{question}'")
 
-        special_answer = await self._should_use_special_answer(question)
+        with self._stage("classify"):
+            special_answer = self._match_special_case(question)
         if special_answer:
             return special_answer
 
+        categories = "\n".join(
+            f"        - {category} ({'; '.join(case['patterns'])})" for category, case in self.special_cases.items()
+        )
+        system_prompt = f"""You are an AI assistant helping to answer verification questions.
+        If the question matches one of these special cases, respond with ONLY its category name:
+{categories}
+        Otherwise provide a concise, accurate answer without explanation.
+        Your answer must ALWAYS be in English regardless of the question language."""
+
         self.logger.info("Using OpenAI to generate response")
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an AI assistant helping to answer verification questions. "
-                        "Provide concise, accurate answers without explanation. "
-                        "Your answer must ALWAYS be in English regardless "
-                        "of the question language.",
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Answer this question concisely: {question}",
-                    },
-                ],
-                max_tokens=50,
-                temperature=0,
-            )
+            with self._stage("answer"):
+                response = await ahedge(
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {
+                            "role": "user",
+                            "content": f"Answer this question concisely: {question}",
+                        },
+                    ],
+                    ANSWER_MODELS,
+                    deadline=self.deadline,
+                    max_tokens=50,
+                    temperature=0,
+                    api_keys={Provider.OPENAI: self.api_key},
+                    cache_namespace="s01e02.answer",
+                )
+
+            answer = response.text.strip()
+            if answer.lower() in self.special_cases:
+                self.logger.info(f"AI categorized question as: {answer.lower()}")
+                return self.special_cases[answer.lower()]["answer"]
 
-            answer = response.choices[0].message.content.strip()
             self.logger.info(f"OpenAI generated response: '{answer}'")
             return answer
 
@@ -129,21 +191,28 @@ class RobotVerification:
             self.logger.error(f"Error generating OpenAI response: {str(e)}")
             raise
 
-    async def start_verification(self) -> Dict:
+    async def _post(self, session: aiohttp.ClientSession, payload: Dict) -> Dict:
+        async with session.post(
+            self.verify_endpoint,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+        ) as response:
+            return await response.json()
+
+    async def start_verification(self, session: Optional[aiohttp.ClientSession] = None) -> Dict:
         """Start the verification process by sending READY"""
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.start_verification(session)
+
         self.logger.info("Starting verification process")
         initial_payload = {"text": "READY", "msgID": "0"}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.verify_endpoint,
-                    json=initial_payload,
-                    headers={"Content-Type": "application/json"},
-                ) as response:
-                    response_data = await response.json()
-                    self.logger.info(f"Received initial response: {response_data}")
-                    return response_data
+            with self._stage("ready"):
+                response_data = await self._post(session, initial_payload)
+            self.logger.info(f"Received initial response: {response_data}")
+            return response_data
 
         except Exception as e:
             self.logger.error(f"Error starting verification: {str(e)}")
@@ -162,28 +231,68 @@ class RobotVerification:
         self.logger.info(f"Prepared response: {response}")
         return response
 
-    async def verify(self) -> bool:
-        """Run the complete verification process"""
+    async def verify(self, session: Optional[aiohttp.ClientSession] = None) -> bool:
+        """Run the complete verification process, both requests on one session"""
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.verify(session)
+
         self.logger.info("Starting complete verification process")
         try:
-            question = await self.start_verification()
+            question = await self.start_verification(session)
             response = await self.handle_question(question)
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.verify_endpoint,
-                    json=response,
-                    headers={"Content-Type": "application/json"},
-                ) as robot_response:
-                    robot_data = await robot_response.json()
-                    self.logger.info(f"Received robot response: {robot_data}")
-
-                    if "FLG:" in robot_data["text"]:
-                        self.logger.info("Verification completed successfully")
-                        return True
-                    return False
+            with self._stage("post"):
+                robot_data = await self._post(session, response)
+            self.logger.info(f"Received robot response: {robot_data}")
+
+            if "FLG:" in robot_data["text"]:
+                self.logger.info("Verification completed successfully")
+                return True
+            return False
 
         except Exception as e:
             self.logger.exception(e)
             self.logger.error(f"Verification failed: {str(e)}")
             return False
+
+
+async def run_verifications(verifier: RobotVerification, sessions: int, concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Run `sessions` verification dialogues concurrently, for load testing.
+
+    All dialogues share one aiohttp session (and the process-wide LLM clients),
+    so the run shows what one worker sustains and which stage a turn spends
+    its time in.
+
+    Args:
+        verifier (RobotVerification): Verifier whose stage latencies are reported
+        sessions (int): Number of dialogues
+        concurrency (Optional[int]): Dialogues in flight at once, None runs all together
+
+    Returns:
+        Dict[str, Any]: Dialogue count, passed dialogues, wall time and, per
+            stage, the count with p50/p90/p99 latency in seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency or sessions)
+    connector = aiohttp.TCPConnector(limit=concurrency or sessions)
+    started = time.monotonic()
+
+    async def run_one(session: aiohttp.ClientSession) -> bool:
+        async with semaphore:
+            return await verifier.verify(session)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*(run_one(session) for _ in range(sessions)))
+
+    return {
+        "sessions": sessions,
+        "passed": sum(results),
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "stages": {
+            stage: {
+                "count": histogram.count,
+                **{f"p{round(q * 100)}": histogram.quantile(q) for q in metrics.QUANTILES},
+            }
+            for stage, histogram in verifier.stage_latency.items()
+        },
+    }
@@ -3,11 +3,16 @@ import logging
 import os
 import re
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Any, Iterable, Iterator, Optional, Dict, List, TextIO, Tuple
 
 import httpx
-from openai import OpenAI
+import numpy as np
+from pydantic import BaseModel
+
+from src.llm import Provider, batch_chat, parse_response, structured
+from src.llm.schema import schema_kwargs
 
 
 @dataclass
@@ -16,6 +21,151 @@ class Question:
     answer: int | str
 
 
+class TestQuestion(BaseModel):
+    q: str
+    a: str
+
+
+class RepairedQuestion(BaseModel):
+    """Schema of a repaired entry, same shape as the entries of "test-data"."""
+
+    question: str
+    answer: int | str
+    test: Optional[TestQuestion] = None
+
+
+class RepairItem(RepairedQuestion):
+    id: str
+
+
+class RepairBatch(BaseModel):
+    """Schema of a repaired batch, every entry comes back with the id it was sent with."""
+
+    items: List[RepairItem]
+
+
+REPAIR_PROMPT = """
+<objective>
+You are supposed to analyze pairs of questions and answers and provide correct answers or fix mistakes.
+Data will be provided as list of JSON formatted objects. Question is marked as "question" or "q" and answer is marked as "answer" or "a".
+Sometimes data can have nested structures, but you should always look for the "question" or "q" and "answer" and "a" keys.
+</objective>
+<rules>
+- If question is a math operation, set answer field to correct number.
+- If question is not a math operation, set answer field to correct string.
+- If answer is incorrect, provide the correct answer. 
+- If answer is correct just return the data as is.
+- You MUST ALWAYS return the data in the same format as it was provided.
+</rules>
+"""
+
+BATCH_PROMPT = REPAIR_PROMPT + """<batch>
+Every object has an "id". Repair all of them and return each one in "items" with its "id" unchanged.
+</batch>
+"""
+
+
+# Every line matches: arithmetic ones fill the groups, anything else leaves them empty
+ARITHMETIC_LINE = re.compile(r"^(?:[ \t]*(-?\d+)[ \t]*([+\-*/])[ \t]*(-?\d+)[ \t]*|[^\n]*)$", re.MULTILINE)
+
+
+def check_arithmetic(questions: List[Any], answers: List[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Verifies all "a <op> b" questions at once, without eval.
+
+    Operands and operators of every row are extracted by one regex pass over the joined
+    questions and the answers are checked with vectorised operations. Results are exact
+    below 2**53.
+
+    :param questions: Question of each row, rows that are not "a <op> b" are reported as not arithmetic.
+    :param answers: Answer of each row, anything but a number counts as a wrong answer.
+    :return: Boolean mask of arithmetic rows, boolean mask of correct answers and the expected
+             answer of each row (NaN where not arithmetic or divided by zero).
+    """
+    if not questions:
+        empty = np.zeros(0, dtype=bool)
+        return empty, empty, np.zeros(0)
+    text = "\n".join(str(question).replace("\n", " ").replace("\r", " ") for question in questions)
+    parts = np.array(ARITHMETIC_LINE.findall(text), dtype=str).reshape(-1, 3)
+    lhs_text, ops, rhs_text = parts[:, 0], parts[:, 1], parts[:, 2]
+    arithmetic = ops != ""
+    lhs = np.where(arithmetic, lhs_text, "0").astype(np.float64)
+    rhs = np.where(arithmetic, rhs_text, "0").astype(np.float64)
+
+    quotient = np.divide(lhs, rhs, out=np.full(len(lhs), np.nan), where=rhs != 0)
+    expected = np.select(
+        [ops == "+", ops == "-", ops == "*", ops == "/"],
+        [lhs + rhs, lhs - rhs, lhs * rhs, quotient],
+        default=np.nan,
+    )
+    given = np.array(
+        [answer if isinstance(answer, (int, float)) and not isinstance(answer, bool) else np.nan for answer in answers],
+        dtype=np.float64,
+    )
+    return arithmetic, arithmetic & (given == expected), expected
+
+
+def _number(value: float) -> int | float:
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class TestDataReader:
+    """
+    Streams the items of the "test-data" array from a JSON document read in text chunks.
+
+    Only the item being decoded and the current chunk are held in memory. The other
+    top-level fields (description, copyright, ...) are collected in `fields` as they are
+    passed, those after the array are available once the items are exhausted.
+
+    Attributes:
+        fields (Dict): Top-level fields of the document other than "test-data".
+    """
+
+    ITEMS_START = re.compile(r'"test-data"\s*:\s*\[')
+    SEPARATOR = re.compile(r"[\s,]*")
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.fields: Dict = {}
+
+    @staticmethod
+    def _object_fields(text: str) -> Dict:
+        # The document around the array: '{"apikey": ..., ' before it, ', "copyright": ...}' after it
+        inner = text.strip().removeprefix("{").removesuffix("}").strip().strip(",")
+        return json.loads("{" + inner + "}") if inner else {}
+
+    def _more(self, buffer: str) -> str:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            raise ValueError(f'Truncated document, "test-data" is not complete: {buffer[:200]!r}')
+        return buffer + chunk
+
+    def __iter__(self) -> Iterator[Dict]:
+        decoder = json.JSONDecoder()
+        buffer = ""
+        while (match := self.ITEMS_START.search(buffer)) is None:
+            buffer = self._more(buffer)
+        self.fields.update(self._object_fields(buffer[:match.start()]))
+
+        buffer, position = buffer[match.end():], 0
+        while True:
+            position = self.SEPARATOR.match(buffer, position).end()
+            if position == len(buffer):
+                buffer, position = self._more(buffer[position:]), 0
+                continue
+            if buffer[position] == "]":
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk
+                buffer, position = self._more(buffer[position:]), 0
+                continue
+            yield item
+
+        self.fields.update(self._object_fields(buffer[position + 1:] + "".join(self._chunks)))
+
+
 @dataclass
 class DataRepairParser:
     """
@@ -24,6 +174,10 @@ class DataRepairParser:
     Attributes:
         origin_url (str): The origin URL from which data is fetched.
         cache_path (Optional[Path]): The optional path to a local cache file for data persistence.
+        stream (bool): Incremental mode, nothing is loaded up front and `repair_stream` reads the
+                       items from the HTTP body or the cache file as they are processed.
+        chunk_size (int): Number of items repaired together in incremental mode.
+        batch_size (int): Number of special cases sent to the LLM model in one request.
 
     Methods:
         __post_init__: Initializes the object after the dataclass __init__ method.
@@ -31,23 +185,38 @@ class DataRepairParser:
         _load_data: Loads data either from a cache or a remote source.
         _load_from_cache: Loads data from a cache file and returns it as a dictionary.
         _load_data_from_remote: Fetches data from a remote URL and optionally caches it locally.
+        _iter_text: Yields the document in text chunks from the cache or the remote source.
+        iter_questions: Streams the questions of the document.
         repair: Repairs questions by evaluating if they are standard math problems or special cases, using an LLM model if necessary.
+        repair_stream: Repairs the streamed questions chunk by chunk.
+        _send_batches: Sends the special cases to the LLM model in concurrent batches.
+        _validated: Re-validates a repaired special case locally.
         _send_to_model: Sends a question to the LLM model for analysis and repair.
         prepare_for_verification: Prepares the repaired data for verification by converting it to a JSON string.
+        write_for_verification: Writes the repaired data for verification to a file item by item.
     """
 
     origin_url: str
     cache_path: Optional[Path] = Path("data.json")
+    stream: bool = False
+    chunk_size: int = 10_000
+    batch_size: int = 25
+
+    # Size of the text chunks read from the cache file
+    READ_SIZE = 64 * 1024
 
     def __post_init__(self) -> None:
         """
         Initializes the object after the dataclass __init__ method.
-        Sets up OpenAI client, logging, and loads data.
+        Sets up logging and loads data.
 
         :return: None
         """
-        self.client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
         self._setup_logging()
+        if self.stream:
+            # Filled with the top-level fields while the questions are streamed
+            self.data = {}
+            return
         self.data = self._load_data()
         self.questions = self.data["test-data"]
 
@@ -105,67 +274,195 @@ class DataRepairParser:
 
         return data
 
+    def _iter_text(self) -> Iterator[str]:
+        """
+        Yields the document in text chunks, from the cache file when present. A remote document
+        is written to the cache as it streams in and only replaces it once complete.
+
+        :return: An iterator over text chunks of the JSON document.
+        """
+        if self.cache_path and self.cache_path.exists():
+            self.logger.info("Using cached data")
+            with self.cache_path.open(encoding="utf-8") as file:
+                while chunk := file.read(self.READ_SIZE):
+                    yield chunk
+            return
+
+        partial = self.cache_path.with_name(self.cache_path.name + ".part") if self.cache_path else None
+        with httpx.stream("GET", self.origin_url) as response:
+            response.raise_for_status()
+            cache = partial.open("w", encoding="utf-8") if partial else None
+            try:
+                for chunk in response.iter_text():
+                    if cache:
+                        cache.write(chunk)
+                    yield chunk
+            finally:
+                if cache:
+                    cache.close()
+        if partial:
+            partial.replace(self.cache_path)
+
+    def iter_questions(self) -> Iterator[Dict]:
+        """
+        Streams the questions of the document, the other top-level fields land in `data`.
+
+        :return: An iterator over the question dictionaries of 'test-data'.
+        """
+        reader = TestDataReader(self._iter_text())
+        self.data = reader.fields
+        yield from reader
+
     def repair(self) -> List[Dict]:
         """
         :return: A list of repaired question dictionaries. Each dictionary contains a 'question'
-                 and 'answer' key. The function evaluates whether each question is a standard
-                 math problem or a special case, and repairs it if necessary using an LLM model.
-        """
-        repaired = []
-        pattern = r'{"question":\s*"(\d+)\s*([+\-*/])\s*(\d+)",\s*"answer":\s*(\d+)}'
-        for question in self.questions:
-            # Is the question standard math or a special case?
-            if not re.match(pattern, json.dumps(question)):
-                # Special case always goes to LLM for repair
-                self.logger.info(f"Special case: {question}")
-                res = self._send_to_model(question)
-                self.logger.info(f"Repaired special case: {res}")
-                repaired.append(res)
-            else:
-                # Is the math question correct?
-                q, a = question["question"], question["answer"]
-                if eval(q) == a:
-                    repaired.append(question)
-                else:
-                    # Repair the math question
-                    self.logger.info(f"Found a broken math question: {question}")
-                    res = self._send_to_model(question)
-                    self.logger.info(f"Repaired broken math question: {res}")
-                    repaired.append(res)
+                 and 'answer' key. Arithmetic answers of all rows are checked and fixed locally
+                 in one vectorised pass, only the special cases (a 'test' sub-question or a
+                 question that is not arithmetic) are repaired by the LLM model, `batch_size`
+                 of them per request. In incremental mode the items of `repair_stream` are
+                 collected, use `repair_stream` itself to keep memory use flat.
+        """
+        if self.stream:
+            return list(self.repair_stream())
+        return self._repair_chunk(self.questions)
+
+    def repair_stream(self) -> Iterator[Dict]:
+        """
+        :return: An iterator over the repaired questions, read and repaired `chunk_size` at a time
+                 so memory use does not grow with the size of the document.
+        """
+        questions, offset = self.iter_questions(), 0
+        while chunk := list(islice(questions, self.chunk_size)):
+            yield from self._repair_chunk(chunk, offset)
+            offset += len(chunk)
+
+    def _repair_chunk(self, questions: List[Dict], offset: int = 0) -> List[Dict]:
+        """
+        :param questions: The question dictionaries to repair.
+        :param offset: Position of the first question in the document, special cases are sent
+                       to the model with their position as id.
+        :return: The repaired question dictionaries, in the same order.
+        """
+        repaired = list(questions)
+        arithmetic, correct, expected = check_arithmetic(
+            [question.get("question") for question in repaired],
+            [question.get("answer") for question in repaired],
+        )
+
+        broken = np.flatnonzero(arithmetic & ~correct & ~np.isnan(expected))
+        for index in broken:
+            self.logger.info(f"Found a broken math question: {repaired[index]}")
+            repaired[index] = {**repaired[index], "answer": _number(expected[index])}
+        self.logger.info(f"Fixed {len(broken)} of {len(repaired)} math questions locally")
 
+        # Special cases always go to LLM for repair, the arithmetic part is already fixed
+        special = {
+            str(offset + index): question
+            for index, question in enumerate(repaired)
+            if not arithmetic[index] or "test" in question
+        }
+        self.logger.info(f"Sending {len(special)} special cases to the model")
+        for item_id, res in self._send_batches(special).items():
+            self.logger.info(f"Repaired special case: {res}")
+            repaired[int(item_id) - offset] = res
+
+        return repaired
+
+    def _send_batches(self, questions: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Sends the special cases `batch_size` at a time, one structured request per batch, with
+        all batches in flight concurrently. Replies are mapped back by id and re-validated, entries
+        missing from a reply, invalid ones and those of a failed batch are repaired one by one.
+
+        :param questions: Special cases to repair, keyed by a stable id.
+        :return: The repaired special cases, keyed by the same ids.
+        """
+        if not questions:
+            return {}
+        ids = list(questions)
+        batches = {f"repair-{ids[start]}": ids[start:start + self.batch_size] for start in range(0, len(ids), self.batch_size)}
+        # Same batch, same repair: cached even though sampling is on
+        responses = batch_chat(
+            {
+                key: [{"role": "user", "content": f"Repair these questions: {json.dumps([{'id': item_id, **questions[item_id]} for item_id in batch])}"}]
+                for key, batch in batches.items()
+            },
+            model="gpt-4o-mini",
+            system=BATCH_PROMPT,
+            api_key=os.environ["OPENAI_API_KEY"],
+            cache=True,
+            cache_namespace="s01e03.repair",
+            name="s01e03-repair",
+            **schema_kwargs(Provider.OPENAI, RepairBatch),
+        )
+
+        repaired = {}
+        for key, batch in batches.items():
+            try:
+                response = responses[key]
+                if isinstance(response, Exception):
+                    raise response
+                items = {item.id: item.model_dump(exclude={"id"}, exclude_none=True) for item in parse_response(response, RepairBatch).items}
+            except Exception as e:
+                self.logger.error(f"Error in AI analysis of batch {key}: {str(e)}")
+                items = {}
+            for item_id in batch:
+                res = self._validated(questions[item_id], items[item_id]) if item_id in items else None
+                if res is None:
+                    self.logger.warning(f"No valid repair of {item_id} in batch {key}, repairing it alone")
+                    res = self._validated(questions[item_id], self._send_to_model(questions[item_id]), strict=False)
+                repaired[item_id] = res
+        return repaired
+
+    def _validated(self, question: Dict, res: Dict, strict: bool = True) -> Optional[Dict]:
+        """
+        :param question: The special case as sent to the model, its arithmetic already fixed locally.
+        :param res: The model's repair of it.
+        :param strict: Reject a repair that leaves an answer empty or unknown ("???").
+        :return: The special case with the model's answers, None if the repair is rejected. The
+                 questions are kept as sent and an arithmetic answer is never taken from the model.
+        """
+        def answered(answer: Any) -> bool:
+            return str(answer).strip() not in ("", "???")
+
+        arithmetic = check_arithmetic([question.get("question")], [question.get("answer")])[0][0]
+        repaired = dict(question)
+        if not arithmetic:
+            if strict and not answered(res.get("answer", "")):
+                return None
+            repaired["answer"] = res.get("answer", question.get("answer"))
+        if "test" in question:
+            answer = (res.get("test") or {}).get("a", "")
+            if not answered(answer):
+                if strict:
+                    return None
+                answer = question["test"]["a"]
+            repaired["test"] = {**question["test"], "a": answer}
         return repaired
 
-    def _send_to_model(self, question: Dict) -> str:
+    def _send_to_model(self, question: Dict) -> Dict:
         """
         :param question: A dictionary representing the question and answer pair to be analyzed and possibly corrected.
-        :return: A string representing the analyzed and corrected question-answer pair in JSON format.
-        """
-        system_prompt = """
-        <objective>
-        You are supposed to analyze pairs of questions and answers and provide correct answers or fix mistakes.
-        Data will be provided as list of JSON formatted objects. Question is marked as "question" or "q" and answer is marked as "answer" or "a".
-        Sometimes data can have nested structures, but you should always look for the "question" or "q" and "answer" and "a" keys.
-        </objective>
-        <rules>
-        - If question is a math operation, set answer field to correct number.
-        - If question is not a math operation, set answer field to correct string.
-        - If answer is incorrect, provide the correct answer. 
-        - If answer is correct just return the data as is.
-        - You MUST ALWAYS return the data in the same format as it was provided.
-        </rules>
+        :return: The corrected question-answer pair, validated against RepairedQuestion.
         """
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
+            # Same question, same repair: cached even though sampling is on.
+            # The reply is constrained to RepairedQuestion, a malformed one never costs another call
+            response = structured(
+                [
+                    {"role": "system", "content": REPAIR_PROMPT},
                     {
                         "role": "user",
                         "content": f"Repair this question: {json.dumps(question)}",
                     },
                 ],
+                RepairedQuestion,
+                model="gpt-4o-mini",
+                api_key=os.environ["OPENAI_API_KEY"],
+                cache=True,
+                cache_namespace="s01e03.repair",
             )
-            return json.loads(response.choices[0].message.content)
+            return response.model_dump(exclude_none=True)
 
         except Exception as e:
             self.logger.error(f"Error in AI question analysis: {str(e)}")
@@ -184,3 +481,22 @@ class DataRepairParser:
                 "test-data": data,
             }
         )
+
+    def write_for_verification(self, data: Iterable[Dict], out: TextIO) -> int:
+        """
+        Writes the same document as `prepare_for_verification`, one item at a time. The description
+        and copyright come last, in incremental mode they are known only once the items are read.
+
+        :param data: The repaired question dictionaries, typically `repair_stream()`.
+        :param out: A text file the JSON document is written to.
+        :return: The number of items written.
+        """
+        out.write(f'{{"apikey": {json.dumps(os.environ["API_KEY"])}, "test-data": [')
+        count = 0
+        for item in data:
+            out.write(", " if count else "")
+            out.write(json.dumps(item))
+            count += 1
+        out.write(f'], "description": {json.dumps(self.data["description"])}')
+        out.write(f', "copyright": {json.dumps(self.data["copyright"])}}}')
+        return count
@@ -1,5 +1,9 @@
+import hashlib
+import json
 import os
+import re
 from enum import Enum
+from pathlib import Path
 from typing import Optional
 
 import requests
@@ -8,6 +12,85 @@ from dotenv import load_dotenv
 from anthropic import Anthropic
 from langfuse.decorators import observe, langfuse_context
 
+from src.cache import SQLiteCache, DEFAULT_CACHE_DIR
+
+CENSOR = "CENZURA"
+
+# Censored texts by input hash. The same report is censored once, reruns only resend it
+CENSOR_CACHE_PATH = Path(os.getenv("CENSOR_CACHE_PATH", DEFAULT_CACHE_DIR / "censor.sqlite"))
+CENSOR_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+_censor_cache: Optional[SQLiteCache] = None
+
+_UPPER = "A-ZĄĆĘŁŃÓŚŹŻ"
+_LOWER = "a-ząćęłńóśźż"
+_CAPITALIZED = rf"[{_UPPER}][{_LOWER}]+"
+
+# Gazetteers of the first-stage censor, matched with their inflected forms
+FIRST_NAMES = (
+    "Adam", "Agnieszka", "Aleksander", "Aleksandra", "Andrzej", "Anna", "Barbara", "Bartosz", "Beata",
+    "Dariusz", "Dawid", "Dorota", "Elżbieta", "Ewa", "Filip", "Grzegorz", "Halina", "Henryk", "Iwona",
+    "Jacek", "Jakub", "Jan", "Janina", "Janusz", "Jarosław", "Jerzy", "Joanna", "Jolanta", "Józef",
+    "Justyna", "Kamil", "Karol", "Karolina", "Katarzyna", "Kazimierz", "Krystyna", "Krzysztof",
+    "Leszek", "Łukasz", "Maciej", "Magdalena", "Małgorzata", "Marcin", "Marek", "Maria", "Mariusz",
+    "Marta", "Michał", "Monika", "Natalia", "Patryk", "Paweł", "Piotr", "Rafał", "Robert", "Ryszard",
+    "Sebastian", "Stanisław", "Szymon", "Tadeusz", "Tomasz", "Wiesław", "Witold", "Wojciech",
+    "Zbigniew", "Zofia",
+)
+CITIES = (
+    "Białyst", "Białymstoku", "Bielsk", "Bydgoszcz", "Częstochow", "Elbląg", "Gdańsk", "Gdyni", "Gdyn",
+    "Gliwic", "Katowic", "Kielc", "Koszalin", "Krak[oó]w", "Legnic", "Lublin", "Łod", "Łódź", "Olsztyn",
+    "Opol", "Płock", "Pozna[ńn]", "Radom", "Rzesz[oó]w", "Słupsk", "Sosnowc", "Szczecin", "Tarn[oó]w",
+    "Toru[ńn]", "Warszaw", "Wrocław", "Zabrz", "Zielon[aej] Gór",
+)
+
+# "ul. Różanej 12", "ulicy 3 Maja 5/2": the street name and number become one word
+STREET = re.compile(rf"\b(ul\.|ulicy|ulica|ulicą)\s+[{_UPPER}\d][^\s,.;]*(?:\s+[{_UPPER}][^\s,.;]*)*\s+\d+[a-zA-Z]?(?:/\d+[a-zA-Z]?)?\b")
+AGE = re.compile(r"\b\d{1,3}(?=\s+lat[a]?\b)")
+FULL_NAME = re.compile(rf"\b(?:{'|'.join(FIRST_NAMES)})[{_LOWER}]{{0,3}}\s+{_CAPITALIZED}(?:-{_CAPITALIZED})?")
+CITY_AFTER_W = re.compile(rf"\b([Ww]e?)\s+{_CAPITALIZED}(?:[\s-]{_CAPITALIZED})?")
+CITY = re.compile(rf"\b(?:{'|'.join(CITIES)})[{_LOWER}]*")
+ADJACENT = re.compile(rf"{CENSOR}(?:\s+{CENSOR})+")
+# What one "CENZURA" may stand for: a name, city, street + number or age, never a whole sentence
+CENSORED_SPAN = r"([^.,;:!?\n]{1,40}?)"
+
+
+def censor_locally(text: str) -> str:
+    """
+    First-stage censor: name + surname, street + number, age before "lat" and cities
+    after "w" or from the gazetteer, each replaced with one word "CENZURA".
+
+    Args:
+        text (str): Text to censor
+
+    Returns:
+        str: Text with every match censored, the rest left unchanged
+    """
+    text = STREET.sub(rf"\1 {CENSOR}", text)
+    text = AGE.sub(CENSOR, text)
+    text = FULL_NAME.sub(CENSOR, text)
+    text = CITY_AFTER_W.sub(rf"\1 {CENSOR}", text)
+    text = CITY.sub(CENSOR, text)
+    return ADJACENT.sub(CENSOR, text)
+
+
+def censors(original: str, censored: str) -> bool:
+    """
+    Whether `censored` is `original` with some short parts replaced by "CENZURA" and
+    nothing else changed, so a model reply can be trusted not to reword the text or
+    censor whole sentences.
+    """
+    pattern = CENSORED_SPAN.join(re.escape(part) for part in censored.strip().split(CENSOR))
+    return re.fullmatch(pattern, original.strip(), re.DOTALL) is not None
+
+
+def get_censor_cache() -> SQLiteCache:
+    """Return the shared cache of censored texts, opening the file on first use."""
+    global _censor_cache
+    if _censor_cache is None:
+        _censor_cache = SQLiteCache(CENSOR_CACHE_PATH, max_bytes=CENSOR_CACHE_MAX_BYTES)
+    return _censor_cache
+
 
 class ModelProvider(Enum):
     ANTHROPIC = "anthropic"
@@ -65,6 +148,11 @@ Podejrzany: CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.
 </example>
 
 Here's the text: {text}
+
+Here's the same text already censored by simple rules: {draft}
+
+Check the rules' result: censor what they missed and restore what is not personal information. 
+Return only the final censored text.
 """
 
     @staticmethod
@@ -104,7 +192,7 @@ Here's the text: {text}
 
     @observe(as_type="generation")
     def censor_text_anthropic(
-        self, text: str, model: str = "claude-3-haiku-20240307"
+        self, text: str, model: str = "claude-3-haiku-20240307", draft: Optional[str] = None
     ) -> str:
         """
         Use Claude to censor personal information in text.
@@ -112,12 +200,13 @@ Here's the text: {text}
         Args:
             text (str): Text to censor
             model (str, optional): Claude model to use. Defaults to "claude-3-haiku-20240307"
+            draft (Optional[str]): The text censored by `censor_locally`, for the model to validate and patch
 
         Returns:
             str: Censored text
         """
         self.logger.info("Starting Anthropic text censorship process")
-        context = self.context_template.format(text=text)
+        context = self.context_template.format(text=text, draft=draft or censor_locally(text))
 
         # Update Langfuse with input parameters before the API call
         langfuse_context.update_current_observation(
@@ -148,19 +237,20 @@ Here's the text: {text}
         return censored_text
 
     @observe(as_type="generation")
-    def censor_text_ollama(self, text: str, model: str = "") -> str:
+    def censor_text_ollama(self, text: str, model: str = "", draft: Optional[str] = None) -> str:
         """
         Use Ollama to censor personal information in text.
 
         Args:
             text (str): Text to censor
             model (str, optional): Ollama model to use
+            draft (Optional[str]): The text censored by `censor_locally`, for the model to validate and patch
 
         Returns:
             str: Censored text
         """
         self.logger.info("Starting Ollama text censorship process")
-        context = self.context_template.format(text=text)
+        context = self.context_template.format(text=text, draft=draft or censor_locally(text))
 
         # Update Langfuse with input parameters
         langfuse_context.update_current_observation(
@@ -188,12 +278,21 @@ Here's the text: {text}
 
         return result["response"]
 
-    observe()
+    def _cache_key(self, text: str, model: str) -> str:
+        """Hash of the input text, provider, model and prompt."""
+        canonical = json.dumps([self.provider.value, model, self.context_template, text], ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
+    @observe()
     def censor_text(self, text: str, model: Optional[str] = None) -> str:
         """
         Censor personal information in text using the configured provider.
 
+        The text is censored by `censor_locally` first, the model only validates and patches
+        that result in a single call. A reply that does more than replace parts of the text
+        with "CENZURA" is discarded in favour of the local result. Results are cached by
+        input hash, so the same text is never sent twice.
+
         Args:
             text (str): Text to censor
             model (Optional[str]): Model to use. If None, uses default for provider
@@ -205,18 +304,43 @@ Here's the text: {text}
             f"Starting text censorship process using {self.provider.value}"
         )
 
-        # Update Langfuse with general process information
-        langfuse_context.update_current_observation(
-            metadata={"provider": self.provider.value, "text_length": len(text)}
-        )
-
         if self.provider == ModelProvider.ANTHROPIC:
             model = model or "claude-3-haiku-20240307"
-            censored_text = self.censor_text_anthropic(text, model)
         else:  # OLLAMA
             model = model or "mistral"
-            censored_text = self.censor_text_ollama(text, model)
 
+        key = self._cache_key(text, model)
+        cached = get_censor_cache().get("censor", key)
+        if cached is not None:
+            self.logger.info(f"Text censored from cache: {cached}")
+            langfuse_context.update_current_observation(
+                metadata={"provider": self.provider.value, "text_length": len(text), "stage": "cache"}
+            )
+            return cached
+
+        draft = censor_locally(text)
+        self.logger.info(f"Text censored by rules: {draft}")
+
+        if self.provider == ModelProvider.ANTHROPIC:
+            reply = self.censor_text_anthropic(text, model, draft)
+        else:  # OLLAMA
+            reply = self.censor_text_ollama(text, model, draft)
+
+        reply = ADJACENT.sub(CENSOR, reply.strip())
+        if censors(text, reply):
+            censored_text, stage = reply, "model"
+        else:
+            self.logger.warning(f"Model reply changes more than personal information, using the rules' result: {reply}")
+            censored_text, stage = draft, "rules"
+
+        # Update Langfuse with general process information
+        langfuse_context.update_current_observation(
+            metadata={"provider": self.provider.value, "text_length": len(text), "stage": stage}
+        )
+
+        # A rejected reply is not cached, the next run asks the model again
+        if stage == "model":
+            get_censor_cache().set("censor", key, censored_text)
         self.logger.info(f"Text successfully censored: {censored_text}")
         return censored_text
 
@@ -258,8 +382,7 @@ Here's the text: {text}
             ollama_base_url=ollama_base_url,
         )
 
-    observe()
-
+    @observe()
     def process_text(self, input_url: str, model: Optional[str] = None) -> str:
         """
         Complete process of downloading and censoring text.
@@ -291,7 +414,7 @@ Here's the text: {text}
                 },
             )
 
-            return self.censor_text(original_text, model)
+            return censored_text
 
         except Exception as e:
             # Log error to Langfuse
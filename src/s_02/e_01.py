@@ -1,14 +1,14 @@
 import json
 import os
 
-import anthropic
-
 import openai
 from pathlib import Path
 import logging
 
 from openai import OpenAI
 
+from src.llm import chat
+from src.llm.budget import context_budget, fit_context
 from src.prompt.s02e01 import SYSTEM_PROMPT
 
 logging.basicConfig(
@@ -74,25 +74,27 @@ def query_claude_with_json_context(json_path: str, question: str) -> str:
     """
     Read transcriptions from JSON file and query Claude with the context
 
+    Transcriptions least related to the question are dropped when they do not
+    fit the model's window (or LLM_PROMPT_BUDGET).
+
     Parameters:
     json_path (str): Path to the JSON file with transcriptions
     question (str): Question to ask Claude
     """
-    client = anthropic.Client(api_key=os.environ["ANTHROPIC_API_KEY"])
+    model, max_tokens = "claude-3-5-sonnet-latest", 1000
 
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    # Combine all transcriptions into one context
-    context = "\n\n".join(
+    transcripts = [
         f"File: {item['file_name']}\nContent: {item['transcription']}"
         for item in data["transcriptions"]
-    )
+    ]
 
     # Create the message for Claude
     system_prompt = SYSTEM_PROMPT
 
-    user_message = f"""
+    user_template = """
        Here are the transcriptions of several audio files:
 
        {context}
@@ -101,14 +103,20 @@ def query_claude_with_json_context(json_path: str, question: str) -> str:
        {question}
        """
 
+    # Combine the transcriptions that fit the budget into one context
+    budget = context_budget(model, max_tokens, system_prompt, user_template.format(context="", question=question))
+    context = "\n\n".join(fit_context(transcripts, budget, model, query=question))
+    user_message = user_template.format(context=context, question=question)
+
     # Query Claude
-    message = client.messages.create(
-        model="claude-3-5-sonnet-latest",
+    message = chat(
+        [{"role": "user", "content": user_message}],
+        model=model,
         system=system_prompt,
-        max_tokens=1000,
-        messages=[{"role": "user", "content": user_message}],
+        max_tokens=max_tokens,
+        api_key=os.environ["ANTHROPIC_API_KEY"],
     )
 
     logger.info("Model response:")
-    logger.info(message.content[0].text)
-    return message.content[0].text
+    logger.info(message.text)
+    return message.text
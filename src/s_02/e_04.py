@@ -6,10 +6,9 @@ from pathlib import Path
 from typing import Dict, List
 
 import aiofiles
-from anthropic import AsyncAnthropic
-from openai import AsyncOpenAI
 from langfuse.decorators import observe, langfuse_context
 
+from src.llm import achat, atranscribe, avision
 from src.prompt.s02e04 import prompt_text, prompt_image
 
 # Configure logging
@@ -21,8 +20,8 @@ logging.basicConfig(
 class ContentClassifier:
     def __init__(self, claude_api_key: str, openai_api_key: str) -> None:
         self.logger = logging.getLogger(__name__)
-        self.claude_client = AsyncAnthropic(api_key=claude_api_key)
-        self.openai_client = AsyncOpenAI(api_key=openai_api_key)
+        self.claude_api_key = claude_api_key
+        self.openai_api_key = openai_api_key
         self.logger.info("ContentClassifier initialized")
 
     @observe(as_type="generation")
@@ -56,16 +55,22 @@ class ContentClassifier:
                 metadata={"filename": filename},
             )
 
-            response = await self.claude_client.messages.create(**kwargs)
+            # Classification of a given text never changes, keep it across runs
+            response = await achat(
+                api_key=self.claude_api_key,
+                cache=True,
+                cache_namespace="s02e04.classify",
+                **kwargs,
+            )
 
             langfuse_context.update_current_observation(
                 usage={
-                    "input": response.usage.input_tokens,
-                    "output": response.usage.output_tokens,
+                    "input": 0 if response.cached else response.prompt_tokens,
+                    "output": 0 if response.cached else response.completion_tokens,
                 }
             )
 
-            classification = response.content[0].text
+            classification = response.text
             # self.logger.info(f"Text classified as: {classification}")
             self.logger.info(f"[{filename}] Classification result: {classification}")
             return classification
@@ -123,10 +128,11 @@ class ContentClassifier:
             self.logger.debug(f"Created temporary directory: {temp_dir}")
 
             self.logger.info("Starting audio transcription")
-            transcript = await self.openai_client.audio.transcriptions.create(
-                file=open(filepath, "rb"), model="whisper-1"
+            # Duplicate recordings in the folder share one transcription
+            transcript = await atranscribe(
+                filepath, model="whisper-1", api_key=self.openai_api_key
             )
-            return await self.classify_text(transcript.text)
+            return await self.classify_text(transcript)
 
         except Exception as e:
             self.logger.error(
@@ -154,46 +160,33 @@ class ContentClassifier:
         """
         try:
             self.logger.info(f"Processing image file: {filepath}")
-            base64_image = self._encode_image(filepath)
-            self.logger.debug("Image encoded to base64")
-
-            kwargs = {
-                "model": "claude-3-5-sonnet-latest",
-                "max_tokens": 300,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt_image},
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/png",
-                                    "data": base64_image,
-                                },
-                            },
-                        ],
-                    }
-                ],
-            }
+            model = "claude-3-5-sonnet-latest"
 
             langfuse_context.update_current_observation(
-                input=kwargs["messages"],
-                model=kwargs["model"],
+                input=prompt_image,
+                model=model,
                 metadata={"filepath": filepath},
             )
 
-            response = await self.claude_client.messages.create(**kwargs)
+            # Identical images classified at the same time share one request
+            response = await avision(
+                prompt_image,
+                [filepath],
+                model=model,
+                max_tokens=300,
+                api_key=self.claude_api_key,
+                cache=True,
+                cache_namespace="s02e04.classify",
+            )
 
             langfuse_context.update_current_observation(
                 usage={
-                    "input": response.usage.input_tokens,
-                    "output": response.usage.output_tokens,
+                    "input": 0 if response.cached else response.prompt_tokens,
+                    "output": 0 if response.cached else response.completion_tokens,
                 }
             )
 
-            classification = response.content[0].text
+            classification = response.text
             self.logger.info(f"Image classified as: {classification}")
             return classification
 
@@ -1,4 +1,3 @@
-import base64
 import os
 import re
 import requests
@@ -7,15 +6,13 @@ from bs4 import BeautifulSoup
 from collections import defaultdict
 from dotenv import load_dotenv
 from loguru import logger
-from openai import OpenAI
 from openai.types import ImagesResponse
 from typing import Any, Dict, List, Literal, Optional, Union
 from urllib.parse import urljoin
 
+from src.llm import chat, get_openai, transcribe, vision
 
 load_dotenv()
-client = OpenAI()
-client.api_key = os.getenv("OPENAI_API_KEY")
 
 
 def generate_local_llm_response(
@@ -47,14 +44,16 @@ def openai_create(
     human_template: str,
     model: str = "gpt-4o-mini",
     full_response: bool = False,
+    cache_prefix: bool = False,
 ) -> Union[Dict[str, Any], str]:
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
+    response = chat(
+        [
             {"role": "system", "content": system_template},
             {"role": "user", "content": human_template},
         ],
-    )
+        model=model,
+        cache_prefix=cache_prefix,
+    ).raw
     return response if full_response else response.choices[0].message
 
 
@@ -66,24 +65,13 @@ def openai_vision_create(
     temperature: float = 0.5,
     full_response: bool = False,
 ) -> Union[Dict[str, Any], str]:
-    content = [{"type": "text", "text": human_template}]
-    for image in images:
-        content.append(
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64, {base64.b64encode(image.read()).decode('utf-8')}"
-                },
-            }
-        )
-    response = client.chat.completions.create(
+    response = vision(
+        human_template,
+        [image.read() for image in images],
         model=model,
-        messages=[
-            {"role": "system", "content": system_template},
-            {"role": "user", "content": content},
-        ],
+        system=system_template,
         temperature=temperature,
-    )
+    ).raw
     return response if full_response else response.choices[0].message
 
 
@@ -95,7 +83,7 @@ def openai_image_create(
         "256x256", "512x512", "1024x1024", "1792x1024", "1024x1792"
     ] = "1024x1024",
 ) -> ImagesResponse:
-    response = client.images.generate(
+    response = get_openai().images.generate(
         model=model, prompt=human_template, n=n, size=size
     )
     return response
@@ -110,11 +98,7 @@ def whisper_transcribe_1(
 
 
 def whisper_transcribe(path: str) -> str:
-    with open(path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1", file=audio_file
-        )
-    return transcript.text
+    return transcribe(path, model="whisper-1")
 
 
 def aidevs_send_answer(task: str, answer: Any) -> requests.Response:
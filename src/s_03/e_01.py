@@ -1,7 +1,8 @@
 import os
 import logging
 from typing import Dict
-from anthropic import Anthropic
+
+from src.llm import batch_chat
 
 
 def process_text_files(folder_path: str) -> Dict[str, str]:
@@ -71,31 +72,35 @@ def use_llm(
     Returns:
         Dictionary with filename as key and list of keywords as value
     """
-    client = Anthropic(api_key=anthropic_api_key)
-    keywords_dict = {}
+    # Files go out as one batch job, so bulk runs can use the cheaper Batch API
+    results = batch_chat(
+        {
+            filename: [
+                {
+                    "role": "user",
+                    "content": prompt.format(content=content, filename=filename),
+                }
+            ]
+            for filename, content in text_dict.items()
+        },
+        api_key=anthropic_api_key,
+        model="claude-3-5-haiku-latest",
+        max_tokens=300,
+        temperature=0,
+        cache_namespace="s03e01.keywords",
+        name="s03e01-keywords",
+    )
 
-    for filename, content in text_dict.items():
-        try:
-            message = client.messages.create(
-                model="claude-3-5-haiku-latest",
-                max_tokens=300,
-                temperature=0,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt.format(content=content, filename=filename),
-                    }
-                ],
-            )
-
-            # Access the content correctly from the response
-            names = [k.strip() for k in message.content[0].text.split(",")]
-            keywords_dict[filename] = names
-            logging.info(f"Successfully extracted keywords from {filename}")
-
-        except Exception as e:
-            logging.error(f"Failed to extract keywords from {filename}: {str(e)}")
+    keywords_dict = {}
+    for filename, message in results.items():
+        if isinstance(message, Exception):
+            logging.error(f"Failed to extract keywords from {filename}: {str(message)}")
             keywords_dict[filename] = []
+            continue
+
+        names = [k.strip() for k in message.text.split(",")]
+        keywords_dict[filename] = names
+        logging.info(f"Successfully extracted keywords from {filename}")
 
     return keywords_dict
 
@@ -1,45 +1,28 @@
 import os
-import re
-import anthropic
 from typing import List, Dict
 from loguru import logger
 
+from src.llm import read_fields
 from src.send_task import send
 from src.prompt.s03e03 import INITIAL_PROMPT
 
 
 def get_claude_response(messages: List[Dict[str, str]]) -> Dict:
-    client = anthropic.Client(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-    # Extract system message
-    system_message = next(
-        (msg["content"] for msg in messages if msg["role"] == "system"), ""
-    )
-
-    # Filter out system message from messages
-    chat_messages = [msg for msg in messages if msg["role"] != "system"]
-
-    response = client.messages.create(
+    # The gateway moves the system message to Anthropic's `system` parameter.
+    # The reply is streamed and cut off once the query and the verdict are in
+    fields = read_fields(
+        messages,
+        ("QUERY", "REASONING", "IS_FINAL"),
+        required=("QUERY", "IS_FINAL"),
+        multiline=("QUERY", "REASONING"),
         model="claude-3-5-haiku-latest",
         max_tokens=1024,
-        system=system_message,
-        messages=chat_messages,
-    )
-
-    content = response.content[0].text
-
-    query_match = re.search(r"QUERY:\s*(.+?)(?=REASONING:|$)", content, re.DOTALL)
-    reasoning_match = re.search(
-        r"REASONING:\s*(.+?)(?=IS_FINAL:|$)", content, re.DOTALL
     )
-    is_final_match = re.search(r"IS_FINAL:\s*(true|false)", content, re.IGNORECASE)
 
     return {
-        "query": query_match.group(1).strip() if query_match else None,
-        "reasoning": reasoning_match.group(1).strip() if reasoning_match else None,
-        "is_final": (
-            is_final_match.group(1).lower() == "true" if is_final_match else False
-        ),
+        "query": fields.get("QUERY") or None,
+        "reasoning": fields.get("REASONING") or None,
+        "is_final": fields.get("IS_FINAL", "").lower().startswith("true"),
     }
 
 
@@ -64,7 +47,7 @@ def create_sql_agent():
 
         # Execute SQL query
         query_result = send(
-            url="https://centrala.ag3nts.org/apidb",
+            url=f"{os.getenv('CENTRALA_URL')}apidb",
             apikey=os.getenv("API_KEY"),
             answer=response["query"],
             task="database",
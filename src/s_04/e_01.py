@@ -4,15 +4,15 @@ import asyncio
 import base64
 import requests
 import anthropic
-from typing import List, Optional, Tuple
+from typing import List, Optional
 import httpx
-from anthropic import Anthropic
 from dotenv import load_dotenv
 from loguru import logger
 from langsmith import traceable
 from pydantic import BaseModel
 from src.prompt.s04e01 import TOOLS_PROMPT, DESCRIPTION_PROMPT
-from src.send_task import send
+from src.llm import aread_fields
+from src.send_task import send, asend, aget
 
 load_dotenv()
 # Configuration
@@ -46,11 +46,10 @@ class AsyncImageAnalyzer:
     """Async version of ImageAnalyzer for concurrent image processing."""
 
     def __init__(self):
-        """Initialize the AsyncImageAnalyzer with Anthropic client."""
+        """Initialize the AsyncImageAnalyzer, Claude calls go through the shared gateway."""
         logger.info("Initializing AsyncImageAnalyzer")
         if not Config.ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY not set")
-        self.anthropic = Anthropic(api_key=Config.ANTHROPIC_API_KEY)
         self.client = httpx.AsyncClient()
 
     # The URL validation method in AsyncImageAnalyzer should also be updated:
@@ -82,7 +81,8 @@ class AsyncImageAnalyzer:
         """Async version of URL to base64 conversion."""
         try:
             logger.debug(f"Converting image to base64: {url}")
-            response = await self.client.get(url)
+            # The same photo can be reached by several repair chains at once
+            response = await aget(url)
             response.raise_for_status()
 
             base64_data = base64.b64encode(response.content).decode('utf-8')
@@ -93,21 +93,6 @@ class AsyncImageAnalyzer:
             logger.error(f"Failed to convert image to base64: {str(e)}")
             raise
 
-    @staticmethod
-    def _extract_analysis_details(response_text: str) -> Tuple[Optional[str], Optional[str]]:
-        """Extract action and reason from Claude's response."""
-        action = None
-        reason = None
-
-        for line in response_text.split('\n'):
-            line = line.strip()
-            if line.startswith('ACTION:'):
-                action = line.split('ACTION:')[1].strip()
-            elif line.startswith('REASON:'):
-                reason = line.split('REASON:')[1].strip()
-
-        return action, reason
-
     @traceable(run_type="tool")
     async def analyze_image(self, url: str) -> Optional[str]:
         """Async version of image analysis."""
@@ -118,11 +103,17 @@ class AsyncImageAnalyzer:
             await self._check_image_availability(url)
             base64_image = await self._url_to_base64(url)
 
-            # Get Claude's analysis
+            # Get Claude's analysis, streamed until the ACTION line is complete:
+            # the pipeline acts on it alone, the REASON that follows is skipped
             logger.debug("Preparing Claude prompt for image analysis")
-            message = self.anthropic.messages.create(
+            fields = await aread_fields(
                 model="claude-3-5-sonnet-latest",
                 max_tokens=1000,
+                api_key=Config.ANTHROPIC_API_KEY,
+                cache=True,
+                cache_namespace="s04e01.photos",
+                fields=("ACTION", "REASON"),
+                required=("ACTION",),
                 messages=[{
                     "role": "user",
                     "content": [
@@ -142,11 +133,9 @@ class AsyncImageAnalyzer:
                 }]
             )
 
-            action, reason = self._extract_analysis_details(message.content[0].text)
+            action = fields.get("ACTION")
             if action:
                 logger.success(f"Recommended action: {action} for {url}")
-            if reason:
-                logger.success(f"Analysis reason: {reason}")
 
             return action
 
@@ -161,10 +150,9 @@ class AsyncImageAnalyzer:
 
 async def send_api_request(query: str) -> ApiResponse:
     """Async version of API request sender."""
-    async with httpx.AsyncClient() as client:
-        data = ApiRequest(answer=query)
-        response = await client.post(f"{Config.CENTRALA_URL}report", json=data.model_dump())
-        return ApiResponse(**response.json())
+    data = ApiRequest(answer=query)
+    response = await asend(f"{Config.CENTRALA_URL}report", **data.model_dump())
+    return ApiResponse(**response)
 
 async def extract_filename_from_response(response_message: str) -> str:
     """
@@ -1 +1 @@
-import jsonfrom openai import OpenAIfrom loguru import loggerfrom typing import Listdef convert_to_jsonl(correct_file, incorrect_file, output_file):    """    Convert correct and incorrect data files into JSONL format for fine-tuning.    Args:        correct_file (str): Path to file containing correct data        incorrect_file (str): Path to file containing incorrect data        output_file (str): Path to output JSONL file    """    # Initialize the list to store all entries    jsonl_data = []    # Process correct data    with open(correct_file, 'r') as f:        correct_data = f.read().strip().split('\n')    # Process incorrect data    with open(incorrect_file, 'r') as f:        incorrect_data = f.read().strip().split('\n')    # Create entries for correct data    for input_data in correct_data:        entry = {            "messages": [                {                    "role": "system",                    "content": "Classify input as either correct or incorrect."                },                {                    "role": "user",                    "content": input_data                },                {                    "role": "assistant",                    "content": "correct"                }            ]        }        jsonl_data.append(entry)    # Create entries for incorrect data    for input_data in incorrect_data:        entry = {            "messages": [                {                    "role": "system",                    "content": "Classify input as either correct or incorrect."                },                {                    "role": "user",                    "content": input_data                },                {                    "role": "assistant",                    "content": "incorrect"                }            ]        }        jsonl_data.append(entry)    # Write to JSONL file    with open(output_file, 'w') as f:        for entry in jsonl_data:            f.write(json.dumps(entry) + '\n')def process_verify_file(filename: str) -> List[str]:    client = OpenAI()    # store correct number    correct_numbers: List[str] = []    # Read file content    with open(filename, 'r') as file:        for line in file:            # Split line into number and values            number, values = line.strip().split('=')            # Make Api call to check values            completion = client.chat.completions.create(                model="ft:gpt-4o-mini-2024-07-18:personal:ai-devs3:AYL313KI",              messages=[                {                    "role": "system",                    "content": "Classify input as either correct or incorrect. Output should be a single word: CORRECT or INCORRECT."                },                {                    "role": "user",                    "content": values                }              ]            )            logger.info(f"Number: {number} |Input: {values} | Output: {completion.choices[0].message.content.upper()}")            # Check response            if completion.choices[0].message.content.upper() == "CORRECT":                correct_numbers.append(number)    logger.success(f"Final output: {correct_numbers}")    return correct_numbers
\ No newline at end of file
+import jsonfrom loguru import loggerfrom typing import Dict, List, Optionalfrom src.llm import batch_chatdef convert_to_jsonl(correct_file, incorrect_file, output_file):    """    Convert correct and incorrect data files into JSONL format for fine-tuning.    Args:        correct_file (str): Path to file containing correct data        incorrect_file (str): Path to file containing incorrect data        output_file (str): Path to output JSONL file    """    # Initialize the list to store all entries    jsonl_data = []    # Process correct data    with open(correct_file, 'r') as f:        correct_data = f.read().strip().split('\n')    # Process incorrect data    with open(incorrect_file, 'r') as f:        incorrect_data = f.read().strip().split('\n')    # Create entries for correct data    for input_data in correct_data:        entry = {            "messages": [                {                    "role": "system",                    "content": "Classify input as either correct or incorrect."                },                {                    "role": "user",                    "content": input_data                },                {                    "role": "assistant",                    "content": "correct"                }            ]        }        jsonl_data.append(entry)    # Create entries for incorrect data    for input_data in incorrect_data:        entry = {            "messages": [                {                    "role": "system",                    "content": "Classify input as either correct or incorrect."                },                {                    "role": "user",                    "content": input_data                },                {                    "role": "assistant",                    "content": "incorrect"                }            ]        }        jsonl_data.append(entry)    # Write to JSONL file    with open(output_file, 'w') as f:        for entry in jsonl_data:            f.write(json.dumps(entry) + '\n')def process_verify_file(filename: str, batch_mode: Optional[str] = None) -> List[str]:    """    Classify every line of the verify file with the fine-tuned model.    All lines go out as one batch job (see `src.llm.batch_chat`).    Args:        filename (str): Path to file with "number=values" lines        batch_mode (Optional[str]): "direct", "provider" or "local", LLM_BATCH_MODE when None    Returns:        List[str]: Numbers of the lines classified as correct    """    # Read file content, split lines into number and values    samples: Dict[str, str] = {}    with open(filename, 'r') as file:        for line in file:            number, values = line.strip().split('=')            samples[number] = values    # Check all values in one batch    results = batch_chat(        {            number: [                {                    "role": "system",                    "content": "Classify input as either correct or incorrect. Output should be a single word: CORRECT or INCORRECT."                },                {                    "role": "user",                    "content": values                }            ]            for number, values in samples.items()        },        model="ft:gpt-4o-mini-2024-07-18:personal:ai-devs3:AYL313KI",        mode=batch_mode,        name="s04e02-verify",    )    # store correct number    correct_numbers: List[str] = []    for number, result in results.items():        if isinstance(result, Exception):            raise result        output = result.text.upper()        logger.info(f"Number: {number} |Input: {samples[number]} | Output: {output}")        # Check response        if output == "CORRECT":            correct_numbers.append(number)    logger.success(f"Final output: {correct_numbers}")    return correct_numbers
\ No newline at end of file
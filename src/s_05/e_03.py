@@ -1 +1 @@
-import osimport loggingimport jsonimport requestsfrom datetime import datetimefrom typing import Dict, List, Anyfrom openai import OpenAIfrom dotenv import load_dotenvimport asyncioimport aiohttpfrom src.prompt.s05e03 import PROMPT_SOURCE_O, PROMPT_SOURCE_1# Constantsload_dotenv()TOKEN_ENDPOINT = os.getenv("TOKEN_ENDPOINT")PASSWORD = os.getenv('PASSWORD')DUMP_FOLDER = "../data/s05e03"RESULTS_FILE = "results.txt"INPUT_FILE = "content.md"# API key setupAPI_KEY = os.environ.get('API_KEY')OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')if not API_KEY or not OPENAI_API_KEY:    raise ValueError("AIDEVS and OPENAI_API_KEY environment variables must be set")class QuestionsAgent:    def __init__(self):        self.client = OpenAI(api_key=OPENAI_API_KEY)        self.content = self._read_content_file()        self._setup_logging()    @staticmethod    def _setup_logging():        """Setup logging to file with timestamps"""        try:            # Ensure the dump folder exists            os.makedirs(DUMP_FOLDER, exist_ok=True)            # Remove existing log file if it exists            results_path = os.path.join(DUMP_FOLDER, RESULTS_FILE)            if os.path.exists(results_path):                os.remove(results_path)            # Reset logging configuration            logging.getLogger().handlers = []            # Create file handler            file_handler = logging.FileHandler(                filename=results_path,                mode='a',  # append mode for single session                encoding='utf-8'            )            # Create formatter            formatter = logging.Formatter('%(asctime)s - %(message)s')            file_handler.setFormatter(formatter)            # Get logger and add handler            logger = logging.getLogger()            logger.setLevel(logging.INFO)            logger.addHandler(file_handler)            # Force immediate flush            file_handler.flush()        except Exception as e:            print(f"Logging setup error: {str(e)}")            raise    def _read_content_file(self) -> str:        """Read content from INPUT_FILE"""        try:            file_path = os.path.join(DUMP_FOLDER, INPUT_FILE)            with open(file_path, 'r', encoding='utf-8') as f:                content = f.read()                # Log first 200 characters of the content                self._log_interaction("content_preview", {"first_200_chars": content[:200]})                return content        except Exception as e:            logging.error(f"Error reading content file: {e}")            return ""    @staticmethod    def _log_interaction(type_: str, data: Any):        """Log interactions to RESULTS_FILE"""        try:            timestamp = datetime.now().isoformat()            log_entry = {                "timestamp": timestamp,                "type": type_,                "data": data            }            logging.info(json.dumps(log_entry, ensure_ascii=False))            # Force immediate flush on all handlers            for handler in logging.getLogger().handlers:                handler.flush()        except Exception as e:            print(f"Logging error: {e}")            raise    def get_token(self) -> tuple[str, str, int]:        """Get token and signature from TOKEN_ENDPOINT"""        # First request to get the token        payload = {"password": PASSWORD}        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("token_request", {"payload": payload, "response": response.json()})        if response.status_code != 200:            raise ValueError(f"Failed to get token: {response.text}")        token = response.json()["message"]        # Second request to get signature        payload = {"sign": token}        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("signature_request", {"payload": payload, "response": response.json()})        if response.status_code != 200:            raise ValueError(f"Failed to get signature: {response.text}")        data = response.json()["message"]        return data["signature"], data["challenges"], data["timestamp"]    async def fetch_single_source(self, session: aiohttp.ClientSession, url: str) -> Dict:        """Fetch data from a single source URL"""        async with session.post(url) as response:            data = await response.json()            self._log_interaction("source_fetch", {"url": url, "response": data})            return data    async def fetch_all_sources(self, urls: List[str]) -> List[Dict]:        """Fetch data from all source URLs in parallel"""        async with aiohttp.ClientSession() as session:            tasks = [self.fetch_single_source(session, url) for url in urls]            return await asyncio.gather(*tasks)    async def process_source_async(self, source: Dict) -> List[str]:        """Process a single source asynchronously"""        if source["task"] == "Odpowiedz na pytania":            return await self.process_source0_async(source["data"])        elif "arxiv-draft.html" in source["task"]:            return await self.process_source1_async(source["data"])        return []    async def process_source0_async(self, questions: List[str]) -> List[str]:        """Async version of process_source0"""        prompt = PROMPT_SOURCE_O        formatted_questions = "\n".join(questions)        response = await self.text_chat_async(formatted_questions, prompt)        self._log_interaction("openai_source0", {"questions": questions, "response": response})        response_data = json.loads(response)        return response_data["response"]    async def process_source1_async(self, questions: List[str]) -> List[str]:        """Async version of process_source1"""        prompt = PROMPT_SOURCE_1        formatted_questions = "\n".join(questions)        formatted_prompt = prompt.format(            content=self.content,            questions=formatted_questions        )        response = await self.text_chat_async(formatted_questions, formatted_prompt)        self._log_interaction("openai_source1", {"questions": questions, "response": response})        response_data = json.loads(response)        return response_data["response"]    async def text_chat_async(self, text: str, prompt: str) -> str:        """Async version of text_chat"""        messages = [            {"role": "system", "content": prompt},            {"role": "user", "content": text}        ]        full_prompt = prompt + "\n" + text        self._log_interaction("prompt_preview", {            "first_200_chars": full_prompt[:200],            "last_200_chars": full_prompt[-200:]        })        # OpenAI's client doesn't support async directly, but we can run it in a thread pool        loop = asyncio.get_event_loop()        response = await loop.run_in_executor(            None,            lambda: self.client.chat.completions.create(                model="gpt-4o-mini",                messages=messages,                temperature=0.1            )        )        return response.choices[0].message.content.strip()    async def process_all_sources(self, sources: List[Dict]) -> List[str]:        """Process all sources in parallel"""        tasks = [self.process_source_async(source) for source in sources]        results = await asyncio.gather(*tasks)        return [answer for sublist in results for answer in sublist]    def submit_answers(self, answers: List[str], signature: str, timestamp: int) -> Dict:        """Submit answers to TOKEN_ENDPOINT"""        payload = {            "apikey": API_KEY,            "timestamp": timestamp,            "signature": signature,            "answer": answers        }        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("submit_answers", {"payload": payload, "response": response.json()})        return response.json()
\ No newline at end of file
+import osimport loggingimport jsonimport requestsfrom datetime import datetimefrom typing import Dict, List, Anyfrom dotenv import load_dotenvimport asyncioimport aiohttpfrom pydantic import BaseModelfrom src.llm import Provider, ahedge, parse_modelfrom src.prompt.s05e03 import PROMPT_SOURCE_O, PROMPT_SOURCE_1# Constantsload_dotenv()TOKEN_ENDPOINT = os.getenv("TOKEN_ENDPOINT")PASSWORD = os.getenv('PASSWORD')DUMP_FOLDER = "../data/s05e03"RESULTS_FILE = "results.txt"INPUT_FILE = "content.md"# The answers are checked against a short server-side deadline: a slow model# is backed up by the next one after its p90 latency, and never waited on past thisANSWER_MODELS = ("gpt-4o-mini", "claude-3-5-haiku-latest")ANSWER_DEADLINE = float(os.getenv("S05E03_ANSWER_DEADLINE", "5"))# API key setupAPI_KEY = os.environ.get('API_KEY')OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')if not API_KEY or not OPENAI_API_KEY:    raise ValueError("AIDEVS and OPENAI_API_KEY environment variables must be set")class Answers(BaseModel):    response: List[str]class QuestionsAgent:    def __init__(self):        self.content = self._read_content_file()        self._setup_logging()    @staticmethod    def _setup_logging():        """Setup logging to file with timestamps"""        try:            # Ensure the dump folder exists            os.makedirs(DUMP_FOLDER, exist_ok=True)            # Remove existing log file if it exists            results_path = os.path.join(DUMP_FOLDER, RESULTS_FILE)            if os.path.exists(results_path):                os.remove(results_path)            # Reset logging configuration            logging.getLogger().handlers = []            # Create file handler            file_handler = logging.FileHandler(                filename=results_path,                mode='a',  # append mode for single session                encoding='utf-8'            )            # Create formatter            formatter = logging.Formatter('%(asctime)s - %(message)s')            file_handler.setFormatter(formatter)            # Get logger and add handler            logger = logging.getLogger()            logger.setLevel(logging.INFO)            logger.addHandler(file_handler)            # Force immediate flush            file_handler.flush()        except Exception as e:            print(f"Logging setup error: {str(e)}")            raise    def _read_content_file(self) -> str:        """Read content from INPUT_FILE"""        try:            file_path = os.path.join(DUMP_FOLDER, INPUT_FILE)            with open(file_path, 'r', encoding='utf-8') as f:                content = f.read()                # Log first 200 characters of the content                self._log_interaction("content_preview", {"first_200_chars": content[:200]})                return content        except Exception as e:            logging.error(f"Error reading content file: {e}")            return ""    @staticmethod    def _log_interaction(type_: str, data: Any):        """Log interactions to RESULTS_FILE"""        try:            timestamp = datetime.now().isoformat()            log_entry = {                "timestamp": timestamp,                "type": type_,                "data": data            }            logging.info(json.dumps(log_entry, ensure_ascii=False))            # Force immediate flush on all handlers            for handler in logging.getLogger().handlers:                handler.flush()        except Exception as e:            print(f"Logging error: {e}")            raise    def get_token(self) -> tuple[str, str, int]:        """Get token and signature from TOKEN_ENDPOINT"""        # First request to get the token        payload = {"password": PASSWORD}        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("token_request", {"payload": payload, "response": response.json()})        if response.status_code != 200:            raise ValueError(f"Failed to get token: {response.text}")        token = response.json()["message"]        # Second request to get signature        payload = {"sign": token}        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("signature_request", {"payload": payload, "response": response.json()})        if response.status_code != 200:            raise ValueError(f"Failed to get signature: {response.text}")        data = response.json()["message"]        return data["signature"], data["challenges"], data["timestamp"]    async def fetch_single_source(self, session: aiohttp.ClientSession, url: str) -> Dict:        """Fetch data from a single source URL"""        async with session.post(url) as response:            data = await response.json()            self._log_interaction("source_fetch", {"url": url, "response": data})            return data    async def fetch_all_sources(self, urls: List[str]) -> List[Dict]:        """Fetch data from all source URLs in parallel"""        async with aiohttp.ClientSession() as session:            tasks = [self.fetch_single_source(session, url) for url in urls]            return await asyncio.gather(*tasks)    async def process_source_async(self, source: Dict) -> List[str]:        """Process a single source asynchronously"""        if source["task"] == "Odpowiedz na pytania":            return await self.process_source0_async(source["data"])        elif "arxiv-draft.html" in source["task"]:            return await self.process_source1_async(source["data"])        return []    async def process_source0_async(self, questions: List[str]) -> List[str]:        """Async version of process_source0"""        prompt = PROMPT_SOURCE_O        formatted_questions = "\n".join(questions)        response = await self.text_chat_async(formatted_questions, prompt)        self._log_interaction("openai_source0", {"questions": questions, "response": response})        # Hedged models share provider-neutral arguments, so the reply is repaired locally instead of schema-constrained        return parse_model(response, Answers).response    async def process_source1_async(self, questions: List[str]) -> List[str]:        """Async version of process_source1"""        prompt = PROMPT_SOURCE_1        # The source text is the same for every question set, it stays the cached prefix        formatted_questions = "\n".join(questions)        formatted_prompt = prompt.format(content=self.content)        response = await self.text_chat_async(formatted_questions, formatted_prompt, cache_prefix=True)        self._log_interaction("openai_source1", {"questions": questions, "response": response})        return parse_model(response, Answers).response    async def text_chat_async(self, text: str, prompt: str, cache_prefix: bool = False) -> str:        """Async version of text_chat"""        messages = [            {"role": "system", "content": prompt},            {"role": "user", "content": text}        ]        full_prompt = prompt + "\n" + text        self._log_interaction("prompt_preview", {            "first_200_chars": full_prompt[:200],            "last_200_chars": full_prompt[-200:]        })        response = await ahedge(            messages,            ANSWER_MODELS,            deadline=ANSWER_DEADLINE,            api_keys={Provider.OPENAI: OPENAI_API_KEY},            temperature=0.1,            cache_prefix=cache_prefix,        )        return response.text.strip()    async def process_all_sources(self, sources: List[Dict]) -> List[str]:        """Process all sources in parallel"""        tasks = [self.process_source_async(source) for source in sources]        results = await asyncio.gather(*tasks)        return [answer for sublist in results for answer in sublist]    def submit_answers(self, answers: List[str], signature: str, timestamp: int) -> Dict:        """Submit answers to TOKEN_ENDPOINT"""        payload = {            "apikey": API_KEY,            "timestamp": timestamp,            "signature": signature,            "answer": answers        }        response = requests.post(TOKEN_ENDPOINT, json=payload)        self._log_interaction("submit_answers", {"payload": payload, "response": response.json()})        return response.json()
\ No newline at end of file
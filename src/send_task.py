@@ -1,10 +1,46 @@
+import atexit
+import asyncio
+import os
+import re
+import threading
+
 import httpx
 from pydantic import BaseModel
-from typing import List, Any, Dict
+from pathlib import Path
+from typing import List, Any, Dict, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
 from loguru import logger
 import json
 
+from src import metrics
+from src.cache import SQLiteCache, DEFAULT_CACHE_DIR
+from src.singleflight import SingleFlight
+
+# Shared transport settings. One pooled client per process keeps TCP+TLS
+# connections alive between calls, so agent loops pay for a single handshake.
+HTTP_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=30.0,
+)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_lock = threading.Lock()
+
+# Read-through cache for apidb statements. The database is static, so schema
+# probes and full-table reads are served from disk across runs.
+QUERY_CACHE_PATH = Path(os.getenv("APIDB_CACHE_PATH", DEFAULT_CACHE_DIR / "apidb.sqlite"))
+QUERY_CACHE_TTL = float(os.getenv("APIDB_CACHE_TTL", 24 * 60 * 60))
+QUERY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHEABLE_STATEMENTS = ("select", "show", "desc", "describe", "explain")
+
+_query_cache: Optional[SQLiteCache] = None
+
+_http_flight = SingleFlight("http")
+
 
 class TaskRequest(BaseModel):
     task: str
@@ -35,12 +71,174 @@ class QueryResponse(BaseModel):
     error: str
 
 
+def _http2_enabled() -> bool:
+    """HTTP/2 is opt-in via HTTP2_ENABLED and needs the optional `h2` package."""
+    if os.getenv("HTTP2_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but `h2` is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide pooled HTTP client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        with _client_lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(
+                    limits=HTTP_LIMITS,
+                    timeout=HTTP_TIMEOUT,
+                    http2=_http2_enabled(),
+                    event_hooks=metrics.http_event_hooks(),
+                )
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled async HTTP client bound to the running event loop.
+
+    httpx async connections belong to the loop that opened them, so a new
+    client is created whenever the caller runs on a different loop
+    (e.g. consecutive `asyncio.run` calls).
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            limits=HTTP_LIMITS,
+            timeout=HTTP_TIMEOUT,
+            http2=_http2_enabled(),
+            event_hooks=metrics.async_http_event_hooks(),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+def close_clients() -> None:
+    """Close the pooled sync client. Registered to run at interpreter exit."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        _client.close()
+    _client = None
+
+
+async def aclose_clients() -> None:
+    """Close the pooled async client; call before the event loop shuts down."""
+    global _async_client, _async_client_loop
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+atexit.register(close_clients)
+
+
+def get_query_cache() -> SQLiteCache:
+    """Return the shared apidb query cache, opening the file on first use."""
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = SQLiteCache(
+            QUERY_CACHE_PATH,
+            max_bytes=QUERY_CACHE_MAX_BYTES,
+            default_ttl=QUERY_CACHE_TTL,
+        )
+    return _query_cache
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical form of a statement used as the cache key.
+
+    Whitespace is collapsed, trailing semicolons dropped and everything outside
+    quoted literals lower-cased, so `SELECT * FROM users;` and
+    `select *  from users` share one entry while `'Barbara'` stays intact.
+    """
+    parts = re.split(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")""", query.strip())
+    normalized = "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    )
+    return normalized.strip().rstrip(";").strip()
+
+
+def invalidate_query_cache(url: str, query: Optional[str] = None) -> int:
+    """Drop a cached statement, or every statement cached for `url`.
+
+    Returns:
+        int: Number of removed entries
+    """
+    key = normalize_sql(query) if query is not None else None
+    return get_query_cache().invalidate(_query_cache_namespace(url), key)
+
+
+def _query_cache_namespace(url: str) -> str:
+    return f"apidb:{url}"
+
+
+def _query_cache_enabled(query: Any, use_cache: bool) -> bool:
+    if not use_cache or not isinstance(query, str):
+        return False
+    if os.getenv("APIDB_CACHE", "1").lower() in ("0", "false", "no"):
+        return False
+    return normalize_sql(query).startswith(CACHEABLE_STATEMENTS)
+
+
+def _query_mirror_get(url: str, query: Any, apikey: str, use_cache: bool) -> Optional[Dict]:
+    """Answer from the local apidb snapshot when APIDB_MIRROR is on and it can.
+
+    A fresh read (`use_cache=False`) never gets the snapshot.
+    """
+    if not use_cache or not isinstance(query, str):
+        return None
+    # Imported lazily, the mirror itself fetches tables through send_query
+    from src.apidb_mirror import get_mirror, mirror_enabled
+
+    if not mirror_enabled():
+        return None
+    local = get_mirror(url, apikey).query_local(query)
+    return local.model_dump() if local is not None else None
+
+
+async def _aquery_mirror_get(url: str, query: Any, apikey: str, use_cache: bool) -> Optional[Dict]:
+    """Async `_query_mirror_get`, run in a worker thread.
+
+    The first use takes the snapshot with blocking requests, which must not stall the event loop.
+    """
+    if not use_cache or not isinstance(query, str):
+        return None
+    from src.apidb_mirror import mirror_enabled
+
+    if not mirror_enabled():
+        return None
+    return await asyncio.to_thread(_query_mirror_get, url, query, apikey, use_cache)
+
+
+def _query_cache_get(url: str, query: Any, use_cache: bool) -> Optional[Dict]:
+    if not _query_cache_enabled(query, use_cache):
+        return None
+    cached = get_query_cache().get(_query_cache_namespace(url), normalize_sql(query))
+    if cached is not None:
+        logger.debug(f"apidb cache hit: {query}")
+    return cached
+
+
+def _query_cache_set(url: str, query: Any, data: Dict, use_cache: bool) -> None:
+    # Only successful replies are stored, errors must be retried next time
+    if _query_cache_enabled(query, use_cache) and data.get("error") == "OK":
+        get_query_cache().set(_query_cache_namespace(url), normalize_sql(query), data)
+
+
 def send(
     url: str,
     task: str,
     apikey: str,
     answer: str | List[Any] | Dict,
     class_type: str = "send",
+    use_cache: bool = True,
 ):
     """Send task solution for verification.
 
@@ -50,17 +248,107 @@ def send(
         apikey (str): AI_DEVS_3API key
         answer (str | List[Any]): Task solution
         class_type: BaseModel pydantic class
+        use_cache (bool): Serve read-only "query" statements from the apidb cache
     """
-    if class_type == "query":
-        payload = QueryRequest(task=task, apikey=apikey, query=answer)
-    else:
-        payload = TaskRequest(task=task, apikey=apikey, answer=answer)
+    use_cache = use_cache and class_type == "query"
+    cached = _query_mirror_get(url, answer, apikey, use_cache) or _query_cache_get(url, answer, use_cache)
+    if cached is not None:
+        return cached
+
+    payload = _build_payload(task, apikey, answer, class_type)
+
+    res = get_client().post(url, json=payload.model_dump())
+    if res.status_code != 200:
+        raise Exception(f"Failed to send data: {res.text}")
+    data = res.json()
+    _query_cache_set(url, answer, data, use_cache)
+    return data
+
+
+def send_file(url: str, task: str, apikey: str, answer_path: str | Path, chunk_size: int = 64 * 1024) -> Dict:
+    """Send a task solution already serialised as JSON, streamed from disk.
+
+    Large answers are neither loaded into memory nor serialised a second time.
 
-    res = httpx.post(url, json=payload.model_dump())
+    Args:
+        url (str): Verification URL
+        task (str): Task ID (typically UPPERCASE)
+        apikey (str): AI_DEVS_3API key
+        answer_path (str | Path): File holding the JSON answer
+        chunk_size (int): Bytes read from the file per chunk
+    """
+    def body():
+        header = json.dumps({"task": task, "apikey": apikey})
+        yield header[:-1].encode() + b', "answer": '
+        with open(answer_path, "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+        yield b"}"
+
+    res = get_client().post(url, content=body(), headers={"Content-Type": "application/json"})
     if res.status_code != 200:
         raise Exception(f"Failed to send data: {res.text}")
     return res.json()
 
+
+async def asend(
+    url: str,
+    task: str,
+    apikey: str,
+    answer: str | List[Any] | Dict,
+    class_type: str = "send",
+    use_cache: bool = True,
+):
+    """Async version of `send` running on the pooled async client.
+
+    Args:
+        url (str): Verification URL
+        task (str): Task ID (typically UPPERCASE)
+        apikey (str): AI_DEVS_3API key
+        answer (str | List[Any]): Task solution
+        class_type: BaseModel pydantic class
+        use_cache (bool): Serve read-only "query" statements from the apidb cache
+    """
+    use_cache = use_cache and class_type == "query"
+    cached = await _aquery_mirror_get(url, answer, apikey, use_cache) or _query_cache_get(url, answer, use_cache)
+    if cached is not None:
+        return cached
+
+    payload = _build_payload(task, apikey, answer, class_type)
+
+    async def post() -> Dict:
+        res = await get_async_client().post(url, json=payload.model_dump())
+        if res.status_code != 200:
+            raise Exception(f"Failed to send data: {res.text}")
+        data = res.json()
+        _query_cache_set(url, answer, data, use_cache)
+        return data
+
+    # Read-only statements racing each other share one request
+    if _query_cache_enabled(answer, use_cache):
+        return await _http_flight.do(("query", url, normalize_sql(answer)), post)
+    return await post()
+
+
+async def aget(url: str) -> httpx.Response:
+    """GET `url` on the pooled async client, coalescing concurrent fetches of the same URL."""
+
+    async def fetch() -> httpx.Response:
+        return await get_async_client().get(url, follow_redirects=True)
+
+    return await _http_flight.do(("get", url), fetch)
+
+
+def _build_payload(
+    task: str,
+    apikey: str,
+    answer: str | List[Any] | Dict,
+    class_type: str,
+) -> BaseModel:
+    if class_type == "query":
+        return QueryRequest(task=task, apikey=apikey, query=answer)
+    return TaskRequest(task=task, apikey=apikey, answer=answer)
+
 def send_s03e04(
     url: str,
     apikey: str,
@@ -75,21 +363,99 @@ def send_s03e04(
     """
     payload = S03E03Request(apikey=apikey, query=query)
 
-    res = httpx.post(url, json=payload.model_dump())
+    res = get_client().post(url, json=payload.model_dump())
     if res.status_code != 200:
         raise Exception(f"Failed to send data: {res.text}")
     return res.json()
 
 
-def send_query(url: str, query: str, apikey: str):
+def send_query(url: str, query: str, apikey: str, use_cache: bool = True):
     """Send prompt to Database"""
+    cached = _query_mirror_get(url, query, apikey, use_cache) or _query_cache_get(url, query, use_cache)
+    if cached is not None:
+        return QueryResponse(**cached)
+
     data = QueryRequest(query=query,
                         task="database",
                         apikey=apikey)
-    res = httpx.post(url, data=data.model_dump_json())
+    res = get_client().post(url, content=data.model_dump_json())
+    _query_cache_set(url, query, res.json(), use_cache)
     return QueryResponse(**res.json())
 
 
+async def asend_query(url: str, query: str, apikey: str, use_cache: bool = True) -> QueryResponse:
+    """Async version of `send_query`"""
+    cached = await _aquery_mirror_get(url, query, apikey, use_cache) or _query_cache_get(url, query, use_cache)
+    if cached is not None:
+        return QueryResponse(**cached)
+
+    data = QueryRequest(query=query,
+                        task="database",
+                        apikey=apikey)
+
+    async def post() -> Dict:
+        res = await get_async_client().post(url, content=data.model_dump_json())
+        reply = res.json()
+        _query_cache_set(url, query, reply, use_cache)
+        return reply
+
+    # Read-only statements racing each other (e.g. from asend_many) share one request
+    if _query_cache_enabled(query, use_cache):
+        return QueryResponse(**await _http_flight.do(("query", url, normalize_sql(query)), post))
+    return QueryResponse(**await post())
+
+
+async def asend_many(
+    url: str,
+    apikey: str,
+    items: List[tuple | str],
+    concurrency: int = 5,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Submit many answers or queries concurrently, bounded by a semaphore.
+
+    Args:
+        url (str): Endpoint shared by all items (e.g. `report` or `apidb`)
+        apikey (str): AI_DEVS_3API key
+        items (List[tuple | str]): `(task, answer)` tuples are sent with `asend`,
+            plain strings are SQL queries sent with `asend_query`
+        concurrency (int): Maximum number of requests in flight
+        return_exceptions (bool): Return exceptions in place of results instead of raising
+
+    Returns:
+        List[Any]: Results in the same order as `items`
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _submit(item: tuple | str):
+        async with semaphore:
+            if isinstance(item, str):
+                return await asend_query(url, query=item, apikey=apikey)
+            task, answer = item
+            return await asend(url, task=task, apikey=apikey, answer=answer)
+
+    return await asyncio.gather(
+        *(_submit(item) for item in items), return_exceptions=return_exceptions
+    )
+
+
+def send_many(
+    url: str,
+    apikey: str,
+    items: List[tuple | str],
+    concurrency: int = 5,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Blocking entry point for `asend_many`, for callers without an event loop."""
+    async def _run():
+        try:
+            return await asend_many(url, apikey, items, concurrency, return_exceptions)
+        finally:
+            await aclose_clients()
+
+    return asyncio.run(_run())
+
+
 def format_json(data):
     """Helper function to format JSON with indentation and sorting"""
     return json.dumps(data, indent=2, sort_keys=True)
@@ -150,34 +516,33 @@ def send_s05e04(
 
             # 2. Sending Request
             logger.info(log_separator("SENDING REQUEST"))
-            with httpx.Client(timeout=timeout) as client:
-                logger.info("Initiating HTTP POST request...")
-                response = client.post(url, json=payload.model_dump())
-
-                # 3. Response Processing
-                logger.info(log_separator("RESPONSE RECEIVED"))
-                logger.info("Basic Response Info:")
-                logger.info(f"→ Status Code: {response.status_code}")
-                logger.info(f"→ Response Time: {response.elapsed.total_seconds():.2f}s")
-
-                logger.info("\nResponse Headers:")
-                for key, value in response.headers.items():
-                    logger.info(f"→ {key}: {value}")
-
-                # 4. Response Content
-                logger.info(log_separator("RESPONSE CONTENT"))
-                try:
-                    json_response = response.json()
-                    logger.info("Parsed JSON Response:")
-                    logger.info(f"\n{format_json(json_response)}")
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Could not parse JSON response: {str(e)}")
-                    logger.info("Raw Response Text:")
-                    logger.info(response.text)
-
-                # 5. Status Check
-                response.raise_for_status()
-                return json_response
+            logger.info("Initiating HTTP POST request...")
+            response = get_client().post(url, json=payload.model_dump(), timeout=timeout)
+
+            # 3. Response Processing
+            logger.info(log_separator("RESPONSE RECEIVED"))
+            logger.info("Basic Response Info:")
+            logger.info(f"→ Status Code: {response.status_code}")
+            logger.info(f"→ Response Time: {response.elapsed.total_seconds():.2f}s")
+
+            logger.info("\nResponse Headers:")
+            for key, value in response.headers.items():
+                logger.info(f"→ {key}: {value}")
+
+            # 4. Response Content
+            logger.info(log_separator("RESPONSE CONTENT"))
+            try:
+                json_response = response.json()
+                logger.info("Parsed JSON Response:")
+                logger.info(f"\n{format_json(json_response)}")
+            except json.JSONDecodeError as e:
+                logger.warning(f"Could not parse JSON response: {str(e)}")
+                logger.info("Raw Response Text:")
+                logger.info(response.text)
+
+            # 5. Status Check
+            response.raise_for_status()
+            return json_response
 
         except httpx.HTTPStatusError as e:
             logger.error(log_separator("HTTP ERROR"))
@@ -0,0 +1,97 @@
+"""Coalescing of identical in-flight calls.
+
+Concurrent callers asking for the same key share one execution instead of
+each issuing its own request: the first caller runs the function, everyone
+arriving before it finishes awaits the same result (or exception). Nothing is
+kept once the call completes, persistence is the job of the caches.
+
+    flight = SingleFlight("http")
+    response = await flight.do(url, lambda: client.get(url))
+
+Counters for every group live in the module-level `stats`, e.g.
+`stats["http.calls"]` and `stats["http.coalesced"]`.
+"""
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from src import metrics
+
+T = TypeVar("T")
+
+stats: Counter = Counter()
+metrics.collect("singleflight_total", stats, "Calls per single-flight group and how many were coalesced", label="counter")
+
+
+class SingleFlight:
+    """Group of calls deduplicated by key.
+
+    Args:
+        name (str): Prefix of the counters in `stats`
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self._futures: Dict[Hashable, Future] = {}
+
+    def _count(self, coalesced: bool) -> None:
+        stats[f"{self.name}.calls"] += 1
+        if coalesced:
+            stats[f"{self.name}.coalesced"] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, or the already running call with the same key.
+
+        The shared call runs as its own task, so cancelling one waiter does
+        not cancel the request for the others.
+        """
+        # Tasks belong to a loop, identical keys on different loops do not meet
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            coalesced = task is not None
+            if task is None:
+                task = self._tasks[task_key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._forget_task(task_key))
+            self._count(coalesced)
+        return await asyncio.shield(task)
+
+    def call(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Thread counterpart of `do` for sync callers."""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+            self._count(not leader)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
+
+    def _forget_task(self, task_key: Tuple[int, Hashable]) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._tasks) + len(self._futures)
+
+
+def coalesced(name: str) -> int:
+    """Number of calls in group `name` that reused another caller's request."""
+    return stats[f"{name}.coalesced"]
@@ -0,0 +1,32 @@
+import pytest
+
+from src.llm.budget import model_spec
+from src.llm.types import Provider, base_model, provider_for
+
+FINE_TUNED = "ft:gpt-4o-mini-2024-07-18:personal:ai-devs3:AYL313KI"
+
+
+@pytest.mark.parametrize(
+    "model, provider",
+    [
+        ("gpt-4o-mini", Provider.OPENAI),
+        ("o1-preview-2024-09-12", Provider.OPENAI),
+        (FINE_TUNED, Provider.OPENAI),
+        ("ft:gpt-3.5-turbo-0125:org::abc123", Provider.OPENAI),
+        ("claude-3-5-haiku-latest", Provider.ANTHROPIC),
+        ("llama3.1", Provider.OLLAMA),
+        ("mistral", Provider.OLLAMA),
+    ],
+)
+def test_provider_for(model, provider):
+    assert provider_for(model) == provider
+
+
+def test_explicit_provider_wins():
+    assert provider_for(FINE_TUNED, "ollama") == Provider.OLLAMA
+
+
+def test_fine_tune_uses_base_model():
+    assert base_model(FINE_TUNED) == "gpt-4o-mini-2024-07-18"
+    assert base_model("llama3.1") == "llama3.1"
+    assert model_spec(FINE_TUNED) == model_spec("gpt-4o-mini")
@@ -0,0 +1,40 @@
+import pytest
+
+from src.s_01.e_02 import RobotVerification
+
+
+@pytest.fixture
+def verifier(tmp_path, monkeypatch):
+    # The verifier logs to robot_verification.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    return RobotVerification("test-key", "http://localhost/verify")
+
+
+@pytest.mark.parametrize(
+    "question, answer",
+    [
+        ("What is the capital of Poland?", "Kraków"),
+        ("Jaka jest stolica Polski?", "Kraków"),
+        ("What year is it now?", "1999"),
+        ("Jaki mamy teraz rok?", "1999"),
+        ("Który jest teraz rok?", "1999"),
+        ("What is the answer to life, the universe and everything?", "69"),
+    ],
+)
+def test_special_case_matched_locally(verifier, question, answer):
+    assert verifier._match_special_case(question) == answer
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "W którym roku wybuchła II wojna światowa?",
+        "Who wrote Hitchhiker's Guide to the Galaxy?",
+        "In what year is it believed Rome was founded?",
+        "What is the current year of the Chinese calendar cycle?",
+        "What is the capital of Poland's neighbour Germany?",
+        "How many legs does a spider have?",
+    ],
+)
+def test_ordinary_question_left_to_model(verifier, question):
+    assert verifier._match_special_case(question) is None
@@ -0,0 +1,92 @@
+import json
+import math
+
+import pytest
+
+from src.s_01.e_03 import DataRepairParser, check_arithmetic
+
+
+@pytest.mark.parametrize(
+    "question, answer, expected",
+    [
+        ("2 + 3", 5, 5),
+        ("10 - 4", 6, 6),
+        ("6 * 7", 42, 42),
+        ("9 / 3", 3, 3),
+        ("  12+30 ", 42, 42),
+        ("-3 + 5", 2, 2),
+        ("3 - -2", 5, 5),
+        ("-4 * -5", 20, 20),
+    ],
+)
+def test_correct_answers_are_kept(question, answer, expected):
+    arithmetic, correct, values = check_arithmetic([question], [answer])
+    assert arithmetic[0] and correct[0]
+    assert values[0] == expected
+
+
+@pytest.mark.parametrize(
+    "question, answer, expected",
+    [
+        ("2 + 3", 6, 5),
+        ("-3 + 5", -8, 2),
+        ("3 - -2", 1, 5),
+        ("7 * 8", "56", 56),
+        ("1 + 1", None, 2),
+        ("1 + 0", True, 1),
+    ],
+)
+def test_wrong_answers_are_reported(question, answer, expected):
+    arithmetic, correct, values = check_arithmetic([question], [answer])
+    assert arithmetic[0] and not correct[0]
+    assert values[0] == expected
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "2 +",
+        "+ 3",
+        "2 + x",
+        "2 ++ 3",
+        "2 + 3 + 4",
+        "2.5 + 1",
+        "What is the capital city of Poland?",
+        "",
+        None,
+    ],
+)
+def test_malformed_questions_are_not_arithmetic(question):
+    arithmetic, correct, values = check_arithmetic([question], [5])
+    assert not arithmetic[0] and not correct[0]
+    assert math.isnan(values[0])
+
+
+def test_division_by_zero_has_no_expected_answer():
+    arithmetic, correct, values = check_arithmetic(["4 / 0"], [0])
+    assert arithmetic[0] and not correct[0]
+    assert math.isnan(values[0])
+
+
+def test_rows_stay_aligned():
+    # A newline inside a question is read as a space, it never merges or splits rows
+    questions = ["1 + 1", "2 +\n3", "", "4 * 4", "x"]
+    answers = [2, 5, 0, 15, "x"]
+    arithmetic, correct, values = check_arithmetic(questions, answers)
+    assert arithmetic.tolist() == [True, True, False, True, False]
+    assert correct.tolist() == [True, True, False, False, False]
+    assert values[3] == 16
+
+
+def test_empty_input():
+    arithmetic, correct, values = check_arithmetic([], [])
+    assert len(arithmetic) == len(correct) == len(values) == 0
+
+
+def test_arithmetic_only_file_is_repaired_locally(tmp_path, monkeypatch):
+    # No special cases: nothing goes to the model, no API key is needed
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"test-data": [{"question": "1 + 1", "answer": 3}, {"question": "-2 * 3", "answer": -6}]}))
+    parser = DataRepairParser("http://localhost/unused", cache_path=path)
+    assert parser.repair() == [{"question": "1 + 1", "answer": 2}, {"question": "-2 * 3", "answer": -6}]
@@ -0,0 +1,57 @@
+import pytest
+
+from src.s_01.e_05 import censor_locally, censors
+
+
+@pytest.mark.parametrize(
+    "text, censored",
+    [
+        (
+            "Podejrzany: Krzysztof Kwiatkowski. Mieszka w Szczecinie przy ul. Różanej 12. Ma 31 lat.",
+            "Podejrzany: CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.",
+        ),
+        (
+            "Osoba podejrzana to Andrzej Mazur. Mieszka w Krakowie, ul. Długa 5. Wiek: 29 lat.",
+            "Osoba podejrzana to CENZURA. Mieszka w CENZURA, ul. CENZURA. Wiek: CENZURA lat.",
+        ),
+        (
+            "Tożsamość osoby podejrzanej: Piotr Lewandowski. Zamieszkały we Wrocławiu przy ulicy Lipowej 9/2. Ma 34 lata.",
+            "Tożsamość osoby podejrzanej: CENZURA. Zamieszkały we CENZURA przy ulicy CENZURA. Ma CENZURA lata.",
+        ),
+        (
+            "Dane personalne: Anna Nowak-Kowalska. Adres: Gdańsk, ul. 3 Maja 17. Wiek: 45 lat.",
+            "Dane personalne: CENZURA. Adres: CENZURA, ul. CENZURA. Wiek: CENZURA lat.",
+        ),
+        (
+            "Informacje o podejrzanym: Marek Jankowski. Mieszka w Białymstoku na ulicy Polnej 3. Ma 26 lat.",
+            "Informacje o podejrzanym: CENZURA. Mieszka w CENZURA na ulicy CENZURA. Ma CENZURA lat.",
+        ),
+        # Nothing personal: left as is
+        ("Raport z dnia: brak nowych zdarzeń. Sprawa zamknięta.", "Raport z dnia: brak nowych zdarzeń. Sprawa zamknięta."),
+    ],
+)
+def test_censor_locally(text, censored):
+    assert censor_locally(text) == censored
+    assert censors(text, censored)
+
+
+TEXT = "Podejrzany: Krzysztof Kwiatkowski. Mieszka w Szczecinie przy ul. Różanej 12. Ma 31 lat."
+
+
+@pytest.mark.parametrize(
+    "reply, accepted",
+    [
+        ("Podejrzany: CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.", True),
+        (TEXT, True),
+        ("  Podejrzany: CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.\n", True),
+        # Whole report or whole sentences censored
+        ("CENZURA", False),
+        ("Podejrzany: CENZURA. CENZURA", False),
+        ("CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.", False),
+        # Reworded or punctuation changed
+        ("Podejrzany to CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat.", False),
+        ("Podejrzany: CENZURA. Mieszka w CENZURA przy ul. CENZURA. Ma CENZURA lat!", False),
+    ],
+)
+def test_censors(reply, accepted):
+    assert censors(TEXT, reply) is accepted